@@ -0,0 +1,27 @@
+# Generated by Django 3.2.16 on 2026-10-18 13:16
+
+from django.db import migrations, models
+from drf_api.operations import AddIndexSafely
+
+
+class Migration(migrations.Migration):
+
+    # The indexes are built concurrently on PostgreSQL, so that writes to
+    # the table carry on while they build. That can't happen inside a
+    # transaction.
+    atomic = False
+
+    dependencies = [
+        ('comments', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexSafely(
+            model_name='comment',
+            index=models.Index(fields=['-created_at', '-id'], name='comment_created_id_idx'),
+        ),
+        AddIndexSafely(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created_at', '-id'], name='comment_post_created_id_idx'),
+        ),
+    ]
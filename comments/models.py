@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import User
 from posts.models import Post
+from drf_api.cache import invalidate_on_change
 
 
 class Comment(models.Model):
@@ -15,6 +18,45 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Back keyset pagination of all comments and of the
+            # comments on a single post
+            models.Index(
+                fields=['-created_at', '-id'], name='comment_created_id_idx'
+            ),
+            models.Index(
+                fields=['post', '-created_at', '-id'],
+                name='comment_post_created_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.content
+
+    # Wrap the save in a transaction, so the post_save signal which updates
+    # the post's comments_count commits or rolls back with the comment.
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+# Keep Post.comments_count up to date, using F() expressions so the
+# arithmetic happens in the database rather than in Python.
+def increment_comments_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1
+        )
+
+
+def decrement_comments_count(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comments_count__gt=0).update(
+        comments_count=F('comments_count') - 1
+    )
+
+
+post_save.connect(increment_comments_count, sender=Comment)
+post_delete.connect(decrement_comments_count, sender=Comment)
+
+# Invalidate cached logged out responses which include comments
+invalidate_on_change(Comment, 'comments')
@@ -10,10 +10,16 @@ class CommentSerializer(serializers.ModelSerializer):
     profile_image = serializers.ReadOnlyField(source='owner.profile.image.url')
     created_at = serializers.SerializerMethodField()
     updated_at = serializers.SerializerMethodField()
+    # The views fetch the owner and their profile with each comment, as
+    # the owner, profile_id and profile_image fields read them.
+    select_related_fields = ['owner__profile']
+    # Columns the SerializerMethodFields read, for the fast serialization
+    # path which builds rows with .values() instead of model instances.
+    fast_row_fields = ['owner_id', 'created_at', 'updated_at']
 
     def get_is_owner(self, obj):
         request = self.context['request']
-        return request.user == obj.owner
+        return request.user.id == obj.owner_id
 
     def get_created_at(self, obj):
         return naturaltime(obj.created_at)
@@ -31,3 +37,4 @@ class CommentSerializer(serializers.ModelSerializer):
 
 class CommentDetailSerializer(CommentSerializer):
     post = serializers.ReadOnlyField(source='post.id')
+    select_related_fields = CommentSerializer.select_related_fields + ['post']
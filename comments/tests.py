@@ -1,3 +1,67 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from .models import Comment
+from deletions.jobs import hide_post
+from posts.models import Post
 
-# Create your tests here.
+
+class CommentListViewTests(APITestCase):
+    def setUp(self):
+        # Create a user and a post to comment on
+        self.andy = User.objects.create_user(username='andy', password='12345')
+        self.post = Post.objects.create(owner=self.andy, title='Post Title')
+
+    def create_comments(self, number):
+        # Each comment gets its own owner, so that a missing
+        # select_related would cost extra queries per row
+        for i in range(number):
+            user = User.objects.create_user(username=f'user{i}_{number}')
+            Comment.objects.create(
+                owner=user, post=self.post, content='A comment'
+            )
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/comments/?post={self.post.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_comment_list_query_count_is_constant(self):
+        self.create_comments(2)
+        small_page = self.count_list_queries()
+        self.create_comments(6)
+        self.assertEqual(self.count_list_queries(), small_page)
+
+
+class CommentConditionalGetTests(APITestCase):
+    def test_edited_comment_changes_etag(self):
+        andy = User.objects.create_user(username='andy', password='12345')
+        post = Post.objects.create(owner=andy, title='Post Title')
+        comment = Comment.objects.create(
+            owner=andy, post=post, content='A comment'
+        )
+        url = f'/comments/{comment.id}'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        comment.content = 'An edited comment'
+        comment.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['content'], 'An edited comment')
+
+    def test_comment_on_deleted_post_returns_404(self):
+        andy = User.objects.create_user(username='andy', password='12345')
+        post = Post.objects.create(owner=andy, title='Post Title')
+        comment = Comment.objects.create(
+            owner=andy, post=post, content='A comment'
+        )
+        url = f'/comments/{comment.id}'
+        etag = self.client.get(url)['ETag']
+        # A hidden comment is gone, even for a client with a stored ETag
+        hide_post(post)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,5 +1,13 @@
+from django.contrib.humanize.templatetags.humanize import naturaltime
 from rest_framework import generics, permissions
 from drf_api.permissions import IsOwnerOrReadOnly
+from drf_api.async_views import AsyncListMixin, AsyncRetrieveMixin
+from drf_api.cache import AnonymousCacheMixin
+from drf_api.mixins import (
+    ConditionalGetMixin, EagerLoadingMixin, StreamingListMixin
+)
+from drf_api.fast_serialization import FastListMixin
+from drf_api.pagination import PageNumberOrKeysetPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Comment
 from .serializers import CommentSerializer, CommentDetailSerializer
@@ -13,7 +21,10 @@ from .serializers import CommentSerializer, CommentDetailSerializer
 # POST method. The HTTP request is part of the context object by default when
 # using generics, so we don't have to pass these to the serializer manually
 # like we did in our GET and POST requests.
-class CommentList(generics.ListCreateAPIView):
+class CommentList(
+    AsyncListMixin, AnonymousCacheMixin, EagerLoadingMixin, StreamingListMixin,
+    FastListMixin, generics.ListCreateAPIView
+):
     serializer_class = CommentSerializer
     # Prevent anonymous users from commenting
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -22,8 +33,17 @@ class CommentList(generics.ListCreateAPIView):
     # This means it is possible to filter out some of the
     # model instances if need be. We could use this to ensure users can only
     # access their own data, e.g. sensitive data like payments, account
-    # details etc.
-    queryset = Comment.objects.all()
+    # details etc. Here we leave out comments on deleted posts, and by
+    # deleted, i.e. deactivated, users, which are waiting to be removed
+    # in the background.
+    queryset = Comment.objects.filter(
+        post__deleted_at__isnull=True, owner__is_active=True
+    )
+    # Page numbers by default, or keyset pages on (created_at, id)
+    # for infinite scroll clients which ask for them.
+    pagination_class = PageNumberOrKeysetPagination
+    # Cache responses for logged out users until any of these change
+    cache_groups = ('comments', 'profiles', 'users')
     filter_backends = [
         # Add DjangoFilterBackend
         DjangoFilterBackend,
@@ -40,10 +60,30 @@ class CommentList(generics.ListCreateAPIView):
 
 # Here we sub-class RetrieveUpdateDestroyAPI view which gives us GET, PUT and
 # DELETE functionality.
-class CommentDetail(generics.RetrieveUpdateDestroyAPIView):
+class CommentDetail(
+    AsyncRetrieveMixin, ConditionalGetMixin, AnonymousCacheMixin,
+    EagerLoadingMixin, generics.RetrieveUpdateDestroyAPIView
+):
     # Ensure only the comment owner can edit the post
     permission_classes = [IsOwnerOrReadOnly]
     # We use the CommentDetailSerializer so as not to have to send the post id
     # with every request
     serializer_class = CommentDetailSerializer
-    queryset = Comment.objects.all()
\ No newline at end of file
+    queryset = Comment.objects.filter(
+        post__deleted_at__isnull=True, owner__is_active=True
+    )
+    cache_groups = ('comments', 'profiles', 'users')
+
+    # Everything the serialized comment depends on, fetched in one small
+    # query, so ConditionalGetMixin can answer 304 Not Modified.
+    def get_validator_values(self):
+        values = self.get_queryset().filter(pk=self.kwargs['pk']).values(
+            'updated_at', 'created_at', 'owner__username',
+            'owner__profile__updated_at'
+        ).first()
+        if values is not None:
+            # The serializer shows the dates as e.g. '2 minutes ago',
+            # which changes as time passes even if the comment doesn't.
+            values['natural_created_at'] = naturaltime(values['created_at'])
+            values['natural_updated_at'] = naturaltime(values['updated_at'])
+        return values
\ No newline at end of file
@@ -0,0 +1,17 @@
+from django.contrib import admin
+from .models import DeletionJob
+
+
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'object_repr', 'content_type', 'status', 'deleted_rows', 'batches',
+        'created_at', 'updated_at', 'finished_at'
+    ]
+    list_filter = ['status', 'content_type']
+    readonly_fields = [
+        'content_type', 'object_id', 'object_repr', 'status',
+        'deleted_rows', 'batches', 'created_at', 'updated_at', 'finished_at'
+    ]
+
+
+admin.site.register(DeletionJob, DeletionJobAdmin)
@@ -0,0 +1,119 @@
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from comments.models import Comment
+from drf_api.authentication import token_user_cache
+from drf_api.cache import invalidate_now_and_on_commit
+from followers.models import Follower
+from likes.models import Like
+from posts.models import Post
+from profiles.models import Profile
+from tasks.queue import enqueue
+from timeline.models import TimelineEntry
+from .models import DeletionJob
+
+
+def delete_in_background(instance):
+    """
+    Delete a Post or User without loading and deleting everything which
+    depends on it in one long transaction.
+    The object is hidden straight away: a post gets a deleted_at
+    tombstone, and a user is deactivated, so they can't log in, and
+    their posts get tombstones. The views leave out deactivated users'
+    profiles, comments, likes and follows. A DeletionJob then removes
+    the dependent rows, and the object itself, in the background.
+    Returns the job.
+    """
+    if isinstance(instance, Post):
+        hide = hide_post
+    elif isinstance(instance, User):
+        hide = hide_user
+    else:
+        raise TypeError(f'Cannot delete {type(instance).__name__} in the '
+                        f'background')
+
+    with transaction.atomic():
+        hide(instance)
+        job, created = DeletionJob.objects.get_or_create(
+            content_type=ContentType.objects.get_for_model(instance),
+            object_id=instance.pk,
+            defaults={'object_repr': str(instance)[:255]},
+        )
+        if created:
+            enqueue(
+                'deletions.purge', {'job_id': job.id},
+                idempotency_key=f'deletions.purge:{job.id}:0'
+            )
+    return job
+
+
+def hide_post(post):
+    now = timezone.now()
+    # Only the first of two concurrent deletes changes the count
+    hidden = Post.all_objects.filter(
+        pk=post.pk, deleted_at__isnull=True
+    ).update(deleted_at=now)
+    if hidden:
+        post.deleted_at = now
+        Profile.objects.filter(
+            owner_id=post.owner_id, posts_count__gt=0
+        ).update(posts_count=F('posts_count') - 1)
+        invalidate_now_and_on_commit('posts', 'profiles')
+
+
+def hide_user(user):
+    now = timezone.now()
+    User.objects.filter(pk=user.pk).update(is_active=False)
+    user.is_active = False
+    # update() skips the signal which drops their cached access tokens
+    token_user_cache.invalidate_user(user.pk)
+    Post.all_objects.filter(
+        owner_id=user.pk, deleted_at__isnull=True
+    ).update(deleted_at=now)
+    Profile.objects.filter(owner_id=user.pk).update(posts_count=0)
+    invalidate_now_and_on_commit('posts', 'profiles', 'users')
+
+
+def purge_steps(job):
+    """
+    Return the querysets the job deletes, in order. The rows which
+    depend on the object come first, so each batch only cascades to a
+    handful of rows, and the object itself comes last.
+    """
+    pk = job.object_id
+    if job.content_type.model_class() is Post:
+        return [
+            TimelineEntry.objects.filter(post_id=pk),
+            Like.objects.filter(post_id=pk),
+            Comment.objects.filter(post_id=pk),
+            Post.all_objects.filter(pk=pk),
+        ]
+    return [
+        TimelineEntry.objects.filter(owner_id=pk),
+        TimelineEntry.objects.filter(post__owner_id=pk),
+        Like.objects.filter(post__owner_id=pk),
+        Like.objects.filter(owner_id=pk),
+        Comment.objects.filter(post__owner_id=pk),
+        Comment.objects.filter(owner_id=pk),
+        Follower.objects.filter(owner_id=pk),
+        Follower.objects.filter(followed_id=pk),
+        Post.all_objects.filter(owner_id=pk),
+        User.objects.filter(pk=pk),
+    ]
+
+
+def delete_batch(queryset, size):
+    """
+    Delete up to 'size' rows of 'queryset' in their own transaction, and
+    return how many rows were deleted, including cascades.
+    """
+    ids = list(queryset.order_by().values_list('pk', flat=True)[:size])
+    if not ids:
+        return 0
+    with transaction.atomic():
+        deleted, _ = queryset.model._base_manager.filter(
+            pk__in=ids
+        ).delete()
+    return deleted
@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from posts.models import Post
+from deletions.jobs import delete_in_background
+
+MODELS = {'post': Post, 'user': User}
+
+
+class Command(BaseCommand):
+    """
+    Hide a post or user straight away, and queue the removal of it and
+    everything which depends on it. Follow the progress with the
+    deletion_jobs command or in the admin.
+    """
+    help = 'Delete a post or user in the background'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(MODELS))
+        parser.add_argument('pk', type=int)
+
+    def handle(self, *args, **options):
+        model = MODELS[options['model']]
+        try:
+            instance = model._base_manager.get(pk=options['pk'])
+        except model.DoesNotExist:
+            raise CommandError(
+                f"There is no {options['model']} with id {options['pk']}"
+            )
+        job = delete_in_background(instance)
+        self.stdout.write(self.style.SUCCESS(f'Queued job {job.id}: {job}'))
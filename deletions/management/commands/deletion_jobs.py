@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from deletions.models import DeletionJob
+
+
+class Command(BaseCommand):
+    """
+    List the background deletion jobs which haven't finished, or with
+    --all every job, with the number of rows each has deleted so far.
+    """
+    help = 'Show the progress of background deletions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true', help='Include finished jobs',
+        )
+
+    def handle(self, *args, **options):
+        jobs = DeletionJob.objects.select_related('content_type')
+        if not options['all']:
+            jobs = jobs.exclude(status=DeletionJob.DONE)
+        for job in jobs:
+            self.stdout.write(
+                f'{job.id}\t{job.content_type.model} {job.object_id}\t'
+                f'{job.status}\t{job.deleted_rows} rows in '
+                f'{job.batches} batches\t{job.object_repr}'
+            )
+        if not jobs:
+            self.stdout.write('No deletion jobs')
@@ -0,0 +1,38 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+class DeletionJob(models.Model):
+    """
+    DeletionJob model, tracking the background removal of a deleted post
+    or user and every row which depends on it.
+    The object is hidden as soon as the job is created, and the
+    deletions.purge task then deletes its dependent rows in small batches,
+    and finally the object itself. 'deleted_rows' and 'batches' show the
+    progress so far. 'object_repr' keeps a description of the object for
+    the admin, as the object itself is gone once the job is done.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    status_choices = [
+        (QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'),
+    ]
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    object_repr = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=16, choices=status_choices, default=QUEUED
+    )
+    deleted_rows = models.PositiveIntegerField(default=0)
+    batches = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ['content_type', 'object_id']
+
+    def __str__(self):
+        return f'Deletion of {self.object_repr} ({self.status})'
@@ -0,0 +1,45 @@
+import time
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from tasks.queue import enqueue, task
+from .jobs import delete_batch, purge_steps
+from .models import DeletionJob
+
+
+# Work through a deletion job in batches of DELETION_BATCH_SIZE rows,
+# each in its own short transaction, pausing DELETION_BATCH_PAUSE seconds
+# between them so other writers get a look in. After DELETION_RUN_SECONDS
+# the task queues itself to carry on, rather than holding a worker.
+# Only one job runs at a time.
+@task('deletions.purge', concurrency=1, atomic=False)
+def purge(job_id):
+    job = DeletionJob.objects.filter(pk=job_id).first()
+    if job is None or job.status == DeletionJob.DONE:
+        return
+    DeletionJob.objects.filter(pk=job_id).update(status=DeletionJob.RUNNING)
+    deadline = time.monotonic() + settings.DELETION_RUN_SECONDS
+    batches = job.batches
+
+    for queryset in purge_steps(job):
+        while True:
+            deleted = delete_batch(queryset, settings.DELETION_BATCH_SIZE)
+            if not deleted:
+                break
+            batches += 1
+            DeletionJob.objects.filter(pk=job_id).update(
+                deleted_rows=F('deleted_rows') + deleted,
+                batches=F('batches') + 1,
+                updated_at=timezone.now(),
+            )
+            if time.monotonic() >= deadline:
+                enqueue(
+                    'deletions.purge', {'job_id': job_id},
+                    idempotency_key=f'deletions.purge:{job_id}:{batches}'
+                )
+                return
+            time.sleep(settings.DELETION_BATCH_PAUSE)
+
+    DeletionJob.objects.filter(pk=job_id).update(
+        status=DeletionJob.DONE, finished_at=timezone.now(),
+    )
@@ -0,0 +1,119 @@
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from .jobs import delete_in_background
+from .models import DeletionJob
+from comments.models import Comment
+from followers.models import Follower
+from likes.models import Like
+from posts.models import Post
+from profiles.models import Profile
+from tasks.models import Task
+
+
+@override_settings(
+    TASKS_EAGER=False, DELETION_BATCH_SIZE=2, DELETION_BATCH_PAUSE=0
+)
+class BackgroundDeletionTests(APITestCase):
+    def setUp(self):
+        self.andy = User.objects.create_user(username='andy', password='12345')
+        self.brian = User.objects.create_user(username='brian')
+        Follower.objects.create(owner=self.brian, followed=self.andy)
+        self.post = Post.objects.create(owner=self.andy, title='Busy post')
+        for number in range(3):
+            Comment.objects.create(
+                owner=self.brian, post=self.post, content=f'{number}'
+            )
+        Like.objects.create(owner=self.brian, post=self.post)
+        Like.objects.create(owner=self.andy, post=self.post)
+        # Run the timeline tasks queued above
+        call_command('run_tasks', once=True, stdout=StringIO())
+
+    def run_worker(self):
+        call_command('run_tasks', once=True, stdout=StringIO())
+
+    def test_deleted_post_is_hidden_straight_away(self):
+        self.client.login(username='andy', password='12345')
+        response = self.client.delete(f'/posts/{self.post.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        # Nothing has been removed yet, but the post and its comments and
+        # likes are gone from the API
+        self.assertTrue(Post.all_objects.filter(pk=self.post.id).exists())
+        self.assertEqual(Comment.objects.count(), 3)
+        response = self.client.get(f'/posts/{self.post.id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/posts/').data['count'], 0)
+        self.assertEqual(self.client.get('/comments/').data['count'], 0)
+        self.assertEqual(self.client.get('/likes/').data['count'], 0)
+        self.assertEqual(self.client.get('/feed/').data['count'], 0)
+        self.assertEqual(Profile.objects.get(owner=self.andy).posts_count, 0)
+        # Deleting it twice doesn't count it twice
+        self.client.delete(f'/posts/{self.post.id}/')
+        self.assertEqual(DeletionJob.objects.count(), 1)
+
+    def test_worker_removes_dependent_rows_in_batches(self):
+        self.client.login(username='andy', password='12345')
+        self.client.delete(f'/posts/{self.post.id}/')
+        self.run_worker()
+
+        self.assertFalse(Post.all_objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Like.objects.exists())
+        job = DeletionJob.objects.get()
+        self.assertEqual(job.status, DeletionJob.DONE)
+        # 1 timeline entry, 2 likes, 3 comments and the post itself
+        self.assertEqual(job.deleted_rows, 7)
+        self.assertEqual(job.batches, 5)
+        self.assertEqual(Profile.objects.get(owner=self.andy).posts_count, 0)
+
+    def test_long_jobs_queue_themselves_to_carry_on(self):
+        with self.settings(DELETION_RUN_SECONDS=0):
+            self.client.login(username='andy', password='12345')
+            self.client.delete(f'/posts/{self.post.id}/')
+            self.run_worker()
+        # One task per batch, and a last one which finds nothing left
+        self.assertEqual(
+            Task.objects.filter(name='deletions.purge').count(), 6
+        )
+        self.assertEqual(DeletionJob.objects.get().status, DeletionJob.DONE)
+
+    def test_deleted_user_is_hidden_straight_away(self):
+        profile_url = f'/profiles/{self.brian.profile.id}/'
+        etag = self.client.get(profile_url)['ETag']
+        delete_in_background(self.brian)
+
+        # Nothing has been removed yet, but Brian's profile, comments,
+        # likes and follows are gone from the API
+        self.assertEqual(Comment.objects.count(), 3)
+        response = self.client.get(profile_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/profiles/').data['count'], 1)
+        self.assertEqual(self.client.get('/comments/').data['count'], 0)
+        self.assertEqual(self.client.get('/likes/').data['count'], 1)
+        self.assertEqual(self.client.get('/followers/').data['count'], 0)
+
+    def test_deleting_a_user(self):
+        out = StringIO()
+        call_command(
+            'delete_in_background', 'user', str(self.andy.id), stdout=out
+        )
+        self.assertFalse(self.client.login(username='andy', password='12345'))
+        self.assertEqual(self.client.get('/posts/').data['count'], 0)
+
+        call_command('deletion_jobs', stdout=out)
+        self.assertIn('queued', out.getvalue())
+        self.run_worker()
+        self.assertFalse(User.objects.filter(username='andy').exists())
+        self.assertFalse(Post.all_objects.exists())
+        self.assertFalse(Like.objects.exists())
+        # Brian's count of accounts he follows went down with the follow
+        self.assertEqual(
+            Profile.objects.get(owner=self.brian).following_count, 0
+        )
+        self.assertEqual(DeletionJob.objects.get().status, DeletionJob.DONE)
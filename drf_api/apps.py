@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class DrfApiConfig(AppConfig):
+    name = 'drf_api'
+
+    def ready(self):
+        # Register our system checks
+        from . import checks  # noqa: F401
+        # Time the queries of requests served by ASGI, see drf_api/timing.py
+        from .timing import install_request_timing
+        connection_created.connect(install_request_timing)
@@ -3,6 +3,14 @@ ASGI config for drf_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The read views are served asynchronously here, see drf_api/async_views.py.
+The Procfile's web process runs it with uvicorn workers under gunicorn:
+    gunicorn drf_api.asgi -k uvicorn.workers.UvicornWorker
+To serve every view synchronously instead, change the web process to the
+WSGI entry point:
+    gunicorn drf_api.wsgi
+bench_concurrency compares the two.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
@@ -12,5 +20,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drf_api.settings')
+os.environ.setdefault('ASYNC_READ_VIEWS', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,8 @@
+"""
+drf_api.urls, with the async version of each view which has one, see
+drf_api/async_views.py. The ASGI entry point, drf_api/asgi.py, uses it.
+"""
+from .async_views import async_patterns
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = async_patterns(sync_urlpatterns)
@@ -0,0 +1,350 @@
+import asyncio
+import functools
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models.expressions import RawSQL
+from django.http import HttpResponse
+from django.urls import URLPattern, URLResolver
+from rest_framework.response import Response
+from .cache import AnonymousCacheMixin
+from .mixins import ConditionalGetMixin
+from .timing import RequestTimings, current_timings
+
+query_executor = None
+query_executor_lock = threading.Lock()
+# Numbers the async views' requests, and remembers, in each query
+# thread, the request it last ran a query for
+request_numbers = itertools.count()
+query_thread = threading.local()
+
+
+def get_query_executor():
+    """
+    Return the pool of ASYNC_QUERY_THREADS threads the async views run
+    their queries in. The threads live as long as the worker, so each
+    keeps its database connections, just as a sync worker does.
+    """
+    global query_executor
+    with query_executor_lock:
+        if query_executor is None:
+            query_executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_QUERY_THREADS,
+                thread_name_prefix='async-query',
+            )
+    return query_executor
+
+
+def run_query(func, request_number, timings=None):
+    # Runs 'func' in a query thread, for request 'request_number'.
+    # 'timings' times its queries on their own, when the request's other
+    # queries run at the same time. The first time the thread runs one
+    # of a request's queries, its connections are checked in from the
+    # requests before, as at the end of a request, so they're closed once
+    # too old, and checked before they're used. Doing that after every
+    # query would check the connection before every query.
+    if getattr(query_thread, 'request_number', None) != request_number:
+        close_old_connections()
+        query_thread.request_number = request_number
+    token = current_timings.set(timings) if timings is not None else None
+    try:
+        return func()
+    finally:
+        if token is not None:
+            current_timings.reset(token)
+
+
+class AsyncAPIViewMixin:
+    """
+    Mixin for generic views which adds as_async_view(), an async version
+    of the view, which the ASGI entry point serves, see drf_api/asgi.py.
+    GET requests are handled by async_get, which runs the queries the
+    response needs at the same time, so a worker isn't held up waiting
+    on each one in turn. Other methods go to the normal view.
+    DRF and the ORM are synchronous, so the view's code, including its
+    queries, runs in the threads from get_query_executor(). Django 3.2
+    runs all other synchronous code in one thread, which every request
+    would queue for. The threads share the GIL, so it's the waiting on
+    the database which overlaps, not serialization.
+    """
+    lookup_names = ()
+
+    @classmethod
+    def as_async_view(cls, **initkwargs):
+        sync_view = cls.as_view(**initkwargs)
+
+        async def view(request, *args, **kwargs):
+            if request.method != 'GET':
+                return await sync_to_async(sync_view)(
+                    request, *args, **kwargs
+                )
+            self = cls(**initkwargs)
+            self.setup(request, *args, **kwargs)
+            return await self.async_dispatch(request, *args, **kwargs)
+        # Keeps .cls, which the middleware reads, and csrf_exempt
+        return functools.update_wrapper(view, sync_view)
+
+    async def async_dispatch(self, request, *args, **kwargs):
+        # APIView.dispatch, with the GET handler awaited
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        self.request_number = next(request_numbers)
+        self.concurrent_queries = await sync_to_async(
+            self.can_use_query_threads
+        )()
+        try:
+            await self.run_sync(self.initial, request, *args, **kwargs)
+            response = await self.async_get(request, *args, **kwargs)
+        except Exception as exc:
+            response = await self.run_sync(self.handle_exception, exc)
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs
+        )
+        return self.response
+
+    def can_use_query_threads(self):
+        # The query threads have connections of their own, which can't
+        # see a transaction open on this thread's, e.g. a test's, so then
+        # everything runs here, one query after another.
+        return settings.ASYNC_QUERY_THREADS > 0 and not any(
+            connection.in_atomic_block for connection in connections.all()
+        )
+
+    async def run_sync(self, func, *args, **kwargs):
+        # Run 'func' in a query thread, or in Django's thread for
+        # synchronous code if the query threads can't be used
+        func = functools.partial(func, *args, **kwargs)
+        if not self.concurrent_queries:
+            return await sync_to_async(func)()
+        return await sync_to_async(
+            run_query, thread_sensitive=False, executor=get_query_executor()
+        )(func, self.request_number)
+
+    async def run_queries(self, queries):
+        """
+        Run the functions in the dictionary 'queries', which each make a
+        query, at the same time, and return a dictionary of their results.
+        The queries are added to the request's Server-Timing count, and
+        the time spent waiting for them all to its database time.
+        """
+        if not self.concurrent_queries:
+            return {
+                name: await self.run_sync(query)
+                for name, query in queries.items()
+            }
+        run = sync_to_async(
+            run_query, thread_sensitive=False, executor=get_query_executor()
+        )
+        timings = [RequestTimings() for _ in queries]
+        start = time.perf_counter()
+        try:
+            results = await asyncio.gather(*[
+                run(query, self.request_number, query_timings)
+                for query, query_timings in zip(queries.values(), timings)
+            ])
+        finally:
+            request_timings = getattr(self.request, 'timings', None)
+            if request_timings is not None:
+                request_timings.queries += sum(
+                    query_timings.queries for query_timings in timings
+                )
+                request_timings.db_time += time.perf_counter() - start
+        return dict(zip(queries, results))
+
+    def get_lookup_queries(self, queryset):
+        """
+        Return the serializer's lookups for the objects in 'queryset',
+        e.g. which of them the user likes, as queries for run_queries.
+        Their results go in the serializer context, see
+        get_serializer_context, where the serializer looks for them
+        before making its own queries.
+        """
+        serializer = self.get_serializer()
+        lookups = getattr(serializer, 'get_lookups', None)
+        lookups = lookups(queryset) if lookups is not None else {}
+        self.lookup_names = list(lookups)
+        return lookups
+
+    def set_lookup_results(self, results):
+        self.lookup_results = {
+            name: results[name] for name in self.lookup_names
+        }
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context.update(getattr(self, 'lookup_results', {}))
+        return context
+
+
+class AsyncListMixin(AsyncAPIViewMixin):
+    """
+    Async version of a list view. The page's rows, the count of all the
+    rows, and the serializer's lookups for the page run at the same
+    time. The lookups use the page's query as a subquery, so they don't
+    wait for its rows.
+    Logged out users' responses are looked up in the cache first, as
+    usual. Streamed lists, and pages which can't be found before
+    counting, e.g. page=last, are made by the normal list code. Streamed
+    lists are sent in one piece, as Django 3.2 can only stream from
+    synchronous code.
+    """
+    async def async_get(self, request, *args, **kwargs):
+        cached = (
+            isinstance(self, AnonymousCacheMixin) and self.uses_cache(request)
+        )
+        if cached:
+            response = await self.run_sync(
+                self.get_cached_response, request
+            )
+            if response is not None:
+                return response
+
+        queries = await self.run_sync(self.get_page_queries)
+        if queries is None:
+            response = await self.run_sync(
+                self.get_list_response, request, *args, **kwargs
+            )
+        else:
+            results = await self.run_queries(queries)
+            response = await self.run_sync(self.get_page_response, results)
+        if cached:
+            await self.run_sync(self.cache_response, request, response)
+        return response
+
+    def get_page_queries(self):
+        # Return the queries for run_queries, or None to use list()
+        if hasattr(self, 'should_stream') and self.should_stream():
+            return None
+        if not hasattr(self.paginator, 'get_page_querysets'):
+            return None
+        # FastListMixin's .values() rows, if the view has it
+        if hasattr(self, 'get_list_queryset'):
+            queryset = self.get_list_queryset()
+        else:
+            queryset = self.filter_queryset(self.get_queryset())
+        querysets = self.paginator.get_page_querysets(
+            queryset, self.request, view=self
+        )
+        if querysets is None:
+            return None
+
+        page, count = querysets
+        queries = {'rows': functools.partial(list, page)}
+        if count is not None:
+            queries['count'] = count.count
+        # Raw SQL, e.g. the search rank, may name the table, which has
+        # another alias in a subquery, so then the serializer looks up
+        # the page's rows itself, once they're fetched
+        if not any(
+            isinstance(annotation, RawSQL)
+            for annotation in page.query.annotations.values()
+        ):
+            queries.update(self.get_lookup_queries(page))
+        return queries
+
+    def get_list_response(self, request, *args, **kwargs):
+        response = self.list(request, *args, **kwargs)
+        if response.streaming:
+            # Django 3.2 sends streamed responses from the event loop,
+            # where their rows can't be queried, so it's built here
+            response = HttpResponse(
+                b''.join(response.streaming_content),
+                content_type=response['Content-Type']
+            )
+        return response
+
+    def get_page_response(self, results):
+        self.set_lookup_results(results)
+        page = self.paginator.finish_page(
+            results['rows'], results.get('count')
+        )
+        if hasattr(self, 'serialize_page'):
+            data = self.serialize_page(page)
+        else:
+            data = self.get_serializer(page, many=True).data
+        return self.get_paginated_response(data)
+
+
+class AsyncRetrieveMixin(AsyncAPIViewMixin):
+    """
+    Async version of a detail view. The object, the serializer's lookups
+    for it, and with ConditionalGetMixin, the validator values, run at
+    the same time, along with the cache lookup for logged out users.
+    The lookups filter on the primary key in the URL, so they don't wait
+    for the object. The object is fetched even if the response turns out
+    to be cached or not modified, as it's fetched at the same time.
+    """
+    async def async_get(self, request, *args, **kwargs):
+        queries = await self.run_sync(self.get_object_queries)
+        results = await self.run_queries(queries)
+        return await self.run_sync(self.get_object_response, results)
+
+    def get_object_queries(self):
+        queries = {'object': self.get_object}
+        if isinstance(self, ConditionalGetMixin):
+            queries['validator_values'] = self.get_validator_values
+        if isinstance(self, AnonymousCacheMixin) and self.uses_cache(
+            self.request
+        ):
+            queries['cached'] = functools.partial(
+                self.get_cached_response, self.request
+            )
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queries.update(self.get_lookup_queries(
+            self.filter_queryset(self.get_queryset()).filter(**{
+                self.lookup_field: self.kwargs[lookup_url_kwarg]
+            })
+        ))
+        return queries
+
+    def get_object_response(self, results):
+        self.set_lookup_results(results)
+
+        # The order of the normal view: not modified, cached, retrieved
+        def get_response():
+            response = results.get('cached')
+            if response is None:
+                serializer = self.get_serializer(results['object'])
+                response = Response(serializer.data)
+                if 'cached' in results:
+                    self.cache_response(self.request, response)
+            return response
+
+        if 'validator_values' in results:
+            return self.get_conditional_response(
+                self.request, results['validator_values'], get_response
+            )
+        return get_response()
+
+
+def async_patterns(patterns):
+    """
+    Return a copy of the URL patterns 'patterns', with each view which
+    has an async version, from as_async_view(), replaced by it.
+    """
+    copied = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            pattern = URLResolver(
+                pattern.pattern, async_patterns(pattern.url_patterns),
+                pattern.default_kwargs, pattern.app_name, pattern.namespace
+            )
+        else:
+            view_class = getattr(pattern.callback, 'cls', None)
+            if hasattr(view_class, 'as_async_view'):
+                pattern = URLPattern(
+                    pattern.pattern,
+                    view_class.as_async_view(
+                        **pattern.callback.initkwargs
+                    ),
+                    pattern.default_args, pattern.name
+                )
+        copied.append(pattern)
+    return copied
@@ -0,0 +1,220 @@
+import threading
+import time
+from collections import OrderedDict
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete, post_save
+from django.utils.translation import gettext_lazy as _
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed, InvalidToken
+)
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from profiles.models import Profile
+from .images import image_processed
+
+# The profile fields kept with each cached user, which are the ones
+# CurrentUserSerializer shows. Other fields are loaded if they're read.
+PROFILE_FIELDS = ['id', 'owner_id', 'updated_at', 'image']
+
+
+class UserSnapshot:
+    """
+    The field values of a User and their Profile, from which a fresh
+    instance is built for each request, so requests never share one.
+    """
+    def __init__(self, user):
+        self.user_fields, self.user_values = self.get_values(user)
+        profile = getattr(user, 'profile', None)
+        self.profile_fields, self.profile_values = (None, None) if (
+            profile is None
+        ) else self.get_values(profile, PROFILE_FIELDS)
+
+    def get_values(self, instance, names=None):
+        # In the model's field order, as from_db() expects. Files are
+        # kept by name, as a FieldFile belongs to one instance.
+        fields = [
+            field.attname for field in instance._meta.concrete_fields
+            if names is None or field.attname in names
+        ]
+        values = [getattr(instance, name) for name in fields]
+        return fields, [
+            value.name if isinstance(value, FieldFile) else value
+            for value in values
+        ]
+
+    def build(self):
+        user = User.from_db('default', self.user_fields, self.user_values)
+        if self.profile_values is not None:
+            user.profile = Profile.from_db(
+                'default', self.profile_fields, self.profile_values
+            )
+        return user
+
+
+class TokenUserCache:
+    """
+    A bounded, least recently used cache of verified access tokens and
+    the user each belongs to, in this process. Entries expire after
+    JWT_USER_CACHE_TTL seconds, or when the token does if that's sooner,
+    and the least recently used entries are dropped beyond
+    JWT_USER_CACHE_SIZE.
+    Entries are dropped straight away when the user or their profile
+    changes, or they log out, in this process. Other processes notice
+    when their entries expire, so JWT_USER_CACHE_TTL bounds how long,
+    e.g., a deactivated user can still use the API.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Raw token: (expires, user id, validated token, snapshot)
+        self.entries = OrderedDict()
+        # User id: their raw tokens in 'entries'
+        self.tokens_by_user = {}
+        # Counts invalidations, so a user loaded before one isn't cached
+        self.generation = 0
+
+    def get(self, raw_token):
+        with self.lock:
+            entry = self.entries.get(raw_token)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                self.remove(raw_token)
+                return None
+            self.entries.move_to_end(raw_token)
+            return entry
+
+    def put(self, raw_token, validated_token, user, generation):
+        """
+        Cache 'user' for 'raw_token', unless anything was invalidated
+        since 'generation' was read, before the user was loaded.
+        """
+        expires = time.time() + settings.JWT_USER_CACHE_TTL
+        token_expires = validated_token.get('exp')
+        if token_expires is not None:
+            expires = min(expires, token_expires)
+        snapshot = UserSnapshot(user)
+        with self.lock:
+            if self.generation != generation:
+                return
+            self.remove(raw_token)
+            self.entries[raw_token] = (
+                expires, user.pk, validated_token, snapshot
+            )
+            self.tokens_by_user.setdefault(user.pk, set()).add(raw_token)
+            while len(self.entries) > settings.JWT_USER_CACHE_SIZE:
+                self.remove(next(iter(self.entries)))
+
+    def remove(self, raw_token):
+        # Callers hold the lock
+        entry = self.entries.pop(raw_token, None)
+        if entry is not None:
+            tokens = self.tokens_by_user.get(entry[1])
+            tokens.discard(raw_token)
+            if not tokens:
+                del self.tokens_by_user[entry[1]]
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            self.generation += 1
+            for raw_token in list(self.tokens_by_user.get(user_id, ())):
+                self.remove(raw_token)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tokens_by_user.clear()
+            self.generation += 1
+
+
+token_user_cache = TokenUserCache()
+
+
+class CachedJWTCookieAuthentication(JWTCookieAuthentication):
+    """
+    JWTCookieAuthentication which remembers the tokens it has verified,
+    and their user and profile, in token_user_cache. A client sends the
+    same access token with every request until it's refreshed, so most
+    requests skip checking its signature and loading the user. The
+    profile is loaded with the user, so the id and image which
+    /dj-rest-auth/user/ adds don't cost another query.
+    """
+    def get_validated_token(self, raw_token):
+        entry = token_user_cache.get(raw_token)
+        if entry is not None:
+            return entry[2]
+        return super().get_validated_token(raw_token)
+
+    def get_user(self, validated_token):
+        raw_token = validated_token.token
+        entry = token_user_cache.get(raw_token)
+        if entry is not None:
+            return entry[3].build()
+
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _('Token contained no recognizable user identification')
+            )
+        generation = token_user_cache.generation
+        user = User.objects.select_related('profile').filter(**{
+            jwt_settings.USER_ID_FIELD: user_id
+        }).first()
+        if user is None:
+            raise AuthenticationFailed(
+                _('User not found'), code='user_not_found'
+            )
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _('User is inactive'), code='user_inactive'
+            )
+        token_user_cache.put(raw_token, validated_token, user, generation)
+        return user
+
+
+# Drop the cached tokens of users whose user or profile changes, who log
+# out, or whose refresh token is blacklisted, if the blacklist app is
+# installed. Profile images are stored by process_image, with update().
+def invalidate_user(sender, instance, **kwargs):
+    token_user_cache.invalidate_user(instance.pk)
+
+
+def invalidate_profile_owner(sender, instance, **kwargs):
+    token_user_cache.invalidate_user(instance.owner_id)
+
+
+def invalidate_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        token_user_cache.invalidate_user(user.pk)
+
+
+def invalidate_processed_profile(sender, pk, **kwargs):
+    if sender is Profile:
+        owner_id = Profile.objects.filter(pk=pk).values_list(
+            'owner_id', flat=True
+        ).first()
+        if owner_id is not None:
+            token_user_cache.invalidate_user(owner_id)
+
+
+post_save.connect(invalidate_user, sender=User)
+post_delete.connect(invalidate_user, sender=User)
+post_save.connect(invalidate_profile_owner, sender=Profile)
+post_delete.connect(invalidate_profile_owner, sender=Profile)
+user_logged_out.connect(invalidate_logged_out_user)
+image_processed.connect(invalidate_processed_profile)
+
+if apps.is_installed('rest_framework_simplejwt.token_blacklist'):
+    from rest_framework_simplejwt.token_blacklist.models import (
+        BlacklistedToken
+    )
+
+    def invalidate_blacklisted_user(sender, instance, **kwargs):
+        if instance.token.user_id is not None:
+            token_user_cache.invalidate_user(instance.token.user_id)
+
+    post_save.connect(invalidate_blacklisted_user, sender=BlacklistedToken)
@@ -0,0 +1,102 @@
+from django.conf import settings
+from rest_framework import permissions, serializers
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+class BulkTargetsView(APIView):
+    """
+    Base view which likes, follows, etc. a list of targets in one request,
+    e.g. when a new user follows a list of suggested accounts, or a client
+    replays the actions it queued while offline.
+    PUT adds the targets and DELETE removes them, as the logged in user.
+    The body lists the target ids under 'target_field', and the response
+    has a result for each of them, in the same order. Targets which are
+    invalid or don't exist get an error, without failing the others.
+    Subclasses implement add_targets() and remove_targets(), which get
+    the valid ids and work on the whole batch with a fixed number of
+    queries.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    # The key holding the list of ids in the request body
+    target_field = None
+    # The key holding each target's id in the results
+    result_field = None
+    # Ids bigger than a 64-bit integer can't be sent to the database
+    target_id = serializers.IntegerField(min_value=1, max_value=2**63 - 1)
+
+    def add_targets(self, owner_id, target_ids):
+        """
+        Add the targets which exist, and return a dict of the row id and
+        whether it was created, by target id.
+        """
+        raise NotImplementedError
+
+    def remove_targets(self, owner_id, target_ids):
+        """
+        Remove the targets, and return the set of target ids which had a
+        row to delete.
+        """
+        raise NotImplementedError
+
+    def get_items(self, request):
+        """
+        Return a list of (target id, error) pairs for the targets in the
+        request body. Raises a ValidationError if the body doesn't have a
+        list of them, or has too many.
+        """
+        targets = request.data.get(self.target_field) if hasattr(
+            request.data, 'get'
+        ) else None
+        if not isinstance(targets, list):
+            raise serializers.ValidationError({
+                self.target_field: ['Expected a list of ids.']
+            })
+        if len(targets) > settings.BULK_MAX_TARGETS:
+            raise serializers.ValidationError({
+                self.target_field: [
+                    f'Ensure this list has no more than '
+                    f'{settings.BULK_MAX_TARGETS} ids.'
+                ]
+            })
+        items = []
+        for target in targets:
+            try:
+                items.append((self.target_id.run_validation(target), None))
+            except serializers.ValidationError as error:
+                items.append((target, error.detail[0]))
+        return items
+
+    def put(self, request):
+        items = self.get_items(request)
+        target_ids = {target for target, error in items if error is None}
+        rows = self.add_targets(request.user.id, target_ids) if (
+            target_ids
+        ) else {}
+        results = []
+        for target, error in items:
+            result = {self.result_field: target}
+            if error is None and target not in rows:
+                error = 'Not found.'
+            if error is None:
+                result['id'], result['created'] = rows[target]
+            else:
+                result['error'] = error
+            results.append(result)
+        return Response({'results': results})
+
+    def delete(self, request):
+        items = self.get_items(request)
+        target_ids = {target for target, error in items if error is None}
+        removed = self.remove_targets(request.user.id, target_ids) if (
+            target_ids
+        ) else set()
+        results = []
+        for target, error in items:
+            result = {self.result_field: target}
+            if error is None:
+                result['deleted'] = target in removed
+            else:
+                result['error'] = error
+            results.append(result)
+        return Response({'results': results})
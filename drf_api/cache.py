@@ -0,0 +1,177 @@
+import hashlib
+import threading
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from rest_framework.response import Response
+
+KEY_PREFIX = 'anoncache'
+
+
+def get_cache():
+    return caches[settings.ANONYMOUS_CACHE_ALIAS]
+
+
+def version_key(group):
+    return f'{KEY_PREFIX}:version:{group}'
+
+
+class CacheStats:
+    """
+    How many of this process's lookups in the logged out response cache
+    were hits and misses. They're counted in memory, as counting them in
+    the cache would add a write, and with the database cache a
+    transaction, to every logged out request.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+    def add(self, **counts):
+        with self.lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def as_dict(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (
+                    round(self.hits / lookups, 4) if lookups else None
+                ),
+            }
+
+
+anonymous_cache_stats = CacheStats()
+
+
+def invalidate(*groups):
+    """
+    Invalidate every cached response which depends on any of 'groups'.
+    Rather than finding and deleting keys, we give each group a new
+    version. The versions are part of each cache key, so the old entries
+    are never read again and simply expire.
+    The version is a random token rather than a counter, as incrementing
+    one reads and then writes it, so two processes invalidating at once,
+    or a version evicted in between, could bring back an old version.
+    """
+    get_cache().set_many(
+        {version_key(group): uuid.uuid4().hex for group in groups},
+        timeout=None
+    )
+
+
+def invalidate_now_and_on_commit(*groups):
+    """
+    Invalidate 'groups' straight away, and again once the transaction
+    commits, so a logged out request which read the old rows just before
+    the commit can't leave them cached.
+    """
+    invalidate(*groups)
+    transaction.on_commit(lambda: invalidate(*groups))
+
+
+def invalidate_on_change(model, group, fields=None):
+    """
+    Connect post_save and post_delete signals which invalidate 'group'
+    whenever an instance of 'model' changes. If 'fields' is given, saves
+    with update_fields which don't include any of them are ignored, e.g.
+    the last_login update when a user logs in.
+    """
+    def on_save(sender, update_fields=None, **kwargs):
+        if fields and update_fields is not None and not (
+            set(fields) & set(update_fields)
+        ):
+            return
+        invalidate_now_and_on_commit(group)
+
+    def on_delete(sender, **kwargs):
+        invalidate_now_and_on_commit(group)
+
+    uid = f'{KEY_PREFIX}:{model._meta.label}'
+    post_save.connect(on_save, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(
+        on_delete, sender=model, weak=False, dispatch_uid=uid
+    )
+
+
+def build_key(request, groups):
+    """
+    Build the cache key for a request from its path, its query string
+    with the parameters sorted and blank values dropped, and the current
+    version of each group the response depends on.
+    """
+    cache = get_cache()
+    version_keys = [version_key(group) for group in groups]
+    versions = cache.get_many(version_keys)
+    query = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values if value != ''
+    )
+    raw_key = '|'.join([
+        request.path,
+        '&'.join(f'{key}={value}' for key, value in query),
+        ','.join(str(versions.get(key, 0)) for key in version_keys),
+    ])
+    digest = hashlib.md5(raw_key.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:response:{digest}'
+
+
+class AnonymousCacheMixin:
+    """
+    Mixin for generic views which caches the response data of GET
+    requests from logged out users.
+    Logged out users all see the same data (is_owner is always false and
+    like_id and following_id are always None), so one cached copy can
+    serve them all. Logged in users always get a fresh response.
+    'cache_groups' lists the groups, usually one per model, whose changes
+    affect the view's data. Models invalidate their group from signals
+    set up with invalidate_on_change.
+    We cache the serialized data rather than the rendered response, so
+    content negotiation still works as normal.
+    """
+    cache_groups = ()
+
+    def get(self, request, *args, **kwargs):
+        if not self.uses_cache(request):
+            return super().get(request, *args, **kwargs)
+        response = self.get_cached_response(request)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            self.cache_response(request, response)
+        return response
+
+    def uses_cache(self, request):
+        return not request.user.is_authenticated and bool(self.cache_groups)
+
+    def get_cached_response(self, request):
+        # Return the cached response, or None on a miss
+        data = get_cache().get(build_key(request, self.cache_groups))
+        if data is None:
+            anonymous_cache_stats.add(misses=1)
+            return None
+        anonymous_cache_stats.add(hits=1)
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def cache_response(self, request, response):
+        # Streamed lists are too big to cache, see StreamingListMixin.
+        # They aren't DRF Responses, even once the async views have
+        # built them in full.
+        if response.status_code == 200 and isinstance(response, Response):
+            get_cache().set(
+                build_key(request, self.cache_groups), response.data,
+                settings.ANONYMOUS_CACHE_TIMEOUT
+            )
+        response['X-Cache'] = 'MISS'
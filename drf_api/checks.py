@@ -0,0 +1,123 @@
+from django.core.checks import Warning, register
+from django.core.exceptions import FieldDoesNotExist
+from django.urls import URLPattern, URLResolver, get_resolver
+
+
+def iter_view_classes(patterns):
+    """
+    Yield the class of every class-based DRF view in the URL patterns.
+    """
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_view_classes(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            view_class = getattr(pattern.callback, 'cls', None)
+            if view_class is not None:
+                yield view_class
+
+
+def index_columns(model):
+    """
+    Return the column lists of every index on 'model': single column
+    indexes from primary keys, unique fields and db_index (which foreign
+    keys have by default), plus Meta.indexes, unique_together and unique
+    constraints.
+    """
+    opts = model._meta
+
+    def columns(field_names):
+        return [
+            opts.get_field(name.lstrip('-')).column for name in field_names
+        ]
+
+    indexes = [
+        [field.column] for field in opts.concrete_fields
+        if field.primary_key or field.unique or field.db_index
+    ]
+    indexes += [columns(index.fields) for index in opts.indexes]
+    indexes += [columns(fields) for fields in opts.unique_together]
+    indexes += [
+        columns(constraint.fields) for constraint in opts.constraints
+        if getattr(constraint, 'fields', None)
+    ]
+    return indexes
+
+
+def is_indexed(model, column, after=None):
+    """
+    Check 'column' leads an index on 'model', or comes straight after
+    'after' (the column we joined the table on) in a composite index.
+    """
+    for columns in index_columns(model):
+        if columns[0] == column:
+            return True
+        if after is not None and columns[:2] == [after, column]:
+            return True
+    return False
+
+
+def has_supporting_index(model, path):
+    """
+    Walk a lookup path such as 'owner__followed__created_at' from 'model'
+    and check every join and the final field can use an index.
+    """
+    joined_on = None
+    for name in path.lstrip('-').split('__'):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        if field.is_relation and not field.concrete:
+            # A reverse relation joins on the foreign key column of the
+            # related model.
+            model = field.related_model
+            joined_on = field.field.column
+            if not is_indexed(model, joined_on):
+                return False
+            continue
+        if not is_indexed(model, field.column, after=joined_on):
+            return False
+        if field.is_relation:
+            model = field.related_model
+            joined_on = None
+    return True
+
+
+def check_view_indexes(view_classes):
+    warnings = []
+    for view_class in view_classes:
+        queryset = getattr(view_class, 'queryset', None)
+        if queryset is None:
+            continue
+        model = queryset.model
+        paths = [
+            *(getattr(view_class, 'filterset_fields', None) or []),
+            *(getattr(view_class, 'ordering_fields', None) or []),
+            *model._meta.ordering,
+        ]
+        for path in paths:
+            if path == '__all__' or has_supporting_index(model, path):
+                continue
+            warnings.append(Warning(
+                f"'{path}' on {view_class.__name__} has no supporting index",
+                hint=(
+                    f'Add an index on {model._meta.label} covering this '
+                    'path, using drf_api.operations.AddIndexSafely in the '
+                    'migration.'
+                ),
+                obj=view_class,
+                id='drf_api.W001',
+            ))
+    return warnings
+
+
+@register('indexes')
+def check_filter_and_ordering_indexes(app_configs, **kwargs):
+    """
+    List every filterset_fields and ordering_fields entry, and every
+    default model ordering, of our API views which no index supports.
+    """
+    view_classes = set(iter_view_classes(get_resolver().url_patterns))
+    return check_view_indexes(sorted(
+        view_classes, key=lambda view_class: view_class.__qualname__
+    ))
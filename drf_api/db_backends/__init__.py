@@ -0,0 +1,118 @@
+"""
+Database backends which keep each worker's connections open between
+requests, check them before each request uses them, and count how they
+are used. ENGINE is 'drf_api.db_backends.postgresql' or
+'drf_api.db_backends.sqlite3'.
+"""
+import os
+import threading
+import time
+import weakref
+from django.db import Error
+
+
+class ConnectionStats:
+    """
+    How this process's connections have been used. A connection is in
+    use from the first query of a request, or task, until the request
+    ends, and idle while it's kept open between them. 'wait' is the time
+    spent getting a usable connection, i.e. connecting and checking
+    connections which were kept open. Times are in seconds.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wrappers = weakref.WeakSet()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.opened = 0
+            self.reused = 0
+            self.broken = 0
+            self.checkouts = 0
+            self.wait_time = 0.0
+            self.max_wait_time = 0.0
+
+    def add(self, **counts):
+        with self.lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def add_wait(self, seconds):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_time += seconds
+            self.max_wait_time = max(self.max_wait_time, seconds)
+
+    def as_dict(self):
+        with self.lock:
+            wrappers = [
+                wrapper for wrapper in self.wrappers
+                if wrapper.connection is not None
+            ]
+            in_use = sum(wrapper.checked_out for wrapper in wrappers)
+            return {
+                'pid': os.getpid(),
+                'in_use': in_use,
+                'idle': len(wrappers) - in_use,
+                'opened': self.opened,
+                'reused': self.reused,
+                'broken': self.broken,
+                'checkouts': self.checkouts,
+                'wait_ms_mean': round(
+                    self.wait_time * 1000 / self.checkouts, 3
+                ) if self.checkouts else None,
+                'wait_ms_max': round(self.max_wait_time * 1000, 3),
+            }
+
+
+connection_stats = ConnectionStats()
+
+
+class PersistentConnectionMixin:
+    """
+    Mixin for a DatabaseWrapper which makes CONN_MAX_AGE connections
+    safe to keep. Django reuses a connection across requests until it's
+    CONN_MAX_AGE seconds old, but it only notices that one is broken,
+    e.g. because the database restarted or dropped it while idle, once
+    a query fails. Here, the first time each request, or task, uses a
+    connection which was kept open, it is checked with a cheap query,
+    and reopened if that fails. Connections opened during the request
+    aren't checked, nor are ones in a transaction.
+    Django closes connections at the end of each request if they're too
+    old or had errors, which is when they're checked in again.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checked_out = False
+        with connection_stats.lock:
+            connection_stats.wrappers.add(self)
+
+    def connect(self):
+        # The queries which set up a new connection don't check it
+        self.checked_out = True
+        super().connect()
+        connection_stats.add(opened=1)
+
+    def ensure_connection(self):
+        if self.checked_out:
+            return super().ensure_connection()
+        start = time.perf_counter()
+        if self.connection is not None and not self.in_atomic_block:
+            if self.is_usable():
+                connection_stats.add(reused=1)
+            else:
+                connection_stats.add(broken=1)
+                try:
+                    self.close()
+                except Error:
+                    pass
+        super().ensure_connection()
+        self.checked_out = True
+        connection_stats.add_wait(time.perf_counter() - start)
+
+    def close_if_unusable_or_obsolete(self):
+        # Django checks the connection here itself, so ours is skipped
+        self.checked_out = True
+        super().close_if_unusable_or_obsolete()
+        self.checked_out = False
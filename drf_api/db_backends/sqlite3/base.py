@@ -0,0 +1,6 @@
+from django.db.backends.sqlite3 import base
+from .. import PersistentConnectionMixin
+
+
+class DatabaseWrapper(PersistentConnectionMixin, base.DatabaseWrapper):
+    pass
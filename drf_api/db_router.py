@@ -0,0 +1,132 @@
+import asyncio
+import contextvars
+import random
+import time
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.views import APIView
+
+# The routing of the current request, set by ReplicaRoutingMiddleware
+routing = contextvars.ContextVar('routing', default=None)
+
+# The app label of the model Django's DatabaseCache routes its queries by
+CACHE_APP_LABEL = 'django_cache'
+
+
+class RequestRouting:
+    """
+    Where the current request reads from. 'replica' is the alias of the
+    replica it reads from, or None to read from the primary. Once the
+    request writes anything, it reads from the primary too.
+    """
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.wrote = False
+
+
+class ReplicaRouter:
+    """
+    Database router which sends the reads of safe requests to DRF views
+    to one of the DATABASE_REPLICAS, as chosen by ReplicaRoutingMiddleware.
+    Everything else, including every write, uses the primary, 'default'.
+    The replicas are copies of the primary, so they aren't migrated.
+    The database cache's table is only in the primary, and its writes,
+    e.g. caching a logged out response, don't pin the client, as they
+    aren't writes the client has to see.
+    """
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == CACHE_APP_LABEL:
+            return 'default'
+        state = routing.get()
+        if state is None or state.wrote:
+            return None
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = routing.get()
+        if state is not None and model._meta.app_label != CACHE_APP_LABEL:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every database holds the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Send GET, HEAD and OPTIONS requests to DRF views to a read replica,
+    if there are any, so the list views don't compete with writes on the
+    primary.
+    Replicas lag a little behind the primary, so after a client makes
+    a request which writes, e.g. a new post, it reads from the primary
+    for REPLICA_PIN_SECONDS, to see its own writes. The client is pinned
+    with a cookie, which works whichever way it authenticates.
+    Streamed responses read the rows after the first page from the
+    primary, as they are read once the middleware has returned.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Served by ASGI, see drf_api/timing.py
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state = RequestRouting()
+        token = routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing.reset(token)
+        return self.pin(request, response, state)
+
+    # The async views' queries run in other threads, with copies of the
+    # context, which hold the same RequestRouting
+    async def __acall__(self, request):
+        state = RequestRouting()
+        token = routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing.reset(token)
+        return self.pin(request, response, state)
+
+    def pin(self, request, response, state):
+        # Clients which wrote read from the primary for a while
+        if request.method not in SAFE_METHODS or state.wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                str(time.time() + settings.REPLICA_PIN_SECONDS),
+                max_age=settings.REPLICA_PIN_SECONDS,
+                secure=settings.JWT_AUTH_SECURE,
+                httponly=True,
+                samesite=settings.JWT_AUTH_SAMESITE,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'cls', None)
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method in SAFE_METHODS
+            and isinstance(view, type) and issubclass(view, APIView)
+            and not self.is_pinned(request)
+        ):
+            routing.get().replica = random.choice(settings.DATABASE_REPLICAS)
+
+    def is_pinned(self, request):
+        try:
+            pinned_until = float(
+                request.COOKIES.get(settings.REPLICA_PIN_COOKIE, 0)
+            )
+        except ValueError:
+            return False
+        return pinned_until > time.time()
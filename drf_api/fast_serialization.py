@@ -0,0 +1,208 @@
+from collections import OrderedDict
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import FileField
+from django.db.models.fields.files import FieldFile
+from rest_framework import serializers
+from rest_framework.relations import PKOnlyObject, PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+
+class Row(dict):
+    """
+    A row from .values() which also allows attribute access, e.g.
+    row.owner_id, so that SerializerMethodField methods written for model
+    instances work on it unchanged.
+    """
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class FastRepresentation:
+    """
+    Serializes rows from .values() into exactly the same data the
+    serializer would produce from model instances, without building a
+    model instance, its related instances and their field descriptors
+    for every row.
+    When created, it works out from the serializer's fields which columns
+    to fetch and how to turn each one into output:
+    - model fields and dotted sources such as 'owner.profile.id' become
+      lookups such as 'owner__profile__id', and the value goes through
+      the serializer field's own to_representation, so formats such as
+      DATETIME_FORMAT still apply
+    - image fields are wrapped in a FieldFile, and a '.url' source calls
+      the storage backend, just as reading them from an instance would
+    - primary key related fields are wrapped in a PKOnlyObject, as DRF
+      does itself
+    - SerializerMethodFields are called with the Row, which has the
+      columns listed in the serializer's 'fast_row_fields'
+    Anything else raises ImproperlyConfigured, so a serializer which can't
+    be represented exactly is caught in development rather than sending
+    different data.
+    """
+    def __init__(self, serializer, extra_fields=()):
+        self.serializer = serializer
+        model = serializer.Meta.model
+        lookups = [model._meta.pk.name]
+        lookups += getattr(serializer, 'fast_row_fields', [])
+        lookups += extra_fields
+        self.accessors = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            accessor, lookup = self.compile_field(model, field)
+            self.accessors.append((name, accessor))
+            if lookup is not None:
+                lookups.append(lookup)
+        # Keep the order, but fetch each column once
+        self.lookups = list(OrderedDict.fromkeys(lookups))
+
+        clashes = set(self.lookups) & set(dir(dict))
+        if clashes:
+            raise ImproperlyConfigured(
+                f'{type(serializer).__name__} fetches columns which clash '
+                f'with dict attributes: {", ".join(sorted(clashes))}'
+            )
+
+    def compile_field(self, model, field):
+        if isinstance(field, serializers.SerializerMethodField):
+            method = getattr(self.serializer, field.method_name)
+            return method, None
+
+        attrs = list(field.source_attrs)
+        path = []
+        current = model
+        for index, attr in enumerate(attrs):
+            last = index == len(attrs) - 1
+            if attr == 'pk':
+                attr = current._meta.pk.name
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                break
+            path.append(attr)
+            lookup = '__'.join(path)
+            if model_field.is_relation and not last:
+                current = model_field.related_model
+                continue
+            if model_field.is_relation and isinstance(
+                field, PrimaryKeyRelatedField
+            ):
+                return self.pk_accessor(field, lookup), lookup
+            if model_field.is_relation:
+                break
+            if isinstance(model_field, FileField):
+                if last:
+                    return self.file_accessor(
+                        field, lookup, model_field
+                    ), lookup
+                if attrs[index + 1:] == ['url']:
+                    return self.file_url_accessor(
+                        lookup, model_field
+                    ), lookup
+                break
+            if last:
+                return self.value_accessor(field, lookup), lookup
+            break
+
+        raise ImproperlyConfigured(
+            f"Field '{field.field_name}' of {type(self.serializer).__name__} "
+            f"with source '{field.source}' can't be serialized from rows"
+        )
+
+    # Each accessor mirrors Serializer.to_representation for one field:
+    # None stays None, anything else goes through the field.
+    @staticmethod
+    def value_accessor(field, lookup):
+        to_representation = field.to_representation
+
+        def accessor(row):
+            value = row[lookup]
+            return None if value is None else to_representation(value)
+        return accessor
+
+    @staticmethod
+    def pk_accessor(field, lookup):
+        to_representation = field.to_representation
+
+        def accessor(row):
+            value = row[lookup]
+            if value is None:
+                return None
+            return to_representation(PKOnlyObject(pk=value))
+        return accessor
+
+    @staticmethod
+    def file_accessor(field, lookup, model_field):
+        to_representation = field.to_representation
+
+        def accessor(row):
+            return to_representation(
+                FieldFile(None, model_field, row[lookup])
+            )
+        return accessor
+
+    @staticmethod
+    def file_url_accessor(lookup, model_field):
+        def accessor(row):
+            return FieldFile(None, model_field, row[lookup]).url
+        return accessor
+
+    def to_representation(self, row):
+        return OrderedDict(
+            (name, accessor(row)) for name, accessor in self.accessors
+        )
+
+
+class FastListMixin:
+    """
+    Mixin for list views which serializes the page from .values() rows
+    rather than model instances, see FastRepresentation.
+    The list serializer's prepare() hook still runs for the page, so
+    per-user values such as like_id are looked up in one query as usual.
+    Turn it off with the FAST_LIST_SERIALIZATION setting to compare
+    against, or fall back to, the normal serializers.
+    """
+    def use_fast_serialization(self):
+        return getattr(settings, 'FAST_LIST_SERIALIZATION', False)
+
+    def get_fast_representation(self, list_serializer):
+        return FastRepresentation(
+            list_serializer.child,
+            extra_fields=getattr(self, 'keyset_fields', ())
+        )
+
+    # The filtered queryset for the list, as .values() rows when the
+    # fast path is on. StreamingListMixin uses this too.
+    def get_list_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if not self.use_fast_serialization():
+            return queryset
+        fast = self.get_fast_representation(
+            self.get_serializer([], many=True)
+        )
+        # .values() does its own joins, so select_related isn't needed
+        return queryset.select_related(None).values(*fast.lookups)
+
+    # Serialize a page, or any other batch, of the list
+    def serialize_page(self, objects):
+        list_serializer = self.get_serializer(objects, many=True)
+        if not self.use_fast_serialization():
+            return list_serializer.data
+        rows = [Row(row) for row in objects]
+        if hasattr(list_serializer, 'prepare'):
+            list_serializer.prepare(rows)
+        fast = self.get_fast_representation(list_serializer)
+        return [fast.to_representation(row) for row in rows]
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_list_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_page(page))
+        return Response(self.serialize_page(queryset))
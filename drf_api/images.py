@@ -0,0 +1,279 @@
+import datetime
+import io
+import logging
+import os
+import uuid
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image
+from rest_framework import serializers
+from tasks.queue import enqueue
+from .cache import invalidate
+
+logger = logging.getLogger(__name__)
+
+# Values of the image_status field on Post and Profile
+IMAGE_PROCESSING = 'processing'
+IMAGE_READY = 'ready'
+IMAGE_FAILED = 'failed'
+IMAGE_STATUS_CHOICES = [
+    (IMAGE_PROCESSING, 'Processing'),
+    (IMAGE_READY, 'Ready'),
+    (IMAGE_FAILED, 'Failed'),
+]
+
+# Sent with the model and the pk once process_image has updated an
+# instance, which it does with update(), so post_save isn't sent
+image_processed = Signal()
+
+# Resized copies made of every uploaded image, by the longest side
+IMAGE_VARIANT_SIZES = {
+    'thumbnail': 150,
+    'medium': 600,
+}
+
+
+class ProbedImageField(serializers.ImageField):
+    """
+    ImageField which only reads the image's header to check it is an
+    image and find its format and dimensions. The default ImageField has
+    Pillow verify the whole file during the request. Here the image is
+    only fully decoded later, when the variants are made in the
+    background, see process_image.
+    Images wider than 'max_width' or taller than 'max_height' pixels are
+    rejected from the header too, so the background decode never has to
+    hold a huge image in memory.
+    Like the default field, the validated file has the Pillow image,
+    which hasn't been decoded, as its 'image' attribute.
+    """
+    default_error_messages = {
+        'too_wide': 'Image width greater than {max_width}px',
+        'too_tall': 'Image height greater than {max_height}px',
+    }
+
+    def __init__(self, max_width=4096, max_height=4096, **kwargs):
+        self.max_width = max_width
+        self.max_height = max_height
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        # Skip ImageField's full verification, but keep FileField's checks
+        file_object = serializers.FileField.to_internal_value(self, data)
+        try:
+            file_object.seek(0)
+            image = Image.open(file_object)
+        except (OSError, Image.DecompressionBombError):
+            self.fail('invalid_image')
+        if image.width > self.max_width:
+            self.fail('too_wide', max_width=self.max_width)
+        if image.height > self.max_height:
+            self.fail('too_tall', max_height=self.max_height)
+        file_object.image = image
+        file_object.content_type = Image.MIME.get(image.format)
+        file_object.seek(0)
+        return file_object
+
+
+class BackgroundImageMixin:
+    """
+    Mixin for ModelSerializers of models with an image, image_status,
+    image_variants and image_job field.
+    An uploaded image is stored as it is during the request, but not
+    decoded or resized. The instance is saved with image_status
+    'processing' and keeps its previous image, and a task on the task
+    queue makes the resized variants, then points the instance at them
+    and marks the image 'ready', or 'failed' if anything went wrong.
+    Clients poll the detail view to see when it's done.
+    Each upload gets a new image_job, so if another is uploaded before
+    the first is done, only the last one's outcome is kept.
+    'image_cache_group' is the cache group invalidated once it's done.
+    """
+    image_cache_group = None
+
+    def create(self, validated_data):
+        upload = self.pop_upload(validated_data)
+        instance = super().create(validated_data)
+        if upload is not None:
+            schedule_image_processing(
+                instance, upload, self.image_cache_group
+            )
+        return instance
+
+    def update(self, instance, validated_data):
+        upload = self.pop_upload(validated_data)
+        instance = super().update(instance, validated_data)
+        if upload is not None:
+            schedule_image_processing(
+                instance, upload, self.image_cache_group
+            )
+        return instance
+
+    def pop_upload(self, validated_data):
+        upload = validated_data.pop('image', None)
+        if upload is None:
+            return None
+        validated_data['image_status'] = IMAGE_PROCESSING
+        validated_data['image_job'] = uuid.uuid4().hex
+        return upload
+
+    def get_image_variants(self, obj):
+        storage = self.Meta.model._meta.get_field('image').storage
+        return {
+            name: storage.url(path)
+            for name, path in (obj.image_variants or {}).items()
+        }
+
+
+def schedule_image_processing(instance, upload, cache_group=None):
+    """
+    Store 'upload' and queue the 'images.process' task to process it for
+    'instance'. The upload is stored rather than passed to the task, so
+    any worker can process it, even after a restart, and it's stored
+    where the image will be kept, so it doesn't have to be copied.
+    The tasks are queued in the current transaction, but the file is
+    stored straight away, so it's left behind if the transaction rolls
+    back.
+    An 'images.fail_if_stuck' task is queued too, to mark the image as
+    failed if it still isn't processed after IMAGE_PROCESSING_TIMEOUT
+    seconds, e.g. because its task ran out of attempts.
+    """
+    field = instance._meta.get_field('image')
+    upload.seek(0)
+    path = field.storage.save(
+        field.generate_filename(None, os.path.basename(upload.name)), upload
+    )
+    kwargs = {
+        'model_label': instance._meta.label,
+        'pk': instance.pk,
+        'job': instance.image_job,
+        'path': path,
+        'cache_group': cache_group,
+    }
+    enqueue(
+        'images.process', kwargs,
+        idempotency_key=f'images.process:{instance.image_job}'
+    )
+    enqueue(
+        'images.fail_if_stuck', kwargs,
+        idempotency_key=f'images.fail_if_stuck:{instance.image_job}',
+        delay=datetime.timedelta(seconds=settings.IMAGE_PROCESSING_TIMEOUT)
+    )
+
+
+def resize(image, size):
+    """
+    Return 'image' scaled down to fit within size x size pixels, encoded
+    in its original format.
+    """
+    variant = image.copy()
+    variant.thumbnail((size, size))
+    if image.format == 'JPEG' and variant.mode not in ('RGB', 'L'):
+        variant = variant.convert('RGB')
+    output = io.BytesIO()
+    variant.save(output, format=image.format)
+    return output.getvalue()
+
+
+def image_done(model, pk, cache_group=None):
+    # update() doesn't send signals, so invalidate cached responses
+    if cache_group is not None:
+        invalidate(cache_group)
+    image_processed.send(sender=model, pk=pk)
+
+
+def process_image(model_label, pk, job, path, cache_group=None):
+    """
+    Decode the stored upload at 'path', store its variants, then point
+    the instance at them. This runs in the task queue's worker.
+    The instance is only updated while its image_job is still 'job', so
+    a slow job can't overwrite the image uploaded after it. The upload
+    and its variants are deleted instead, as they are when the image
+    can't be processed.
+    """
+    model = apps.get_model(model_label)
+    field = model._meta.get_field('image')
+    current = model.objects.filter(pk=pk, image_job=job)
+    saved = [path]
+    if not current.exists():
+        # Another upload, or the stuck check, got there first
+        field.storage.delete(path)
+        return
+    try:
+        with field.storage.open(path) as stored:
+            content = stored.read()
+        image = Image.open(io.BytesIO(content))
+        image.load()
+        stem, extension = os.path.splitext(path)
+        variants = {}
+        for variant, size in IMAGE_VARIANT_SIZES.items():
+            variants[variant] = field.storage.save(
+                f'{stem}_{variant}{extension}',
+                ContentFile(resize(image, size))
+            )
+            saved.append(variants[variant])
+        updated = current.update(
+            image=path, image_variants=variants, image_status=IMAGE_READY,
+            image_job='', updated_at=timezone.now(),
+        )
+    except Exception:
+        logger.exception('Processing image %s of %s %s failed',
+                         path, model_label, pk)
+        updated = 0
+        current.update(
+            image_status=IMAGE_FAILED, image_job='',
+            updated_at=timezone.now()
+        )
+    if not updated:
+        for saved_path in saved:
+            field.storage.delete(saved_path)
+    image_done(model, pk, cache_group)
+
+
+def fail_if_stuck(model_label, pk, job, path, cache_group=None):
+    """
+    Mark the image as failed if 'job' is still processing, and delete its
+    stored upload. If the job does finish later, it leaves the instance
+    alone, as its image_job has changed.
+    """
+    model = apps.get_model(model_label)
+    failed = model.objects.filter(
+        pk=pk, image_job=job, image_status=IMAGE_PROCESSING
+    ).update(
+        image_status=IMAGE_FAILED, image_job='', updated_at=timezone.now()
+    )
+    if failed:
+        model._meta.get_field('image').storage.delete(path)
+        image_done(model, pk, cache_group)
+
+
+def fail_stuck_images(model_label, cache_group=None):
+    """
+    Mark the images of 'model_label' which have been processing for more
+    than IMAGE_PROCESSING_TIMEOUT seconds as failed, and return how many
+    there were. Each upload queues its own check, see
+    schedule_image_processing, so this only finds images whose check
+    was lost, e.g. when its task was deleted. The client has to upload
+    them again.
+    """
+    model = apps.get_model(model_label)
+    stuck = model.objects.filter(
+        image_status=IMAGE_PROCESSING,
+        updated_at__lt=timezone.now() - datetime.timedelta(
+            seconds=settings.IMAGE_PROCESSING_TIMEOUT
+        ),
+    )
+    pks = list(stuck.values_list('pk', flat=True))
+    if not pks:
+        return 0
+    # Only those still stuck, in case one finished in the meantime
+    failed = stuck.filter(pk__in=pks).update(
+        image_status=IMAGE_FAILED, image_job='', updated_at=timezone.now()
+    )
+    if cache_group is not None:
+        invalidate(cache_group)
+    for pk in pks:
+        image_processed.send(sender=model, pk=pk)
+    return failed
@@ -0,0 +1,200 @@
+import asyncio
+import contextvars
+import json
+import statistics
+import time
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# Seconds each query waits before it runs, in every thread, while the
+# command is measuring
+simulated_latency = contextvars.ContextVar('simulated_latency', default=0)
+
+
+def add_latency(execute, sql, params, many, context):
+    latency = simulated_latency.get()
+    if latency:
+        time.sleep(latency)
+    return execute(sql, params, many, context)
+
+
+def install_latency(sender, connection, **kwargs):
+    # Receiver for the connection_created signal
+    if add_latency not in connection.execute_wrappers:
+        connection.execute_wrappers.append(add_latency)
+
+
+class Command(BaseCommand):
+    """
+    Compare how many requests a second one worker serves through the
+    WSGI entry point, which handles one request at a time, and through
+    the ASGI one, whose async read views (see drf_api/async_views.py)
+    wait on the database for --concurrency requests, and on several
+    queries for each, at once.
+    The same request is made --requests times each way, in this process,
+    through the test clients, logged in, as logged out requests are
+    mostly served from the cache, with connections kept between them.
+    Against a local database the queries return at once, so there's
+    little to overlap, and the ASGI worker's extra thread hops make it
+    slower; --db-latency adds a wait to every query, e.g. 2 for a
+    database in the same data centre, to see what happens when each
+    query costs a network round trip.
+    The results are reported as JSON.
+    """
+    help = 'Compare requests per second of one WSGI and one ASGI worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Number of timed requests for each entry point',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=10,
+            help='Number of requests the ASGI worker is sent at once',
+        )
+        parser.add_argument(
+            '--path', default='/posts/', help='The path to request',
+        )
+        parser.add_argument(
+            '--db-latency', type=float, default=0,
+            help='Milliseconds to add to every query',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 2:
+            raise CommandError('--requests has to be at least 2')
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency has to be at least 1')
+        user = User.objects.filter(is_active=True).first()
+        if user is None:
+            raise CommandError(
+                'There are no users, run seed_social_graph first'
+            )
+        self.user = user
+        self.path = options['path']
+
+        connection_created.connect(install_latency)
+        for connection in connections.all():
+            install_latency(None, connection)
+        token = simulated_latency.set(options['db_latency'] / 1000)
+        # Keep connections, as in production, in every thread
+        database = connections['default'].settings_dict
+        max_age = database['CONN_MAX_AGE']
+        database['CONN_MAX_AGE'] = settings.DATABASE_CONN_MAX_AGE or 600
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                DEBUG=False,
+            ):
+                results = {'wsgi': self.measure_wsgi(options['requests'])}
+                clients = [
+                    self.log_in(AsyncClient())
+                    for _ in range(options['concurrency'])
+                ]
+                with override_settings(ROOT_URLCONF='drf_api.async_urls'):
+                    results['asgi'] = async_to_sync(self.measure_asgi)(
+                        clients, options['requests']
+                    )
+        finally:
+            database['CONN_MAX_AGE'] = max_age
+            simulated_latency.reset(token)
+            connection_created.disconnect(install_latency)
+
+        speedup = round(
+            results['asgi']['requests_per_second']
+            / results['wsgi']['requests_per_second'], 2
+        )
+        self.stderr.write(
+            f'One ASGI worker served {speedup} times the requests a second '
+            f'of one WSGI worker'
+        )
+        self.stdout.write(json.dumps({
+            'meta': {
+                'database': connections['default'].vendor,
+                'path': self.path,
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'db_latency_ms': options['db_latency'],
+                'async_query_threads': settings.ASYNC_QUERY_THREADS,
+            },
+            'results': results,
+            'speedup': speedup,
+        }, indent=2))
+
+    def log_in(self, client):
+        # Log in for whichever authentication the settings use
+        client.force_login(self.user)
+        client.cookies[settings.JWT_AUTH_COOKIE] = str(
+            RefreshToken.for_user(self.user).access_token
+        )
+        return client
+
+    def check(self, response):
+        if response.status_code != 200:
+            raise CommandError(
+                f'{self.path} returned {response.status_code}, not 200'
+            )
+
+    def measure_wsgi(self, requests):
+        client = self.log_in(Client())
+
+        def request():
+            start = time.perf_counter()
+            response = client.get(self.path, HTTP_ACCEPT='application/json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            # The test client doesn't close connections itself
+            close_old_connections()
+            return response, (time.perf_counter() - start) * 1000
+
+        # The first request warms up caches
+        self.check(request()[0])
+        start = time.perf_counter()
+        timings = [request()[1] for _ in range(requests)]
+        return self.summarize(timings, time.perf_counter() - start)
+
+    async def measure_asgi(self, clients, requests):
+
+        async def request(client):
+            start = time.perf_counter()
+            response = await client.get(
+                self.path, HTTP_ACCEPT='application/json'
+            )
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response, (time.perf_counter() - start) * 1000
+
+        # Each client makes its share of the requests, one after another
+        async def run(client, count):
+            return [(await request(client))[1] for _ in range(count)]
+
+        self.check((await request(clients[0]))[0])
+        shares = [
+            requests // len(clients) + (index < requests % len(clients))
+            for index in range(len(clients))
+        ]
+        start = time.perf_counter()
+        timings = await asyncio.gather(*[
+            run(client, share) for client, share in zip(clients, shares)
+        ])
+        return self.summarize(
+            [timing for share in timings for timing in share],
+            time.perf_counter() - start
+        )
+
+    def summarize(self, timings, seconds):
+        percentiles = statistics.quantiles(
+            timings, n=100, method='inclusive'
+        )
+        return {
+            'requests_per_second': round(len(timings) / seconds, 1),
+            'p50_ms': round(percentiles[49], 3),
+            'p95_ms': round(percentiles[94], 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+        }
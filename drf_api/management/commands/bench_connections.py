@@ -0,0 +1,123 @@
+import json
+import statistics
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from drf_api.db_backends import connection_stats
+
+
+class Command(BaseCommand):
+    """
+    Measure how much time keeping database connections open between
+    requests saves. The same request is made --repeat times connecting
+    to the database for each one, as with a CONN_MAX_AGE of 0, and then
+    reusing one kept connection, which is checked before each request,
+    as in production. Run it against a local database, e.g. with
+    DATABASE_URL set to a local PostgreSQL. The saving there is mostly
+    the handshake and authentication, and is larger over a network.
+    Requests are made through the test client, logged in, as logged out
+    ones are mostly served from the cache, with old connections closed
+    before and after each, as Django does for real requests. The results
+    are reported as JSON.
+    """
+    help = 'Compare request latency with and without kept connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=200,
+            help='Number of timed requests for each way of connecting',
+        )
+        parser.add_argument(
+            '--path', default='/posts/', help='The path to request',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 2:
+            raise CommandError('--repeat has to be at least 2')
+        user = User.objects.filter(is_active=True).first()
+        if user is None:
+            raise CommandError(
+                'There are no users, run seed_social_graph first'
+            )
+        client = Client()
+        # Log in for whichever authentication the settings use
+        client.force_login(user)
+        client.cookies[settings.JWT_AUTH_COOKIE] = str(
+            RefreshToken.for_user(user).access_token
+        )
+        max_age = connection.settings_dict['CONN_MAX_AGE']
+        results = {}
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                DEBUG=False,
+            ):
+                for name, conn_max_age in (
+                    ('per_request', 0),
+                    ('kept', settings.DATABASE_CONN_MAX_AGE or 600),
+                ):
+                    connection.close()
+                    connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+                    results[name] = self.measure(
+                        client, options['path'], options['repeat']
+                    )
+        finally:
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = max_age
+
+        saved = {
+            key: round(
+                results['per_request'][key] - results['kept'][key], 3
+            )
+            for key in ('p50_ms', 'p95_ms', 'mean_ms')
+        }
+        self.stderr.write(
+            f"Kept connections save {saved['p50_ms']} ms per request at "
+            f"p50 and {saved['p95_ms']} ms at p95"
+        )
+        self.stdout.write(json.dumps({
+            'meta': {
+                'database': connection.vendor,
+                'engine': connection.settings_dict['ENGINE'],
+                'path': options['path'],
+                'repeat': options['repeat'],
+            },
+            'results': results,
+            'saved': saved,
+        }, indent=2))
+
+    def request(self, client, path):
+        # The test client doesn't close connections itself
+        close_old_connections()
+        start = time.perf_counter()
+        response = client.get(path, HTTP_ACCEPT='application/json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        close_old_connections()
+        return response, (time.perf_counter() - start) * 1000
+
+    def measure(self, client, path, repeat):
+        # The first request warms up caches
+        response, _ = self.request(client, path)
+        if response.status_code != 200:
+            raise CommandError(
+                f'{path} returned {response.status_code}, not 200'
+            )
+        connection_stats.reset()
+        timings = [self.request(client, path)[1] for _ in range(repeat)]
+        stats = connection_stats.as_dict()
+        percentiles = statistics.quantiles(
+            timings, n=100, method='inclusive'
+        )
+        return {
+            'p50_ms': round(percentiles[49], 3),
+            'p95_ms': round(percentiles[94], 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'connections_opened': stats['opened'],
+            'connections_reused': stats['reused'],
+            'wait_ms_mean': stats['wait_ms_mean'],
+        }
@@ -0,0 +1,248 @@
+import datetime
+import json
+import statistics
+import subprocess
+import time
+import tracemalloc
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from comments.models import Comment
+from drf_api.timing import RequestTimings
+from followers.models import Follower
+from likes.models import Like
+from posts.models import Post
+from profiles.models import Profile
+
+
+def get_subjects():
+    """
+    Return the most commented post, the most followed profile and the
+    profile of the user who follows the most accounts, which get_endpoints
+    shows, or None for each if there are no posts.
+    """
+    post = Post.objects.order_by('-comments_count').first()
+    if post is None:
+        return None, None, None
+    return (
+        post,
+        Profile.objects.order_by('-followers_count').first(),
+        Profile.objects.order_by('-following_count').first(),
+    )
+
+
+def get_endpoints(post, profile, viewer, anonymous=False):
+    """
+    Return the (name, path) of every list and detail endpoint, showing
+    'post', 'profile' and the comments, likes and follows of 'viewer',
+    who is logged in unless 'anonymous'.
+    """
+    endpoints = [
+        ('post-list', '/posts/'),
+        ('post-detail', f'/posts/{post.id}/'),
+        ('post-list-followed', (
+            f'/posts/?owner__followed__owner__profile={viewer.id}'
+        )),
+        ('post-list-liked', f'/posts/?likes__owner__profile={viewer.id}'),
+        ('post-search', '/posts/?search=light'),
+        ('profile-list', '/profiles/'),
+        ('profile-list-followers', (
+            f'/profiles/?owner__following__followed__profile='
+            f'{profile.id}'
+        )),
+        ('profile-detail', f'/profiles/{profile.id}/'),
+        ('comment-list', '/comments/'),
+        ('comment-list-post', f'/comments/?post={post.id}'),
+        ('like-list', '/likes/'),
+        ('follower-list', '/followers/'),
+    ]
+    # The comment detail URL has no trailing slash
+    details = [
+        ('comment-detail', '/comments/{}', Comment.objects.first()),
+        ('like-detail', '/likes/{}/', Like.objects.first()),
+        ('follower-detail', '/followers/{}/', Follower.objects.first()),
+    ]
+    endpoints += [
+        (name, path.format(instance.id))
+        for name, path, instance in details if instance is not None
+    ]
+    if not anonymous:
+        endpoints.append(('feed', '/feed/'))
+    return endpoints
+
+
+class Command(BaseCommand):
+    """
+    Request every list and detail endpoint through the test client and
+    report, as JSON, the status, SQL query count and time, response
+    size, p50, p95 and p99 latency and peak Python memory of each. Seed
+    the database with seed_social_graph first.
+    The detail endpoints use the most commented post, the most followed
+    profile, and so on. Requests are made as the user who follows the
+    most accounts, or with --anonymous, logged out, in which case the
+    cached views serve most requests from the cache.
+    Save the output with --output and pass it to --compare on a later
+    run to see what changed, e.g. across commits.
+    """
+    help = 'Benchmark the API endpoints and report the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Number of timed requests per endpoint',
+        )
+        parser.add_argument(
+            '--anonymous', action='store_true',
+            help='Make the requests logged out',
+        )
+        parser.add_argument(
+            '--output', help='Write the results to this file',
+        )
+        parser.add_argument(
+            '--compare', help='Results of an earlier run to compare with',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 2:
+            raise CommandError('--repeat has to be at least 2')
+        post, profile, viewer = get_subjects()
+        if post is None:
+            raise CommandError(
+                'There are no posts, run seed_social_graph first'
+            )
+
+        client = Client()
+        if not options['anonymous']:
+            # Log in for whichever authentication the settings use
+            client.force_login(viewer.owner)
+            client.cookies[settings.JWT_AUTH_COOKIE] = str(
+                RefreshToken.for_user(viewer.owner).access_token
+            )
+
+        results = {}
+        # Without DEBUG, as it logs every query, which slows them down
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            DEBUG=False,
+        ):
+            for name, path in get_endpoints(
+                post, profile, viewer, options['anonymous']
+            ):
+                results[name] = self.measure(
+                    client, path, options['repeat']
+                )
+                self.stderr.write(
+                    f"{name}: {results[name]['queries']} queries, "
+                    f"p50 {results[name]['p50_ms']} ms"
+                )
+
+        report = {
+            'meta': {
+                'commit': self.get_commit(),
+                'created_at': datetime.datetime.now(
+                    datetime.timezone.utc
+                ).isoformat(),
+                'database': connection.vendor,
+                'anonymous': options['anonymous'],
+                'repeat': options['repeat'],
+                'rows': {
+                    model.__name__: model.objects.count()
+                    for model in (Profile, Follower, Post, Like, Comment)
+                },
+            },
+            'endpoints': results,
+        }
+        if options['compare']:
+            with open(options['compare']) as file:
+                self.compare(json.load(file), report)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def request(self, client, path):
+        response = client.get(path, HTTP_ACCEPT='application/json')
+        # Read streamed responses to the end, as a client would
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        return response, content
+
+    def measure(self, client, path, repeat):
+        # The first request warms up caches and connections
+        response, content = self.request(client, path)
+        # Count the queries the way ServerTimingMiddleware does
+        queries = RequestTimings()
+        with connection.execute_wrapper(queries):
+            self.request(client, path)
+        tracemalloc.start()
+        try:
+            self.request(client, path)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            self.request(client, path)
+            timings.append((time.perf_counter() - start) * 1000)
+        percentiles = statistics.quantiles(
+            timings, n=100, method='inclusive'
+        )
+        return {
+            'path': path,
+            'status': response.status_code,
+            'bytes': len(content),
+            'queries': queries.queries,
+            'db_ms': round(queries.db_time * 1000, 2),
+            'p50_ms': round(percentiles[49], 2),
+            'p95_ms': round(percentiles[94], 2),
+            'p99_ms': round(percentiles[98], 2),
+            'peak_memory_kib': round(peak_memory / 1024, 1),
+        }
+
+    def get_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def compare(self, before, after):
+        """
+        Add the change since the 'before' run to each endpoint in 'after'
+        which both have, and list the changes on stderr.
+        """
+        self.stderr.write(
+            f"Compared with {before['meta'].get('commit')} "
+            f"({before['meta'].get('created_at')}):"
+        )
+        for name, result in after['endpoints'].items():
+            previous = before['endpoints'].get(name)
+            if previous is None:
+                continue
+            change = {
+                'queries': result['queries'] - previous['queries'],
+                'p50_ms': round(result['p50_ms'] - previous['p50_ms'], 2),
+                'p95_ms': round(result['p95_ms'] - previous['p95_ms'], 2),
+                'peak_memory_kib': round(
+                    result['peak_memory_kib'] - previous['peak_memory_kib'], 1
+                ),
+            }
+            result['change'] = change
+            flag = ' <- more queries' if change['queries'] > 0 else ''
+            self.stderr.write(
+                f"{name}: {change['queries']:+d} queries, "
+                f"p50 {change['p50_ms']:+.2f} ms, "
+                f"p95 {change['p95_ms']:+.2f} ms{flag}"
+            )
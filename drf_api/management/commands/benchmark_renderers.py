@@ -0,0 +1,99 @@
+import itertools
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from drf_api.renderers import FastJSONRenderer
+from posts.models import Post
+from posts.serializers import PostSerializer
+
+
+class Command(BaseCommand):
+    """
+    Compare DRF's JSONRenderer with FastJSONRenderer on real PostSerializer
+    output, as a logged out user would see it. The posts in the database
+    are serialized once and repeated up to --rows, then each renderer
+    renders the list --repeat times and we report the best time.
+    It also compares the peak memory of rendering the whole list at once
+    with rendering it in chunks, as StreamingListMixin does.
+    """
+    help = 'Benchmark the JSON renderers on serialized posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=1000,
+            help='Number of serialized posts in the rendered list',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Number of times each renderer renders the list',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=200,
+            help='Number of posts rendered at a time when streaming',
+        )
+
+    def handle(self, *args, **options):
+        posts = list(
+            Post.objects.select_related('owner__profile')[:options['rows']]
+        )
+        if not posts:
+            raise CommandError('There are no posts to serialize')
+        request = Request(RequestFactory().get('/posts/'))
+        serialized = PostSerializer(
+            posts, many=True, context={'request': request}
+        ).data
+        data = list(itertools.islice(
+            itertools.cycle(serialized), options['rows']
+        ))
+
+        baseline = JSONRenderer().render(data)
+        fast = FastJSONRenderer().render(data)
+        if fast != baseline:
+            raise CommandError('The renderers produced different output')
+        self.stdout.write(
+            f'{len(data)} posts from {len(posts)} distinct, '
+            f'{len(baseline)} bytes'
+        )
+
+        results = {}
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                renderer.render(data)
+                timings.append(time.perf_counter() - start)
+            name = type(renderer).__name__
+            results[name] = min(timings)
+            self.stdout.write(f'{name}: {min(timings) * 1000:.2f} ms')
+        self.stdout.write(self.style.SUCCESS(
+            f"FastJSONRenderer is "
+            f"{results['JSONRenderer'] / results['FastJSONRenderer']:.1f}x "
+            f"faster"
+        ))
+
+        renderer = FastJSONRenderer()
+        whole = self.peak_memory(lambda: renderer.render(data))
+        chunk_size = options['chunk_size']
+
+        def render_in_chunks():
+            for start in range(0, len(data), chunk_size):
+                b','.join(
+                    renderer.render(item)
+                    for item in data[start:start + chunk_size]
+                )
+        chunked = self.peak_memory(render_in_chunks)
+        self.stdout.write(
+            f'Peak memory rendering the whole list: {whole / 1024:.0f} KiB, '
+            f'in chunks of {chunk_size}: {chunked / 1024:.0f} KiB'
+        )
+
+    def peak_memory(self, function):
+        tracemalloc.start()
+        try:
+            function()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from drf_api.images import fail_stuck_images
+
+# The models with background processed images, and their cache groups
+IMAGE_MODELS = {
+    'posts.Post': 'posts',
+    'profiles.Profile': 'profiles',
+}
+
+
+class Command(BaseCommand):
+    """
+    Mark post and profile images which have been processing for longer
+    than IMAGE_PROCESSING_TIMEOUT as failed, so clients stop waiting for
+    them and upload them again. Each upload queues its own check, so
+    this is only needed for images whose check task was lost.
+    """
+    help = 'Mark images stuck processing as failed'
+
+    def handle(self, *args, **options):
+        failed = sum(
+            fail_stuck_images(model_label, cache_group)
+            for model_label, cache_group in IMAGE_MODELS.items()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Marked {failed} stuck image(s) as failed'
+        ))
@@ -0,0 +1,227 @@
+import itertools
+import random
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from comments.models import Comment
+from drf_api.cache import invalidate_now_and_on_commit
+from followers.models import Follower
+from likes.models import Like
+from posts.models import Post
+from profiles.models import Profile
+
+WORDS = (
+    'light city morning coffee walk river street market sunset garden '
+    'winter summer friends music mountain beach train window bridge rain '
+    'forest book kitchen park festival harbour night snow road photo'
+).split()
+
+
+class Command(BaseCommand):
+    """
+    Fill the database with a synthetic social graph, for load testing
+    and for bench_endpoints. Users are ranked by popularity, and who they
+    follow is drawn from a power law over the ranks, so a few accounts
+    have most of the followers, as on a real social network. The number
+    of posts per user, and of likes and comments per post, vary around
+    the given means.
+    Rows are written with bulk_create, which skips the signal handlers,
+    so the stored counters are filled in here and the timelines are
+    rebuilt at the end. The users can't log in with a password.
+    """
+    help = 'Generate synthetic users, follows, posts, likes and comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument(
+            '--posts', type=float, default=5,
+            help='Mean number of posts per user',
+        )
+        parser.add_argument(
+            '--follows', type=float, default=20,
+            help='Mean number of users each user follows',
+        )
+        parser.add_argument(
+            '--likes', type=float, default=10,
+            help='Mean number of likes per post',
+        )
+        parser.add_argument(
+            '--comments', type=float, default=3,
+            help='Mean number of comments per post',
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.2,
+            help='Exponent of the power law users are followed by',
+        )
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Usernames are <prefix>_<number>',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(
+                f'There are already users called {prefix}_*, use another '
+                f'--prefix'
+            )
+        if options['users'] < 2:
+            raise CommandError('There have to be at least 2 users')
+
+        with transaction.atomic():
+            usernames = self.create_users(prefix, options['users'])
+            user_ids = list(User.objects.filter(
+                username__startswith=f'{prefix}_'
+            ).order_by('pk').values_list('pk', flat=True))
+            following = self.plan_follows(
+                user_ids, options['follows'], options['alpha']
+            )
+            post_owners = [
+                owner_id for owner_id in user_ids
+                for _ in range(self.count(options['posts']))
+            ]
+            likes_counts = [
+                min(self.count(options['likes']), len(user_ids))
+                for _ in post_owners
+            ]
+            comments_counts = [
+                self.count(options['comments']) for _ in post_owners
+            ]
+
+            self.create_profiles(user_ids, following, post_owners)
+            post_ids = self.create_posts(
+                dict(zip(user_ids, usernames)), post_owners,
+                likes_counts, comments_counts,
+            )
+            self.bulk_insert(Follower, (
+                Follower(owner_id=owner_id, followed_id=followed_id)
+                for owner_id, followed in following.items()
+                for followed_id in followed
+            ))
+            self.bulk_insert(Like, (
+                Like(owner_id=owner_id, post_id=post_id)
+                for post_id, count in zip(post_ids, likes_counts)
+                for owner_id in self.rng.sample(user_ids, count)
+            ))
+            self.bulk_insert(Comment, (
+                Comment(
+                    owner_id=self.rng.choice(user_ids), post_id=post_id,
+                    content=self.sentence(),
+                )
+                for post_id, count in zip(post_ids, comments_counts)
+                for _ in range(count)
+            ))
+            call_command('rebuild_timelines', stdout=self.stdout)
+            invalidate_now_and_on_commit(
+                'users', 'profiles', 'posts', 'comments', 'likes',
+                'followers',
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(user_ids)} users, '
+            f'{sum(len(followed) for followed in following.values())} '
+            f'follows, {len(post_ids)} posts, {sum(likes_counts)} likes '
+            f'and {sum(comments_counts)} comments'
+        ))
+
+    def count(self, mean):
+        # A whole number which varies around 'mean'
+        return round(self.rng.expovariate(1 / mean)) if mean > 0 else 0
+
+    def sentence(self, words=8):
+        return ' '.join(self.rng.choices(WORDS, k=words)).capitalize()
+
+    def bulk_insert(self, model, objects):
+        objects = iter(objects)
+        while True:
+            batch = list(itertools.islice(objects, self.batch_size))
+            if not batch:
+                return
+            model.objects.bulk_create(batch)
+
+    def create_users(self, prefix, number):
+        # Hashing a password is slow, so every user shares an unusable one
+        password = make_password(None)
+        usernames = [f'{prefix}_{n}' for n in range(number)]
+        self.bulk_insert(User, (
+            User(username=username, password=password)
+            for username in usernames
+        ))
+        return usernames
+
+    def plan_follows(self, user_ids, mean, alpha):
+        """
+        Return the set of user ids each user follows. The chance of being
+        followed falls off as a power of a user's popularity rank.
+        """
+        ranked = self.rng.sample(user_ids, len(user_ids))
+        cum_weights = list(itertools.accumulate(
+            1 / rank ** alpha for rank in range(1, len(ranked) + 1)
+        ))
+        following = {}
+        for owner_id in user_ids:
+            wanted = min(self.count(mean), len(user_ids) - 1)
+            followed = set()
+            # Draws can repeat, so give up after a few rounds rather than
+            # looping for long on a user who follows nearly everyone
+            for _ in range(5):
+                if len(followed) >= wanted:
+                    break
+                followed.update(self.rng.choices(
+                    ranked, cum_weights=cum_weights,
+                    k=wanted - len(followed),
+                ))
+                followed.discard(owner_id)
+            following[owner_id] = followed
+        return following
+
+    def create_profiles(self, user_ids, following, post_owners):
+        posts_count = dict.fromkeys(user_ids, 0)
+        for owner_id in post_owners:
+            posts_count[owner_id] += 1
+        followers_count = dict.fromkeys(user_ids, 0)
+        for followed in following.values():
+            for followed_id in followed:
+                followers_count[followed_id] += 1
+        self.bulk_insert(Profile, (
+            Profile(
+                owner_id=owner_id,
+                posts_count=posts_count[owner_id],
+                followers_count=followers_count[owner_id],
+                following_count=len(following[owner_id]),
+            )
+            for owner_id in user_ids
+        ))
+
+    def create_posts(self, usernames, post_owners, likes_counts,
+                     comments_counts):
+        """
+        Create the posts, in order, and return their ids in the same
+        order.
+        """
+        def posts():
+            for owner_id, likes, comments in zip(
+                post_owners, likes_counts, comments_counts
+            ):
+                title = self.sentence(words=4)
+                content = self.sentence(words=20)
+                yield Post(
+                    owner_id=owner_id, title=title, content=content,
+                    likes_count=likes, comments_count=comments,
+                    search_document=' '.join(
+                        [title, content, usernames[owner_id]]
+                    ),
+                )
+        last_pk = Post.all_objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        self.bulk_insert(Post, posts())
+        return list(Post.all_objects.filter(
+            pk__gt=last_pk
+        ).order_by('pk').values_list('pk', flat=True))
@@ -0,0 +1,163 @@
+import datetime
+import functools
+import hashlib
+import itertools
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import http_date, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+
+class EagerLoadingMixin:
+    """
+    Mixin for generic views which applies the related paths declared by
+    the view's serializer class to the view's queryset.
+    Serializers list the relations their fields read in
+    'select_related_fields' (foreign keys and one-to-ones, fetched with a
+    join) and 'prefetch_related_fields' (reverse and many-to-many
+    relations, fetched with one extra query each). This means serializing
+    a page costs a fixed number of queries, rather than a few per row.
+    """
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        select_related = getattr(
+            serializer_class, 'select_related_fields', None
+        )
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        prefetch_related = getattr(
+            serializer_class, 'prefetch_related_fields', None
+        )
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+
+class ConditionalGetMixin:
+    """
+    Mixin for detail views which adds ETag and Last-Modified headers to
+    GET responses, and answers 304 Not Modified when the client's
+    If-None-Match header shows it already has the current version.
+    Before doing the full query and serialization, we run the cheap query
+    from the view's get_validator_values method. It returns a dictionary
+    of every value the response depends on, including stored counts and
+    anything specific to the current user, or None if there is no such
+    object. The ETag is a hash of those values and the user's id.
+    Last-Modified is the latest datetime among the values. It doesn't
+    change when only a count changes, so If-Modified-Since on its own is
+    never answered with a 304.
+    """
+    def get_validator_values(self):
+        raise NotImplementedError(
+            'Views using ConditionalGetMixin must define '
+            'get_validator_values()'
+        )
+
+    def get(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            request, self.get_validator_values(),
+            functools.partial(super().get, request, *args, **kwargs)
+        )
+
+    def get_conditional_response(self, request, values, get_response):
+        # 'get_response' makes the full response, if it's needed
+        if values is None:
+            # Let the normal view code raise the 404
+            return get_response()
+
+        fingerprint = repr((request.user.id, sorted(values.items())))
+        etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+        dates = [
+            value for value in values.values()
+            if isinstance(value, datetime.datetime)
+        ]
+        last_modified = max(dates) if dates else None
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = get_response()
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        # The response depends on who is asking, and the client has to
+        # check back with us before reusing it.
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Cookie', 'Authorization'])
+        return response
+
+
+class StreamingListMixin:
+    """
+    Mixin for list views which streams big JSON lists to the client,
+    rather than serializing and rendering the whole list in memory first.
+    It kicks in when the view isn't paginated, or the requested page size
+    is at least the STREAMING_LIST_MIN_PAGE_SIZE setting. The list is
+    serialized and rendered in chunks of 'stream_chunk_size' rows, and
+    each chunk is sent as soon as it's ready. The bytes sent are the same
+    as the normal response's, including the pagination envelope.
+    It needs the get_list_queryset and serialize_page methods from
+    FastListMixin, so list it before FastListMixin.
+    """
+    stream_chunk_size = 200
+    # Stands in for the results in the rendered pagination envelope
+    results_placeholder = 'streaming-list-results-placeholder'
+
+    def should_stream(self):
+        threshold = getattr(settings, 'STREAMING_LIST_MIN_PAGE_SIZE', None)
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        if threshold is None or not isinstance(renderer, JSONRenderer):
+            return False
+        indent = renderer.get_indent(
+            self.request.accepted_media_type, self.get_renderer_context()
+        )
+        if indent is not None:
+            return False
+        if self.paginator is None:
+            return True
+        page_size = self.paginator.get_page_size(self.request)
+        return page_size is not None and page_size >= threshold
+
+    def list(self, request, *args, **kwargs):
+        if not self.should_stream():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.get_list_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            objects = queryset.iterator(chunk_size=self.stream_chunk_size)
+            prefix, suffix = b'', b''
+        else:
+            objects = page
+            envelope = self.get_paginated_response(self.results_placeholder)
+            prefix, suffix = self.render(envelope.data).split(
+                self.render(self.results_placeholder), 1
+            )
+        return StreamingHttpResponse(
+            self.stream_list(objects, prefix, suffix),
+            content_type=request.accepted_renderer.media_type
+        )
+
+    def render(self, data):
+        return self.request.accepted_renderer.render(
+            data, self.request.accepted_media_type,
+            self.get_renderer_context()
+        )
+
+    def stream_list(self, objects, prefix, suffix):
+        yield prefix + b'['
+        objects = iter(objects)
+        separator = b''
+        while True:
+            chunk = list(itertools.islice(objects, self.stream_chunk_size))
+            if not chunk:
+                break
+            items = self.serialize_page(chunk)
+            yield separator + b','.join(self.render(item) for item in items)
+            separator = b','
+        yield b']' + suffix
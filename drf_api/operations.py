@@ -0,0 +1,37 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db.migrations.operations import AddIndex
+
+
+class AddIndexSafely(AddIndexConcurrently):
+    """
+    AddIndex for large live tables.
+    On PostgreSQL the index is built with CREATE INDEX CONCURRENTLY, which
+    doesn't block writes to the table while it builds. Other databases,
+    e.g. SQLite in development, get a plain CREATE INDEX.
+    Like AddIndexConcurrently, it has to run outside a transaction, so
+    migrations using it must set atomic = False.
+    """
+    def describe(self):
+        return AddIndex.describe(self)
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        else:
+            AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        else:
+            AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
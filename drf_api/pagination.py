@@ -0,0 +1,267 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (a.k.a. seek) pagination, newest first.
+    Rather than counting the whole queryset and skipping to an OFFSET,
+    each page continues from the position of the last row of the previous
+    page, e.g. WHERE (created_at, id) < (last_created_at, last_id).
+    With an index on the keyset fields every page costs the same however
+    deep the client scrolls. The position is handed to the client as an
+    opaque cursor in the 'next' link. Pages only go forwards, which is
+    all an infinite scroll needs.
+    Views can set 'keyset_fields' to page on something other than
+    ('created_at', 'id'); the last field must be unique.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    keyset_fields = ('created_at', 'id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(
+            list(self.get_page_queryset(queryset, request, view))
+        )
+
+    # The async views run the page's query alongside others, so it's
+    # built here and its rows handed to finish_page.
+    def get_page_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fields = getattr(view, 'keyset_fields', self.keyset_fields)
+        queryset = queryset.order_by(
+            *[f'-{field}' for field in self.fields]
+        )
+        position = self.decode_cursor(request, queryset)
+        if position is not None:
+            queryset = queryset.filter(self.seek(position))
+        # Fetch one row more than we need, to find out if there is a next
+        # page without having to count anything.
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = (
+            self.get_position(rows[-1]) if self.has_next else None
+        )
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def seek(self, position):
+        """
+        Build the filter for rows that come after 'position' in descending
+        order. For fields (a, b) this is a < x OR (a = x AND b < y).
+        """
+        condition = Q()
+        for index in reversed(range(len(self.fields))):
+            earlier = {
+                field: value for field, value
+                in zip(self.fields[:index], position[:index])
+            }
+            condition |= Q(
+                **earlier,
+                **{f'{self.fields[index]}__lt': position[index]}
+            )
+        return condition
+
+    def get_position(self, row):
+        # Rows may be model instances, or dictionaries from .values()
+        if isinstance(row, dict):
+            return [row[field] for field in self.fields]
+        return [getattr(row, field) for field in self.fields]
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param,
+            self.encode_cursor(self.next_position)
+        )
+
+    def encode_cursor(self, position):
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in position
+        ]
+        encoded = json.dumps(values, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(encoded).decode('ascii')
+
+    def decode_cursor(self, request, queryset):
+        # An empty or missing cursor means "start from the newest row"
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(
+                encoded.encode('ascii')
+            ))
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or (
+            len(position) != len(self.fields)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        # Clients can send anything, so each value has to parse as its
+        # field's, as otherwise the query fails, or compares nonsense
+        values = []
+        for field, value in zip(self.fields, position):
+            try:
+                value = self.get_field(queryset, field).to_python(value)
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            values.append(value)
+        return values
+
+    def get_field(self, queryset, name):
+        # Keyset fields may be annotations, e.g. the feed's timestamp
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return queryset.model._meta.get_field(name)
+
+
+class ConcurrentPageNumberPagination(PageNumberPagination):
+    """
+    PageNumberPagination which can also hand over the queries for a page
+    without running them, so that the async views can count the rows
+    and fetch the page at the same time, see drf_api/async_views.py.
+    paginate_queryset works as usual.
+    """
+    def get_page_querysets(self, queryset, request, view=None):
+        """
+        Return the querysets of the requested page's rows and of all the
+        rows, to count, for finish_page. Return None if the page can't
+        be found before counting, e.g. the 'last' page or an invalid
+        number, in which case use paginate_queryset.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        try:
+            number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            return None
+        if number < 1:
+            return None
+        self.planned_page = (queryset, page_size, number)
+        bottom = (number - 1) * page_size
+        return queryset[bottom:bottom + page_size], queryset
+
+    def finish_page(self, rows, count):
+        queryset, page_size, number = self.planned_page
+        paginator = self.django_paginator_class(queryset, page_size)
+        # The rows were counted with the page, so don't count them again
+        paginator.count = count
+        try:
+            paginator.validate_number(number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=number, message=str(exc)
+            ))
+        self.page = paginator._get_page(rows, number, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+
+class PageNumberOrKeysetPagination(ConcurrentPageNumberPagination):
+    """
+    Page number pagination by default, so existing clients see no change.
+    Clients opt in to keyset pagination per request by passing
+    '?pagination=cursor' for the first page, and then following the
+    'next' links, which carry a 'cursor' parameter.
+    Keyset pages are always newest first, so they can't be combined with
+    the 'ordering' parameter.
+    """
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+    # Clients may ask for bigger page number pages, e.g. for exports.
+    # Pages of STREAMING_LIST_MIN_PAGE_SIZE or more are streamed.
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def wants_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.start_keyset(request):
+            return super().paginate_queryset(queryset, request, view)
+        return self.keyset.paginate_queryset(queryset, request, view)
+
+    def get_page_querysets(self, queryset, request, view=None):
+        if not self.start_keyset(request):
+            return super().get_page_querysets(queryset, request, view)
+        # Keyset pages don't count anything
+        return self.keyset.get_page_queryset(queryset, request, view), None
+
+    def finish_page(self, rows, count):
+        if self.keyset is not None:
+            return self.keyset.finish_page(rows)
+        return super().finish_page(rows, count)
+
+    def start_keyset(self, request):
+        # Return whether this request gets a keyset page
+        self.keyset = None
+        if not self.wants_keyset(request):
+            return False
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            raise ValidationError({
+                api_settings.ORDERING_PARAM:
+                    'Ordering cannot be combined with cursor pagination.'
+            })
+        self.keyset = self.keyset_class()
+        self.display_page_controls = False
+        return True
+
+    def get_page_size(self, request):
+        if self.wants_keyset(request):
+            return self.keyset_class.page_size
+        return super().get_page_size(request)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_next_link()
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.keyset is not None:
+            return None
+        return super().get_previous_link()
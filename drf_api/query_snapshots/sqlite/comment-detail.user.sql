@@ -0,0 +1,7 @@
+SELECT "django_session"."session_key", "django_session"."session_data", "django_session"."expire_date" FROM "django_session" WHERE ("django_session"."expire_date" > '?' AND "django_session"."session_key" = '?') LIMIT ?;
+
+SELECT "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "auth_user" WHERE "auth_user"."id" = ? LIMIT ?;
+
+SELECT "comments_comment"."updated_at", "comments_comment"."created_at", "auth_user"."username", "profiles_profile"."updated_at" FROM "comments_comment" INNER JOIN "auth_user" ON ("comments_comment"."owner_id" = "auth_user"."id") INNER JOIN "posts_post" ON ("comments_comment"."post_id" = "posts_post"."id") LEFT OUTER JOIN "profiles_profile" ON ("auth_user"."id" = "profiles_profile"."owner_id") WHERE ("auth_user"."is_active" AND "posts_post"."deleted_at" IS NULL AND "comments_comment"."id" = ?) ORDER BY "comments_comment"."created_at" DESC LIMIT ?;
+
+SELECT "comments_comment"."id", "comments_comment"."owner_id", "comments_comment"."post_id", "comments_comment"."created_at", "comments_comment"."updated_at", "comments_comment"."content", "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined", "profiles_profile"."id", "profiles_profile"."owner_id", "profiles_profile"."created_at", "profiles_profile"."updated_at", "profiles_profile"."name", "profiles_profile"."content", "profiles_profile"."image", "profiles_profile"."image_status", "profiles_profile"."image_variants", "profiles_profile"."image_job", "profiles_profile"."posts_count", "profiles_profile"."followers_count", "profiles_profile"."following_count", "posts_post"."id", "posts_post"."owner_id", "posts_post"."created_at", "posts_post"."updated_at", "posts_post"."title", "posts_post"."content", "posts_post"."image", "posts_post"."image_filter", "posts_post"."image_status", "posts_post"."image_variants", "posts_post"."image_job", "posts_post"."comments_count", "posts_post"."likes_count", "posts_post"."search_document", "posts_post"."deleted_at" FROM "comments_comment" INNER JOIN "auth_user" ON ("comments_comment"."owner_id" = "auth_user"."id") INNER JOIN "posts_post" ON ("comments_comment"."post_id" = "posts_post"."id") LEFT OUTER JOIN "profiles_profile" ON ("auth_user"."id" = "profiles_profile"."owner_id") WHERE ("auth_user"."is_active" AND "posts_post"."deleted_at" IS NULL AND "comments_comment"."id" = ?) LIMIT ?;
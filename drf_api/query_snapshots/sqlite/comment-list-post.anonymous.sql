@@ -0,0 +1,5 @@
+SELECT "posts_post"."id", "posts_post"."owner_id", "posts_post"."created_at", "posts_post"."updated_at", "posts_post"."title", "posts_post"."content", "posts_post"."image", "posts_post"."image_filter", "posts_post"."image_status", "posts_post"."image_variants", "posts_post"."image_job", "posts_post"."comments_count", "posts_post"."likes_count", "posts_post"."search_document", "posts_post"."deleted_at" FROM "posts_post" WHERE ("posts_post"."deleted_at" IS NULL AND "posts_post"."id" = ?) LIMIT ?;
+
+SELECT COUNT(*) AS "__count" FROM "comments_comment" INNER JOIN "auth_user" ON ("comments_comment"."owner_id" = "auth_user"."id") INNER JOIN "posts_post" ON ("comments_comment"."post_id" = "posts_post"."id") LEFT OUTER JOIN "profiles_profile" ON ("auth_user"."id" = "profiles_profile"."owner_id") WHERE ("auth_user"."is_active" AND "posts_post"."deleted_at" IS NULL AND "comments_comment"."post_id" = ?);
+
+SELECT "comments_comment"."id", "comments_comment"."owner_id", "comments_comment"."created_at", "comments_comment"."updated_at", "auth_user"."username", "comments_comment"."post_id", "comments_comment"."content", "profiles_profile"."id", "profiles_profile"."image" FROM "comments_comment" INNER JOIN "auth_user" ON ("comments_comment"."owner_id" = "auth_user"."id") INNER JOIN "posts_post" ON ("comments_comment"."post_id" = "posts_post"."id") LEFT OUTER JOIN "profiles_profile" ON ("auth_user"."id" = "profiles_profile"."owner_id") WHERE ("auth_user"."is_active" AND "posts_post"."deleted_at" IS NULL AND "comments_comment"."post_id" = ?) ORDER BY "comments_comment"."created_at" DESC LIMIT ?;
@@ -0,0 +1,3 @@
+SELECT COUNT(*) AS "__count" FROM "comments_comment" INNER JOIN "auth_user" ON ("comments_comment"."owner_id" = "auth_user"."id") INNER JOIN "posts_post" ON ("comments_comment"."post_id" = "posts_post"."id") LEFT OUTER JOIN "profiles_profile" ON ("auth_user"."id" = "profiles_profile"."owner_id") WHERE ("auth_user"."is_active" AND "posts_post"."deleted_at" IS NULL);
+
+SELECT "comments_comment"."id", "comments_comment"."owner_id", "comments_comment"."created_at", "comments_comment"."updated_at", "auth_user"."username", "comments_comment"."post_id", "comments_comment"."content", "profiles_profile"."id", "profiles_profile"."image" FROM "comments_comment" INNER JOIN "auth_user" ON ("comments_comment"."owner_id" = "auth_user"."id") INNER JOIN "posts_post" ON ("comments_comment"."post_id" = "posts_post"."id") LEFT OUTER JOIN "profiles_profile" ON ("auth_user"."id" = "profiles_profile"."owner_id") WHERE ("auth_user"."is_active" AND "posts_post"."deleted_at" IS NULL) ORDER BY "comments_comment"."created_at" DESC LIMIT ?;
@@ -0,0 +1,9 @@
+SELECT "django_session"."session_key", "django_session"."session_data", "django_session"."expire_date" FROM "django_session" WHERE ("django_session"."expire_date" > '?' AND "django_session"."session_key" = '?') LIMIT ?;
+
+SELECT "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "auth_user" WHERE "auth_user"."id" = ? LIMIT ?;
+
+SELECT COUNT(*) FROM (SELECT "posts_post"."id" AS Col1, "posts_post"."owner_id" AS Col2, "posts_post"."image_variants" AS Col3, T4."username" AS Col4, "posts_post"."created_at" AS Col5, "posts_post"."updated_at" AS Col6, "posts_post"."title" AS Col7, "posts_post"."content" AS Col8, "posts_post"."image" AS Col9, "profiles_profile"."id" AS Col10, "profiles_profile"."image" AS Col11, "posts_post"."image_filter" AS Col12, "posts_post"."comments_count" AS Col13, "posts_post"."likes_count" AS Col14, "posts_post"."image_status" AS Col15, "timeline_timelineentry"."created_at" AS "feed_created_at" FROM "posts_post" INNER JOIN "timeline_timelineentry" ON ("posts_post"."id" = "timeline_timelineentry"."post_id") INNER JOIN "auth_user" T4 ON ("posts_post"."owner_id" = T4."id") LEFT OUTER JOIN "profiles_profile" ON (T4."id" = "profiles_profile"."owner_id") WHERE ("posts_post"."deleted_at" IS NULL AND "timeline_timelineentry"."owner_id" = ?)) subquery;
+
+SELECT "posts_post"."id", "posts_post"."owner_id", "posts_post"."image_variants", T4."username", "posts_post"."created_at", "posts_post"."updated_at", "posts_post"."title", "posts_post"."content", "posts_post"."image", "profiles_profile"."id", "profiles_profile"."image", "posts_post"."image_filter", "posts_post"."comments_count", "posts_post"."likes_count", "posts_post"."image_status", "timeline_timelineentry"."created_at" AS "feed_created_at" FROM "posts_post" INNER JOIN "timeline_timelineentry" ON ("posts_post"."id" = "timeline_timelineentry"."post_id") INNER JOIN "auth_user" T4 ON ("posts_post"."owner_id" = T4."id") LEFT OUTER JOIN "profiles_profile" ON (T4."id" = "profiles_profile"."owner_id") WHERE ("posts_post"."deleted_at" IS NULL AND "timeline_timelineentry"."owner_id" = ?) ORDER BY "feed_created_at" DESC, "posts_post"."id" DESC LIMIT ?;
+
+SELECT "likes_like"."post_id", "likes_like"."id" FROM "likes_like" WHERE ("likes_like"."owner_id" = ? AND "likes_like"."post_id" IN (...)) ORDER BY "likes_like"."created_at" DESC;
@@ -0,0 +1,7 @@
+SELECT "django_session"."session_key", "django_session"."session_data", "django_session"."expire_date" FROM "django_session" WHERE ("django_session"."expire_date" > '?' AND "django_session"."session_key" = '?') LIMIT ?;
+
+SELECT "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "auth_user" WHERE "auth_user"."id" = ? LIMIT ?;
+
+SELECT COUNT(*) AS "__count" FROM "followers_follower" INNER JOIN "auth_user" ON ("followers_follower"."followed_id" = "auth_user"."id") INNER JOIN "auth_user" T3 ON ("followers_follower"."owner_id" = T3."id") WHERE ("auth_user"."is_active" AND T3."is_active");
+
+SELECT "followers_follower"."id", "followers_follower"."owner_id", "followers_follower"."followed_id", "followers_follower"."created_at", T3."id", T3."password", T3."last_login", T3."is_superuser", T3."username", T3."first_name", T3."last_name", T3."email", T3."is_staff", T3."is_active", T3."date_joined", "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "followers_follower" INNER JOIN "auth_user" ON ("followers_follower"."followed_id" = "auth_user"."id") INNER JOIN "auth_user" T3 ON ("followers_follower"."owner_id" = T3."id") WHERE ("auth_user"."is_active" AND T3."is_active") ORDER BY "followers_follower"."created_at" DESC LIMIT ?;
@@ -0,0 +1,5 @@
+SELECT "django_session"."session_key", "django_session"."session_data", "django_session"."expire_date" FROM "django_session" WHERE ("django_session"."expire_date" > '?' AND "django_session"."session_key" = '?') LIMIT ?;
+
+SELECT "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "auth_user" WHERE "auth_user"."id" = ? LIMIT ?;
+
+SELECT "likes_like"."id", "likes_like"."owner_id", "likes_like"."post_id", "likes_like"."created_at", "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "likes_like" INNER JOIN "auth_user" ON ("likes_like"."owner_id" = "auth_user"."id") INNER JOIN "posts_post" ON ("likes_like"."post_id" = "posts_post"."id") WHERE ("auth_user"."is_active" AND "posts_post"."deleted_at" IS NULL AND "likes_like"."id" = ?) LIMIT ?;
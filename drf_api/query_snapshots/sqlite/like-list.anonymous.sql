@@ -0,0 +1,3 @@
+SELECT COUNT(*) AS "__count" FROM "likes_like" INNER JOIN "auth_user" ON ("likes_like"."owner_id" = "auth_user"."id") INNER JOIN "posts_post" ON ("likes_like"."post_id" = "posts_post"."id") WHERE ("auth_user"."is_active" AND "posts_post"."deleted_at" IS NULL);
+
+SELECT "likes_like"."id", "likes_like"."owner_id", "likes_like"."post_id", "likes_like"."created_at", "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "likes_like" INNER JOIN "auth_user" ON ("likes_like"."owner_id" = "auth_user"."id") INNER JOIN "posts_post" ON ("likes_like"."post_id" = "posts_post"."id") WHERE ("auth_user"."is_active" AND "posts_post"."deleted_at" IS NULL) ORDER BY "likes_like"."created_at" DESC LIMIT ?;
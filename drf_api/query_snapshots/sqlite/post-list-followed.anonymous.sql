@@ -0,0 +1,5 @@
+SELECT "profiles_profile"."id", "profiles_profile"."owner_id", "profiles_profile"."created_at", "profiles_profile"."updated_at", "profiles_profile"."name", "profiles_profile"."content", "profiles_profile"."image", "profiles_profile"."image_status", "profiles_profile"."image_variants", "profiles_profile"."image_job", "profiles_profile"."posts_count", "profiles_profile"."followers_count", "profiles_profile"."following_count" FROM "profiles_profile" WHERE "profiles_profile"."id" = ? LIMIT ?;
+
+SELECT COUNT(*) AS "__count" FROM "posts_post" INNER JOIN "auth_user" ON ("posts_post"."owner_id" = "auth_user"."id") INNER JOIN "followers_follower" ON ("auth_user"."id" = "followers_follower"."followed_id") INNER JOIN "auth_user" T4 ON ("followers_follower"."owner_id" = T4."id") INNER JOIN "profiles_profile" ON (T4."id" = "profiles_profile"."owner_id") LEFT OUTER JOIN "profiles_profile" T6 ON ("auth_user"."id" = T6."owner_id") WHERE ("posts_post"."deleted_at" IS NULL AND "profiles_profile"."id" = ?);
+
+SELECT "posts_post"."id", "posts_post"."owner_id", "posts_post"."image_variants", "auth_user"."username", "posts_post"."created_at", "posts_post"."updated_at", "posts_post"."title", "posts_post"."content", "posts_post"."image", T6."id", T6."image", "posts_post"."image_filter", "posts_post"."comments_count", "posts_post"."likes_count", "posts_post"."image_status" FROM "posts_post" INNER JOIN "auth_user" ON ("posts_post"."owner_id" = "auth_user"."id") INNER JOIN "followers_follower" ON ("auth_user"."id" = "followers_follower"."followed_id") INNER JOIN "auth_user" T4 ON ("followers_follower"."owner_id" = T4."id") INNER JOIN "profiles_profile" ON (T4."id" = "profiles_profile"."owner_id") LEFT OUTER JOIN "profiles_profile" T6 ON ("auth_user"."id" = T6."owner_id") WHERE ("posts_post"."deleted_at" IS NULL AND "profiles_profile"."id" = ?) ORDER BY "posts_post"."created_at" DESC LIMIT ?;
@@ -0,0 +1,11 @@
+SELECT "django_session"."session_key", "django_session"."session_data", "django_session"."expire_date" FROM "django_session" WHERE ("django_session"."expire_date" > '?' AND "django_session"."session_key" = '?') LIMIT ?;
+
+SELECT "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "auth_user" WHERE "auth_user"."id" = ? LIMIT ?;
+
+SELECT "profiles_profile"."id", "profiles_profile"."owner_id", "profiles_profile"."created_at", "profiles_profile"."updated_at", "profiles_profile"."name", "profiles_profile"."content", "profiles_profile"."image", "profiles_profile"."image_status", "profiles_profile"."image_variants", "profiles_profile"."image_job", "profiles_profile"."posts_count", "profiles_profile"."followers_count", "profiles_profile"."following_count" FROM "profiles_profile" WHERE "profiles_profile"."id" = ? LIMIT ?;
+
+SELECT COUNT(*) AS "__count" FROM "posts_post" INNER JOIN "auth_user" ON ("posts_post"."owner_id" = "auth_user"."id") INNER JOIN "followers_follower" ON ("auth_user"."id" = "followers_follower"."followed_id") INNER JOIN "auth_user" T4 ON ("followers_follower"."owner_id" = T4."id") INNER JOIN "profiles_profile" ON (T4."id" = "profiles_profile"."owner_id") LEFT OUTER JOIN "profiles_profile" T6 ON ("auth_user"."id" = T6."owner_id") WHERE ("posts_post"."deleted_at" IS NULL AND "profiles_profile"."id" = ?);
+
+SELECT "posts_post"."id", "posts_post"."owner_id", "posts_post"."image_variants", "auth_user"."username", "posts_post"."created_at", "posts_post"."updated_at", "posts_post"."title", "posts_post"."content", "posts_post"."image", T6."id", T6."image", "posts_post"."image_filter", "posts_post"."comments_count", "posts_post"."likes_count", "posts_post"."image_status" FROM "posts_post" INNER JOIN "auth_user" ON ("posts_post"."owner_id" = "auth_user"."id") INNER JOIN "followers_follower" ON ("auth_user"."id" = "followers_follower"."followed_id") INNER JOIN "auth_user" T4 ON ("followers_follower"."owner_id" = T4."id") INNER JOIN "profiles_profile" ON (T4."id" = "profiles_profile"."owner_id") LEFT OUTER JOIN "profiles_profile" T6 ON ("auth_user"."id" = T6."owner_id") WHERE ("posts_post"."deleted_at" IS NULL AND "profiles_profile"."id" = ?) ORDER BY "posts_post"."created_at" DESC LIMIT ?;
+
+SELECT "likes_like"."post_id", "likes_like"."id" FROM "likes_like" WHERE ("likes_like"."owner_id" = ? AND "likes_like"."post_id" IN (...)) ORDER BY "likes_like"."created_at" DESC;
@@ -0,0 +1,3 @@
+SELECT "profiles_profile"."updated_at", "profiles_profile"."posts_count", "profiles_profile"."followers_count", "profiles_profile"."following_count", "auth_user"."username" FROM "profiles_profile" INNER JOIN "auth_user" ON ("profiles_profile"."owner_id" = "auth_user"."id") WHERE ("auth_user"."is_active" AND "profiles_profile"."id" = ?) ORDER BY "profiles_profile"."created_at" DESC LIMIT ?;
+
+SELECT "profiles_profile"."id", "profiles_profile"."owner_id", "profiles_profile"."created_at", "profiles_profile"."updated_at", "profiles_profile"."name", "profiles_profile"."content", "profiles_profile"."image", "profiles_profile"."image_status", "profiles_profile"."image_variants", "profiles_profile"."image_job", "profiles_profile"."posts_count", "profiles_profile"."followers_count", "profiles_profile"."following_count", "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "profiles_profile" INNER JOIN "auth_user" ON ("profiles_profile"."owner_id" = "auth_user"."id") WHERE ("auth_user"."is_active" AND "profiles_profile"."id" = ?) LIMIT ?;
@@ -0,0 +1,11 @@
+SELECT "django_session"."session_key", "django_session"."session_data", "django_session"."expire_date" FROM "django_session" WHERE ("django_session"."expire_date" > '?' AND "django_session"."session_key" = '?') LIMIT ?;
+
+SELECT "auth_user"."id", "auth_user"."password", "auth_user"."last_login", "auth_user"."is_superuser", "auth_user"."username", "auth_user"."first_name", "auth_user"."last_name", "auth_user"."email", "auth_user"."is_staff", "auth_user"."is_active", "auth_user"."date_joined" FROM "auth_user" WHERE "auth_user"."id" = ? LIMIT ?;
+
+SELECT "profiles_profile"."id", "profiles_profile"."owner_id", "profiles_profile"."created_at", "profiles_profile"."updated_at", "profiles_profile"."name", "profiles_profile"."content", "profiles_profile"."image", "profiles_profile"."image_status", "profiles_profile"."image_variants", "profiles_profile"."image_job", "profiles_profile"."posts_count", "profiles_profile"."followers_count", "profiles_profile"."following_count" FROM "profiles_profile" WHERE "profiles_profile"."id" = ? LIMIT ?;
+
+SELECT COUNT(*) AS "__count" FROM "profiles_profile" INNER JOIN "auth_user" ON ("profiles_profile"."owner_id" = "auth_user"."id") INNER JOIN "followers_follower" ON ("auth_user"."id" = "followers_follower"."owner_id") INNER JOIN "auth_user" T4 ON ("followers_follower"."followed_id" = T4."id") INNER JOIN "profiles_profile" T5 ON (T4."id" = T5."owner_id") WHERE ("auth_user"."is_active" AND T5."id" = ?);
+
+SELECT "profiles_profile"."id", "profiles_profile"."owner_id", "profiles_profile"."image_variants", "auth_user"."username", "profiles_profile"."created_at", "profiles_profile"."updated_at", "profiles_profile"."name", "profiles_profile"."content", "profiles_profile"."image", "profiles_profile"."posts_count", "profiles_profile"."followers_count", "profiles_profile"."following_count", "profiles_profile"."image_status" FROM "profiles_profile" INNER JOIN "auth_user" ON ("profiles_profile"."owner_id" = "auth_user"."id") INNER JOIN "followers_follower" ON ("auth_user"."id" = "followers_follower"."owner_id") INNER JOIN "auth_user" T4 ON ("followers_follower"."followed_id" = T4."id") INNER JOIN "profiles_profile" T5 ON (T4."id" = T5."owner_id") WHERE ("auth_user"."is_active" AND T5."id" = ?) ORDER BY "profiles_profile"."created_at" DESC LIMIT ?;
+
+SELECT "followers_follower"."followed_id", "followers_follower"."id" FROM "followers_follower" WHERE ("followers_follower"."followed_id" IN (...) AND "followers_follower"."owner_id" = ?) ORDER BY "followers_follower"."created_at" DESC;
@@ -0,0 +1,3 @@
+SELECT COUNT(*) AS "__count" FROM "profiles_profile" INNER JOIN "auth_user" ON ("profiles_profile"."owner_id" = "auth_user"."id") WHERE "auth_user"."is_active";
+
+SELECT "profiles_profile"."id", "profiles_profile"."owner_id", "profiles_profile"."image_variants", "auth_user"."username", "profiles_profile"."created_at", "profiles_profile"."updated_at", "profiles_profile"."name", "profiles_profile"."content", "profiles_profile"."image", "profiles_profile"."posts_count", "profiles_profile"."followers_count", "profiles_profile"."following_count", "profiles_profile"."image_status" FROM "profiles_profile" INNER JOIN "auth_user" ON ("profiles_profile"."owner_id" = "auth_user"."id") WHERE "auth_user"."is_active" ORDER BY "profiles_profile"."created_at" DESC LIMIT ?;
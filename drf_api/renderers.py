@@ -0,0 +1,48 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer which encodes with orjson, a JSON library written in
+    Rust, and produces the same bytes as JSONRenderer does with the
+    default settings.
+    orjson encodes dicts, lists, strings, numbers, dates, datetimes and
+    UUIDs itself. Anything else, such as Decimals and lazy translation
+    strings, goes through the default method of DRF's own JSONEncoder,
+    so it comes out just as it would with JSONRenderer.
+    When orjson isn't installed, or the client asked for indented or
+    ASCII-only output, it falls back to JSONRenderer.
+    """
+    options = 0
+    if orjson is not None:
+        # DRF writes UTC datetimes with a 'Z' rather than '+00:00'.
+        # Non-string keys are turned into strings, like json.dumps does.
+        options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if (
+            orjson is None or indent is not None
+            or self.ensure_ascii or not self.compact
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+
+        ret = orjson.dumps(
+            data, default=self.encoder_class().default, option=self.options
+        )
+        # Escape U+2028 and U+2029 like JSONRenderer, so the output is
+        # still a strict javascript subset.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029'
+            )
+        return ret
@@ -35,20 +35,112 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [(
         'rest_framework.authentication.SessionAuthentication'
         if 'DEV' in os.environ
-        else 'dj_rest_auth.jwt_auth.JWTCookieAuthentication'
+        else 'drf_api.authentication.CachedJWTCookieAuthentication'
     )],
     'DEFAULT_PAGINATION_CLASS':
-        'rest_framework.pagination.PageNumberPagination',
+        'drf_api.pagination.ConcurrentPageNumberPagination',
     'PAGE_SIZE': 10,
     'DATETIME_FORMAT': '%d %b %Y',
+    # Same output as DRF's JSONRenderer, but encoded much faster, see
+    # drf_api/renderers.py
+    'DEFAULT_RENDERER_CLASSES': [
+        'drf_api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 # Ensure we don't return any HTML if we are running in production
 if 'DEV' not in os.environ:
     REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
-        'rest_framework.renderers.JSONRenderer'
+        'drf_api.renderers.FastJSONRenderer'
     ]
 
+# The maximum number of existing posts copied into a user's home feed
+# when they follow someone. Newer posts are always added as they're made.
+TIMELINE_BACKFILL_LIMIT = 500
+
+# Slow side effects, such as filling home feeds, are queued as tasks in
+# the database and run by 'python manage.py run_tasks' (see tasks/queue.py).
+# In development they run straight away, so no worker is needed.
+TASKS_EAGER = 'DEV' in os.environ
+# How many due tasks a worker looks at when claiming the next one
+TASKS_CLAIM_CANDIDATES = 20
+# Seconds done and failed tasks are kept for, after which idle workers
+# delete them. None keeps them forever.
+TASKS_RETENTION_SECONDS = 7 * 24 * 60 * 60
+
+# Deleted posts and users are hidden straight away and removed in the
+# background by the deletions app, in batches of DELETION_BATCH_SIZE rows
+# with a pause of DELETION_BATCH_PAUSE seconds between batches.
+DELETION_BATCH_SIZE = 500
+DELETION_BATCH_PAUSE = 0.2
+# Seconds a purge task runs for before queueing itself to carry on
+DELETION_RUN_SECONDS = 60
+
+# Each request's SQL query count and timings are added to the response as
+# a Server-Timing header, and logged to 'drf_api.timing', see
+# drf_api/timing.py. The log lines are on by default in production, and
+# in development when TIMING_LOG_LEVEL is set to INFO.
+SERVER_TIMING_HEADER = True
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'drf_api.timing': {
+            'handlers': ['console'],
+            'level': os.environ.get(
+                'TIMING_LOG_LEVEL',
+                'WARNING' if 'DEV' in os.environ else 'INFO'
+            ),
+            'propagate': False,
+        },
+    },
+}
+
+# The most posts or users the bulk like and follow endpoints take at once
+BULK_MAX_TARGETS = 100
+
+# Serialize the post, comment, profile and feed lists from .values() rows
+# rather than model instances (see drf_api/fast_serialization.py). The
+# output is identical, set this to False to use the normal serializers.
+FAST_LIST_SERIALIZATION = True
+
+# List responses with at least this many rows per page are streamed to
+# the client in chunks (see StreamingListMixin in drf_api/mixins.py).
+STREAMING_LIST_MIN_PAGE_SIZE = 100
+
+# Uploaded post and profile images are stored during the request, and
+# resized by the 'images.process' task (see drf_api/images.py). Images
+# still processing after this many seconds are marked as failed, as
+# their task must have been lost.
+IMAGE_PROCESSING_TIMEOUT = 600
+
+# Responses to logged out GET requests on the post, profile and comment
+# views are cached (see drf_api/cache.py). Invalidation happens in the
+# process which makes the change, so production uses the database cache,
+# which every gunicorn worker shares. Create its table with
+# 'python manage.py createcachetable'.
+if 'DEV' in os.environ:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'drf_api_cache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+ANONYMOUS_CACHE_ALIAS = 'default'
+# Seconds a cached response is kept, even if nothing invalidates it
+ANONYMOUS_CACHE_TIMEOUT = 60
+
 # Enable JWT authentication
 REST_USE_JWT = True
 # Ensure JWT authentication occurs over HTTPS
@@ -58,6 +150,12 @@ JWT_AUTH_COOKIE = 'my-app-auth'
 # Name refresh token
 JWT_AUTH_REFRESH_COOKIE = 'my-refresh token'
 
+# Verified access tokens and their users are cached in each process, see
+# drf_api/authentication.py, for up to JWT_USER_CACHE_TTL seconds. That
+# is also how long a change to a user takes to reach other processes.
+JWT_USER_CACHE_SIZE = 10000
+JWT_USER_CACHE_TTL = 60
+
 # Overwrite the default REST_AUTH_SERIALIZERS value to use our
 # own custom serializer, which adds a profile id and image to the
 # details of the authenticated user returned to the client.
@@ -101,15 +199,21 @@ INSTALLED_APPS = [
     'allauth.socialaccount',
     'dj_rest_auth.registration',
     'corsheaders',
+    'drf_api',
     'profiles',
     'posts',
     'comments',
     'likes',
     'followers',
+    'timeline',
+    'tasks',
+    'deletions',
 ]
 SITE_ID = 1
 
 MIDDLEWARE = [
+    # First, so its total covers the rest of the middleware
+    'drf_api.timing.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -118,6 +222,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Last, so only the view's own queries decide where it reads from
+    'drf_api.db_router.ReplicaRoutingMiddleware',
 ]
 
 if 'CLIENT_ORIGIN' in os.environ:
@@ -136,7 +242,16 @@ JWT_AUTH_COOKIE = 'my-app-auth'
 JWT_AUTH_REFRESH_COOKIE = 'my-refresh-token'
 JWT_AUTH_SAMESITE = 'None'
 
-ROOT_URLCONF = 'drf_api.urls'
+# The ASGI entry point, drf_api/asgi.py, sets ASYNC_READ_VIEWS to serve
+# the read views asynchronously, see drf_api/async_views.py
+if os.environ.get('ASYNC_READ_VIEWS') == '1':
+    ROOT_URLCONF = 'drf_api.async_urls'
+else:
+    ROOT_URLCONF = 'drf_api.urls'
+# The threads each ASGI worker runs the async views' code in, so their
+# queries can run at the same time. Each thread keeps a connection to
+# each database it uses. Set it to 0 to run one query after another.
+ASYNC_QUERY_THREADS = int(os.environ.get('ASYNC_QUERY_THREADS', 4))
 
 TEMPLATES = [
     {
@@ -160,17 +275,67 @@ WSGI_APPLICATION = 'drf_api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Each gunicorn worker keeps its connection open between requests, for
+# up to DATABASE_CONN_MAX_AGE seconds, rather than paying for a new
+# PostgreSQL handshake and authentication on every request. Set it to 0
+# to connect per request. The database has to allow a connection per
+# worker (and thread). Our backends check a kept connection before each
+# request uses it, and reopen it if it broke, see drf_api/db_backends.
+# /db-stats/ shows how a worker's connections are used, and
+# bench_connections how much time they save.
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 600))
+DATABASE_ENGINES = {
+    'django.db.backends.postgresql': 'drf_api.db_backends.postgresql',
+    'django.db.backends.postgresql_psycopg2': (
+        'drf_api.db_backends.postgresql'
+    ),
+    'django.db.backends.sqlite3': 'drf_api.db_backends.sqlite3',
+}
+
+
+def parse_database_url(url):
+    database = dj_database_url.parse(
+        url, conn_max_age=DATABASE_CONN_MAX_AGE
+    )
+    database['ENGINE'] = DATABASE_ENGINES.get(
+        database['ENGINE'], database['ENGINE']
+    )
+    return database
+
+
 if 'DEV' in os.environ:
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
+            'ENGINE': 'drf_api.db_backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
 else:
     DATABASES = {
-        'default': dj_database_url.parse(os.environ.get("DATABASE_URL"))
+        'default': parse_database_url(os.environ.get("DATABASE_URL"))
+    }
+
+# Read replicas of the primary database, as a comma separated list of
+# URLs. Safe requests to the API read from them, see drf_api/db_router.py.
+# To try it locally, copy db.sqlite3 and set
+# DATABASE_REPLICA_URLS=sqlite:///db_replica.sqlite3
+DATABASE_REPLICAS = []
+for number, url in enumerate(
+    filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), 1
+):
+    DATABASES[f'replica_{number}'] = {
+        **parse_database_url(url.strip()),
+        # Tests read what they write, so use the primary's test database
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['drf_api.db_router.ReplicaRouter']
+
+# How long a client reads from the primary after it writes, which
+# should be longer than the replicas lag behind it
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_COOKIE = 'read-primary'
 
 
 # Password validation
@@ -0,0 +1,18 @@
+from tasks.queue import task
+from .images import fail_if_stuck, process_image
+
+
+# Make the variants of an uploaded post or profile image. Most of the
+# time goes on the storage backend and decoding, so it doesn't hold a
+# transaction open, and running it twice is harmless as only the first
+# run finds the image_job it was queued for. See drf_api/images.py.
+@task('images.process', atomic=False)
+def process(model_label, pk, job, path, cache_group=None):
+    process_image(model_label, pk, job, path, cache_group)
+
+
+# Queued with a delay of IMAGE_PROCESSING_TIMEOUT along with each
+# 'images.process' task, to give up on images which are never processed
+@task('images.fail_if_stuck')
+def check_stuck(model_label, pk, job, path, cache_group=None):
+    fail_if_stuck(model_label, pk, job, path, cache_group)
@@ -0,0 +1,825 @@
+import datetime
+import decimal
+import json
+import logging
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from io import StringIO
+from unittest import mock
+import pytz
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management import call_command
+from django.core.handlers.asgi import ASGIHandler
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection
+from django.test import (
+    SimpleTestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework import generics, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed, InvalidToken
+)
+from rest_framework_simplejwt.tokens import AccessToken
+from .async_views import get_query_executor
+from .authentication import CachedJWTCookieAuthentication, token_user_cache
+from .cache import anonymous_cache_stats, get_cache
+from .db_backends import connection_stats
+from .db_backends.sqlite3.base import DatabaseWrapper
+from .db_router import ReplicaRouter, ReplicaRoutingMiddleware
+from .renderers import FastJSONRenderer
+from .checks import check_filter_and_ordering_indexes, check_view_indexes
+from .management.commands.bench_endpoints import get_endpoints, get_subjects
+from posts.models import Post
+from profiles.models import Profile
+from timeline.models import TimelineEntry
+from likes.models import Like
+from comments.models import Comment
+from followers.models import Follower
+from posts.views import PostList
+
+
+class AnonymousCacheTests(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        anonymous_cache_stats.reset()
+        self.andy = User.objects.create_user(
+            username='andy', password='12345', is_staff=True
+        )
+        self.post = Post.objects.create(owner=self.andy, title='Post Title')
+
+    def test_logged_out_requests_are_cached(self):
+        response = self.client.get('/posts/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        # The same query with its parameters in another order is a hit
+        self.client.get('/posts/?search=&ordering=-likes_count&page=1')
+        response = self.client.get('/posts/?page=1&ordering=-likes_count')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['results'][0]['title'], 'Post Title')
+        self.assertEqual(anonymous_cache_stats.hits, 1)
+        self.assertEqual(anonymous_cache_stats.misses, 2)
+
+    def test_changes_invalidate_cached_responses(self):
+        self.client.get(f'/posts/{self.post.id}/')
+        Like.objects.create(owner=self.andy, post=self.post)
+        response = self.client.get(f'/posts/{self.post.id}/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['likes_count'], 1)
+
+    def test_logging_in_does_not_invalidate(self):
+        self.client.get('/profiles/')
+        self.client.login(username='andy', password='12345')
+        self.client.logout()
+        response = self.client.get('/profiles/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_logged_in_requests_are_not_cached(self):
+        self.client.login(username='andy', password='12345')
+        self.client.get('/posts/')
+        response = self.client.get('/posts/')
+        self.assertNotIn('X-Cache', response)
+        self.assertTrue(response.data['results'][0]['is_owner'])
+
+    def test_cache_stats_are_for_admins_only(self):
+        response = self.client.get('/cache-stats/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.login(username='andy', password='12345')
+        response = self.client.get('/cache-stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('hit_rate', response.data)
+        response = self.client.get('/db-stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('in_use', response.data)
+
+
+class IndexCheckTests(SimpleTestCase):
+    def test_api_views_have_supporting_indexes(self):
+        self.assertEqual(check_filter_and_ordering_indexes(None), [])
+
+    def test_unindexed_paths_are_reported(self):
+        class UnindexedView(generics.ListAPIView):
+            queryset = Post.objects.all()
+            filterset_fields = ['owner__profile', 'title']
+            ordering_fields = ['comment__content', 'likes_count']
+
+        warnings = check_view_indexes([UnindexedView])
+        self.assertEqual(
+            [warning.msg.split("'")[1] for warning in warnings],
+            ['title', 'comment__content']
+        )
+
+
+class FastSerializationTests(APITestCase):
+    """
+    The fast list path must send exactly the same bytes as the normal
+    serializers, for logged out and logged in users alike.
+    """
+    urls = [
+        '/posts/', '/posts/?ordering=-likes_count', '/posts/?search=second',
+        '/posts/?pagination=cursor', '/comments/', '/profiles/',
+        '/profiles/?ordering=-followers_count', '/feed/',
+    ]
+
+    def setUp(self):
+        get_cache().clear()
+        self.andy = User.objects.create_user(username='andy', password='pass')
+        self.brian = User.objects.create_user(
+            username='brian', password='pass'
+        )
+        Follower.objects.create(owner=self.andy, followed=self.brian)
+        first = Post.objects.create(owner=self.brian, title='first')
+        second = Post.objects.create(owner=self.andy, title='second')
+        Like.objects.create(owner=self.andy, post=first)
+        Like.objects.create(owner=self.brian, post=second)
+        Comment.objects.create(owner=self.andy, post=first, content='hi')
+
+    def get_both(self, url):
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            normal = self.client.get(url)
+        get_cache().clear()
+        with override_settings(FAST_LIST_SERIALIZATION=True):
+            fast = self.client.get(url)
+        get_cache().clear()
+        return normal, fast
+
+    def test_logged_out_output_is_identical(self):
+        for url in self.urls[:-1]:
+            normal, fast = self.get_both(url)
+            self.assertEqual(normal.status_code, status.HTTP_200_OK)
+            self.assertEqual(fast.content, normal.content, url)
+
+    def test_logged_in_output_is_identical(self):
+        self.client.login(username='andy', password='pass')
+        for url in self.urls:
+            normal, fast = self.get_both(url)
+            self.assertEqual(normal.status_code, status.HTTP_200_OK)
+            self.assertEqual(fast.content, normal.content, url)
+        # Check the per-user fields were actually filled in
+        results = fast.json()['results']
+        self.assertIsNotNone(results[0]['like_id'])
+
+    def test_only_serialized_columns_are_fetched(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/posts/')
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertIn('"auth_user"."username"', sql)
+        self.assertNotIn('search_document', sql)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def test_output_matches_json_renderer(self):
+        data = OrderedDict([
+            ('created_at', datetime.datetime(
+                2022, 11, 5, 9, 30, 1, 123456, tzinfo=pytz.utc
+            )),
+            ('date', datetime.date(2022, 11, 5)),
+            ('price', decimal.Decimal('1.50')),
+            ('message', gettext_lazy('Not found.')),
+            ('text', 'caf\u00e9 \u2028 "quoted"'),
+            ('nested', [{'id': 1, 'ok': True, 'none': None}]),
+        ])
+        self.assertEqual(
+            FastJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+    def test_indented_output_falls_back(self):
+        data = {'results': [1, 2]}
+        media_type = 'application/json; indent=4'
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type)
+        )
+
+
+class StreamingListTests(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        andy = User.objects.create_user(username='andy', password='pass')
+        for number in range(12):
+            Post.objects.create(owner=andy, title=f'post {number}')
+
+    @mock.patch.object(PostList, 'stream_chunk_size', 5)
+    def test_streamed_output_matches_normal_output(self):
+        urls = ['/posts/?page_size=100', '/posts/?page_size=100&search=post']
+        for url in urls:
+            with self.settings(STREAMING_LIST_MIN_PAGE_SIZE=None):
+                normal = self.client.get(url)
+            get_cache().clear()
+            streamed = self.client.get(url)
+            get_cache().clear()
+            self.assertFalse(normal.streaming)
+            self.assertTrue(streamed.streaming)
+            self.assertEqual(streamed.status_code, normal.status_code)
+            self.assertEqual(
+                b''.join(streamed.streaming_content), normal.content
+            )
+
+    def test_small_pages_are_not_streamed(self):
+        response = self.client.get('/posts/')
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_renderers', rows=50, repeat=2, stdout=out)
+        self.assertIn('FastJSONRenderer is', out.getvalue())
+
+
+class ServerTimingTests(APITestCase):
+    def setUp(self):
+        andy = User.objects.create_user(username='andy')
+        Post.objects.create(owner=andy, title='A post')
+
+    def test_header_and_log_line(self):
+        with CaptureQueriesContext(connection) as queries:
+            with self.assertLogs('drf_api.timing', 'INFO') as logs:
+                response = self.client.get('/posts/')
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        for metric in ('view;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+        line = logs.records[0]
+        self.assertEqual(line.timings['view'], 'posts.views.PostList')
+        self.assertEqual(line.timings['queries'], len(queries))
+        self.assertIn('view=posts.views.PostList method=GET', line.message)
+
+    def test_header_can_be_turned_off(self):
+        with self.settings(SERVER_TIMING_HEADER=False):
+            response = self.client.get('/posts/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_streamed_responses_are_logged_once_sent(self):
+        path = f'/posts/?page_size={settings.STREAMING_LIST_MIN_PAGE_SIZE}'
+        with CaptureQueriesContext(connection) as queries:
+            with self.assertLogs('drf_api.timing', 'INFO') as logs:
+                response = self.client.get(path)
+                self.assertTrue(response.streaming)
+                self.assertFalse(response.has_header('Server-Timing'))
+                logging.getLogger('drf_api.timing').info('Sent headers')
+                b''.join(response.streaming_content)
+        sent, line = logs.records
+        self.assertEqual(sent.message, 'Sent headers')
+        # Including the queries made while streaming
+        self.assertEqual(line.timings['queries'], len(queries))
+        self.assertNotIn('render_ms', line.timings)
+
+
+class LoadTestingCommandTests(APITestCase):
+    def setUp(self):
+        call_command(
+            'seed_social_graph', users=30, posts=2, follows=5, likes=3,
+            comments=2, stdout=StringIO()
+        )
+
+    def test_seeded_counters_match_the_rows(self):
+        for profile in Profile.objects.all():
+            self.assertEqual(
+                profile.posts_count,
+                Post.objects.filter(owner_id=profile.owner_id).count()
+            )
+            self.assertEqual(
+                profile.followers_count,
+                Follower.objects.filter(followed_id=profile.owner_id).count()
+            )
+        for post in Post.objects.all():
+            self.assertEqual(post.likes_count, post.likes.count())
+            self.assertEqual(
+                post.comments_count, Comment.objects.filter(post=post).count()
+            )
+        self.assertTrue(TimelineEntry.objects.exists())
+
+    def test_benchmark_reports_every_endpoint(self):
+        out = StringIO()
+        call_command(
+            'bench_endpoints', repeat=2, stdout=out, stderr=StringIO()
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['meta']['rows']['Profile'], 30)
+        endpoints = report['endpoints']
+        self.assertIn('feed', endpoints)
+        for result in endpoints.values():
+            self.assertEqual(result['status'], 200, result['path'])
+            self.assertGreater(result['queries'], 0, result['path'])
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+        # A second run compares itself with the first
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as previous:
+            previous.write(out.getvalue())
+            previous.flush()
+            out = StringIO()
+            call_command(
+                'bench_endpoints', repeat=2, compare=previous.name,
+                stdout=out, stderr=StringIO()
+            )
+        change = json.loads(out.getvalue())['endpoints']['feed']['change']
+        self.assertEqual(change['queries'], 0)
+
+    def test_connection_benchmark_reports_the_saving(self):
+        out = StringIO()
+        call_command(
+            'bench_connections', repeat=2, stdout=out, stderr=StringIO()
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['results']), {'per_request', 'kept'})
+        self.assertIn('p50_ms', report['saved'])
+
+    def test_concurrency_benchmark_reports_both_entry_points(self):
+        out = StringIO()
+        call_command(
+            'bench_concurrency', requests=4, concurrency=2, db_latency=1,
+            stdout=out, stderr=StringIO()
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['results']), {'wsgi', 'asgi'})
+        self.assertGreater(report['speedup'], 0)
+
+
+# The SQL each endpoint runs, see QueryRegressionTests. Set
+# UPDATE_QUERY_SNAPSHOTS=1 to write them again after a deliberate change,
+# and review the diff with the change.
+QUERY_SNAPSHOT_DIR = Path(__file__).resolve().parent / 'query_snapshots'
+
+
+def normalize_sql(sql):
+    # Leave out the values, which differ between runs, and the length
+    # of IN lists, which grows with the page
+    sql = re.sub(r"'(?:[^']|'')*'", "'?'", sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    return re.sub(r'\((?:\?|\'\?\')(?:, (?:\?|\'\?\'))*\)', '(...)', sql)
+
+
+class QueryRegressionTests(APITestCase):
+    """
+    Request every endpoint, logged out and logged in, with a small
+    social graph and then one ten times the size. The number of queries,
+    and the SQL itself, must not change as the data grows, which catches
+    a serializer field which makes a query per row. The SQL is also
+    compared with the snapshot in query_snapshots, so changes to the
+    queries show up in review.
+    """
+    def setUp(self):
+        get_cache().clear()
+
+    def seed(self, prefix, users):
+        call_command(
+            'seed_social_graph', users=users, posts=2, follows=4, likes=3,
+            comments=2, prefix=prefix, stdout=StringIO()
+        )
+
+    def capture(self, anonymous):
+        post, profile, viewer = get_subjects()
+        if not anonymous:
+            self.client.force_login(viewer.owner)
+        captured = {}
+        for name, path in get_endpoints(post, profile, viewer, anonymous):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, path)
+            captured[name] = [normalize_sql(query['sql']) for query in queries]
+        self.client.logout()
+        return captured
+
+    def check_snapshot(self, name, queries):
+        path = QUERY_SNAPSHOT_DIR / connection.vendor / f'{name}.sql'
+        sql = ';\n\n'.join(queries) + ';\n'
+        if os.environ.get('UPDATE_QUERY_SNAPSHOTS'):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(sql)
+        elif not path.exists():
+            self.fail(
+                f'No query snapshot for {name}, run the tests with '
+                f'UPDATE_QUERY_SNAPSHOTS=1 to write it'
+            )
+        self.assertEqual(
+            sql, path.read_text(),
+            f'The SQL for {name} changed, if that was deliberate run the '
+            f'tests with UPDATE_QUERY_SNAPSHOTS=1 and commit the snapshot'
+        )
+
+    def test_queries_dont_grow_with_the_data(self):
+        self.seed('small', 10)
+        small = {
+            anonymous: self.capture(anonymous) for anonymous in (True, False)
+        }
+        self.seed('large', 90)
+        for anonymous in (True, False):
+            large = self.capture(anonymous)
+            self.assertEqual(large.keys(), small[anonymous].keys())
+            for name, queries in large.items():
+                snapshot = f"{name}.{'anonymous' if anonymous else 'user'}"
+                with self.subTest(snapshot):
+                    self.assertEqual(
+                        len(queries), len(small[anonymous][name]),
+                        f'{snapshot} makes more queries with more data'
+                    )
+                    self.assertEqual(queries, small[anonymous][name])
+                    self.check_snapshot(snapshot, queries)
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        token_user_cache.clear()
+        self.andy = User.objects.create_user(username='andy', password='12345')
+        self.token = str(AccessToken.for_user(self.andy))
+
+    def authenticate(self, token=None):
+        request = APIRequestFactory().get('/dj-rest-auth/user/')
+        request.COOKIES[settings.JWT_AUTH_COOKIE] = token or self.token
+        return CachedJWTCookieAuthentication().authenticate(Request(request))
+
+    def test_repeated_requests_skip_the_database(self):
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate()
+        self.assertEqual(user.profile.id, self.andy.profile.id)
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+            self.assertEqual(user.username, 'andy')
+            self.assertEqual(user.profile.id, self.andy.profile.id)
+            self.assertTrue(user.profile.image.url)
+        # Each request gets its own instance
+        self.assertIsNot(self.authenticate()[0], user)
+
+    def test_a_bad_signature_is_still_rejected(self):
+        self.authenticate()
+        with self.assertRaises(InvalidToken):
+            self.authenticate(self.token[:-2] + 'xx')
+
+    def test_changes_to_the_user_or_profile_are_seen(self):
+        self.authenticate()
+        self.andy.profile.name = 'Andy'
+        self.andy.profile.save()
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+        self.andy.is_active = False
+        self.andy.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_users_are_dropped(self):
+        self.authenticate()
+        call_command(
+            'delete_in_background', 'user', str(self.andy.id),
+            stdout=StringIO()
+        )
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_cache_is_bounded(self):
+        brian = User.objects.create_user(username='brian')
+        with self.settings(JWT_USER_CACHE_SIZE=1):
+            self.authenticate()
+            self.authenticate(str(AccessToken.for_user(brian)))
+            # Andy's token was the least recently used, so it's gone
+            with self.assertNumQueries(1):
+                self.authenticate()
+
+    def test_entries_expire(self):
+        with self.settings(JWT_USER_CACHE_TTL=0):
+            self.authenticate()
+            with self.assertNumQueries(1):
+                self.authenticate()
+
+
+cache_model = DatabaseCache('drf_api_cache', {}).cache_model_class
+
+
+class RoutedView(APIView):
+    """
+    Reports where reads go, before and after it writes if asked to.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        router = ReplicaRouter()
+        read = router.db_for_read(Post)
+        if request.GET.get('write'):
+            router.db_for_write(Post)
+        if request.GET.get('cache'):
+            router.db_for_write(cache_model)
+        return Response({
+            'read': read, 'after_write': router.db_for_read(Post)
+        })
+
+
+def plain_view(request):
+    return Response({'read': ReplicaRouter().db_for_read(Post)})
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRouterTests(SimpleTestCase):
+    def request(self, method, view=RoutedView.as_view(), **extra):
+        request = getattr(APIRequestFactory(), method)('/posts/', **extra)
+        middleware = ReplicaRoutingMiddleware(None)
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+        middleware.get_response = get_response
+        return middleware(request)
+
+    def test_safe_requests_read_from_a_replica(self):
+        response = self.request('get')
+        self.assertEqual(response.data['read'], 'replica_1')
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertEqual(self.request('head').data['read'], 'replica_1')
+
+    def test_writes_go_to_the_primary(self):
+        response = self.request('post')
+        self.assertIsNone(response.data['read'])
+        self.assertEqual(ReplicaRouter().db_for_write(Post), 'default')
+        # Reads after a write in the same request see it
+        response = self.request('get', data={'write': 1})
+        self.assertEqual(response.data['read'], 'replica_1')
+        self.assertIsNone(response.data['after_write'])
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_cache_writes_do_not_pin_clients(self):
+        response = self.request('get', data={'cache': 1})
+        self.assertEqual(response.data['after_write'], 'replica_1')
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        # The cache's table is only in the primary
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(cache_model), 'default')
+        self.assertEqual(router.db_for_write(cache_model), 'default')
+
+    def test_clients_which_wrote_are_pinned_to_the_primary(self):
+        cookie = self.request('post').cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+        response = self.request('get', HTTP_COOKIE=(
+            f'{settings.REPLICA_PIN_COOKIE}={cookie.value}'
+        ))
+        self.assertIsNone(response.data['read'])
+        # Once the pin expires, or if it's nonsense, reads go back
+        for value in ('1.0', 'nonsense'):
+            response = self.request('get', HTTP_COOKIE=(
+                f'{settings.REPLICA_PIN_COOKIE}={value}'
+            ))
+            self.assertEqual(response.data['read'], 'replica_1')
+
+    def test_only_api_views_use_replicas(self):
+        view = mock.Mock(side_effect=plain_view)
+        self.assertIsNone(self.request('get', view=view).data['read'])
+        # Outside a request, e.g. in tasks and commands
+        self.assertIsNone(ReplicaRouter().db_for_read(Post))
+
+    def test_replicas_are_not_migrated(self):
+        router = ReplicaRouter()
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+        self.assertFalse(router.allow_migrate('replica_1', 'posts'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_the_primary(self):
+        self.assertIsNone(self.request('get').data['read'])
+
+
+class PersistentConnectionTests(SimpleTestCase):
+    """
+    Uses a connection of its own, to a file, as the test database is in
+    memory and in a transaction, so it's never closed or checked.
+    """
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(directory.name, 'db.sqlite3'),
+            'CONN_MAX_AGE': 600,
+        }, alias='persistent')
+        self.addCleanup(self.db.close)
+        connection_stats.reset()
+
+    def query(self):
+        with self.db.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    def test_kept_connections_are_checked_once_per_request(self):
+        self.query()
+        self.assertTrue(self.db.checked_out)
+        # The request ends, and the connection is kept, unchecked
+        with mock.patch.object(self.db, 'is_usable') as is_usable:
+            self.db.close_if_unusable_or_obsolete()
+        is_usable.assert_not_called()
+        self.assertFalse(self.db.checked_out)
+        self.assertIsNotNone(self.db.connection)
+
+        with mock.patch.object(
+            self.db, 'is_usable', return_value=True
+        ) as is_usable:
+            self.query()
+            self.query()
+        is_usable.assert_called_once()
+        stats = connection_stats.as_dict()
+        self.assertEqual(stats['opened'], 1)
+        self.assertEqual(stats['reused'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+
+    def test_broken_connections_are_reopened(self):
+        self.query()
+        self.db.close_if_unusable_or_obsolete()
+        broken = self.db.connection
+        with mock.patch.object(self.db, 'is_usable', return_value=False):
+            self.query()
+        self.assertIsNot(self.db.connection, broken)
+        stats = connection_stats.as_dict()
+        self.assertEqual(stats['broken'], 1)
+        self.assertEqual(stats['opened'], 2)
+
+    def test_connections_are_closed_when_too_old(self):
+        self.db.settings_dict['CONN_MAX_AGE'] = 0
+        self.query()
+        self.db.close_if_unusable_or_obsolete()
+        self.assertIsNone(self.db.connection)
+
+
+def get_async(client, path, **extra):
+    # Make a request through the ASGI entry point's URLs, with the async
+    # read views
+    async def get():
+        return await client.get(path, **extra)
+    with override_settings(ROOT_URLCONF='drf_api.async_urls'):
+        return async_to_sync(get)()
+
+
+def get_through_asgi(path, cookies):
+    """
+    Make a GET request through Django's ASGI handler and return its
+    status and body. Unlike the async test client, the handler sends the
+    body from the event loop, as a server does.
+    """
+    path, _, query_string = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path,
+        'query_string': query_string.encode(),
+        'headers': [
+            (b'host', b'testserver'), (b'cookie', cookies.encode()),
+        ],
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    # As the test clients do, keep the test's connection open
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+    try:
+        with override_settings(ROOT_URLCONF='drf_api.async_urls'):
+            async_to_sync(ASGIHandler())(scope, receive, send)
+    finally:
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+    return messages[0]['status'], b''.join(
+        message.get('body', b'') for message in messages[1:]
+    )
+
+
+def get_query_count(response):
+    return re.search(
+        r'desc="(\d+) queries"', response['Server-Timing']
+    ).group(1)
+
+
+class AsyncReadViewTests(APITestCase):
+    """
+    The tests' transaction can't be seen from the query threads, so
+    here the async views run their queries one after another, see
+    AsyncQueryThreadTests.
+    """
+    def setUp(self):
+        get_cache().clear()
+        call_command(
+            'seed_social_graph', users=15, posts=2, follows=4, likes=3,
+            comments=2, stdout=StringIO()
+        )
+        self.post, self.profile, self.viewer = get_subjects()
+        self.async_client.force_login(self.viewer.owner)
+        self.client.force_login(self.viewer.owner)
+
+    def assertSameResponse(self, path):
+        response = self.client.get(path)
+        async_response = get_async(self.async_client, path)
+        self.assertEqual(
+            async_response.status_code, response.status_code, path
+        )
+        self.assertEqual(async_response.content, response.content, path)
+        return response, async_response
+
+    def test_output_matches_the_sync_views(self):
+        for name, path in get_endpoints(
+            self.post, self.profile, self.viewer
+        ):
+            response, async_response = self.assertSameResponse(path)
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(
+                get_query_count(async_response), get_query_count(response),
+                path
+            )
+        for path in ('/posts/?pagination=cursor', '/posts/?page=last'):
+            self.assertSameResponse(path)
+
+    def test_logged_out_output_matches_and_is_cached(self):
+        self.client.logout()
+        self.async_client.logout()
+        for path in ('/posts/', f'/posts/{self.post.id}/'):
+            response, async_response = self.assertSameResponse(path)
+            self.assertEqual(async_response['X-Cache'], 'HIT')
+        get_cache().clear()
+        self.assertEqual(
+            get_async(self.async_client, '/profiles/')['X-Cache'], 'MISS'
+        )
+        self.assertEqual(self.client.get('/profiles/')['X-Cache'], 'HIT')
+
+    def test_streamed_lists(self):
+        path = f'/posts/?page_size={settings.STREAMING_LIST_MIN_PAGE_SIZE}'
+        response = self.client.get(path)
+        self.assertTrue(response.streaming)
+        status_code, body = get_through_asgi(
+            path, self.client.cookies.output(header='', sep=';')
+        )
+        self.assertEqual(status_code, 200)
+        self.assertEqual(body, b''.join(response.streaming_content))
+
+    def test_missing_objects_and_pages(self):
+        for path in ('/posts/999999/', '/posts/?page=999', '/posts/?page=x'):
+            response = get_async(self.async_client, path)
+            self.assertEqual(response.status_code, 404, path)
+
+    def test_not_modified(self):
+        path = f'/posts/{self.post.id}/'
+        etag = get_async(self.async_client, path)['ETag']
+        # The async client takes headers by their own names
+        response = get_async(
+            self.async_client, path, **{'If-None-Match': etag}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_use_the_sync_views(self):
+        async def post():
+            return await self.async_client.post(
+                '/posts/', json.dumps({'title': 'Async'}),
+                content_type='application/json'
+            )
+        with override_settings(ROOT_URLCONF='drf_api.async_urls'):
+            response = async_to_sync(post)()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Post.objects.filter(title='Async').exists())
+
+
+class AsyncQueryThreadTests(TransactionTestCase):
+    reset_sequences = True
+
+    def setUp(self):
+        get_cache().clear()
+        andy = User.objects.create_user(username='andy')
+        post = Post.objects.create(owner=andy, title='A post')
+        Like.objects.create(owner=andy, post=post)
+        self.client.force_login(andy)
+        self.async_client.force_login(andy)
+
+    def test_queries_run_in_the_query_threads(self):
+        response = self.client.get('/posts/')
+        with mock.patch(
+            'drf_api.async_views.get_query_executor',
+            side_effect=get_query_executor
+        ) as executor:
+            async_response = get_async(self.async_client, '/posts/')
+        self.assertTrue(executor.called)
+        self.assertEqual(async_response.content, response.content)
+        self.assertEqual(
+            get_query_count(async_response), get_query_count(response)
+        )
+        self.assertEqual(response.data['results'][0]['like_id'], 1)
+
+    def test_connections_are_checked_in_once_per_request(self):
+        get_async(self.async_client, '/posts/')
+        # Each thread checks its connections in for the request once,
+        # rather than after each of the request's queries
+        with mock.patch(
+            'drf_api.async_views.close_old_connections'
+        ) as close_old_connections:
+            response = get_async(self.async_client, '/posts/')
+        self.assertGreater(
+            int(get_query_count(response)), settings.ASYNC_QUERY_THREADS
+        )
+        self.assertLessEqual(
+            close_old_connections.call_count, settings.ASYNC_QUERY_THREADS
+        )
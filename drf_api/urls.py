@@ -15,11 +15,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from .views import root_route
+from .views import root_route, cache_stats, db_stats
 
 urlpatterns = [
     path('', root_route),
     path('admin/', admin.site.urls),
+    path('cache-stats/', cache_stats),
+    path('db-stats/', db_stats),
     # Django REST Framework include log-in and log-out
     # views we can use. We just need to include them here.
     path('api-auth', include('rest_framework.urls')),
@@ -31,5 +33,6 @@ urlpatterns = [
     path('', include('posts.urls')),
     path('', include('comments.urls')),
     path('', include('likes.urls')),
-    path('', include('followers.urls'))
+    path('', include('followers.urls')),
+    path('', include('timeline.urls')),
 ]
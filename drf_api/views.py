@@ -1,5 +1,8 @@
-from rest_framework.decorators import api_view
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from .cache import anonymous_cache_stats
+from .db_backends import connection_stats
 
 
 @api_view()
@@ -7,3 +10,20 @@ def root_route(request):
     return Response({
         "message": "Welcome to this Django REST Frameworks API"
     })
+
+
+# Report this worker's hit and miss counts of the logged out response
+# cache, so we can tell whether it is big enough. Admin users only.
+@api_view()
+@permission_classes([permissions.IsAdminUser])
+def cache_stats(request):
+    return Response(anonymous_cache_stats.as_dict())
+
+
+# Report how this worker's database connections are used: how many are
+# in use and idle, how often kept ones are reused or found broken, and
+# how long requests wait for one. Admin users only.
+@api_view()
+@permission_classes([permissions.IsAdminUser])
+def db_stats(request):
+    return Response(connection_stats.as_dict())
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.16 on 2026-10-18 13:22
+
+from django.db import migrations, models
+from drf_api.operations import AddIndexSafely
+
+
+class Migration(migrations.Migration):
+
+    # The indexes are built concurrently on PostgreSQL, so that writes to
+    # the table carry on while they build. That can't happen inside a
+    # transaction.
+    atomic = False
+
+    dependencies = [
+        ('followers', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexSafely(
+            model_name='follower',
+            index=models.Index(fields=['-created_at'], name='follower_created_idx'),
+        ),
+        AddIndexSafely(
+            model_name='follower',
+            index=models.Index(fields=['owner', '-created_at'], name='follower_owner_created_idx'),
+        ),
+        AddIndexSafely(
+            model_name='follower',
+            index=models.Index(fields=['followed', '-created_at'], name='follower_followed_created_idx'),
+        ),
+    ]
@@ -1,5 +1,244 @@
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import User
+from profiles.models import Profile
+from drf_api.cache import invalidate_now_and_on_commit, invalidate_on_change
+from tasks.queue import enqueue
+
+# Insert the follower unless it exists, and count it on both profiles if
+# it was inserted, in one statement. A single UPDATE counts both sides,
+# as a statement can only update each row once, which matters when a
+# user follows themselves. The last SELECT reads the table as it was
+# before the insert, so it finds the follower if it already existed.
+# {follower}, {user} and {profile} are the models' tables, see
+# FollowerManager.postgres_sql.
+POSTGRES_FOLLOW_SQL = '''
+WITH inserted AS (
+    INSERT INTO {follower} (owner_id, followed_id, created_at)
+    SELECT %(owner_id)s, id, %(now)s FROM {user}
+    WHERE id = %(followed_id)s AND is_active
+    ON CONFLICT (owner_id, followed_id) DO NOTHING
+    RETURNING id, owner_id, followed_id
+), counted AS (
+    UPDATE {profile} AS p SET
+        following_count = p.following_count
+            + CASE WHEN p.owner_id = i.owner_id THEN 1 ELSE 0 END,
+        followers_count = p.followers_count
+            + CASE WHEN p.owner_id = i.followed_id THEN 1 ELSE 0 END
+    FROM inserted AS i WHERE p.owner_id IN (i.owner_id, i.followed_id)
+)
+SELECT (SELECT id FROM inserted), (
+    SELECT f.id FROM {follower} f
+    JOIN {user} u ON u.id = f.followed_id
+    WHERE f.owner_id = %(owner_id)s AND f.followed_id = %(followed_id)s
+    AND u.is_active
+)
+'''
+
+POSTGRES_UNFOLLOW_SQL = '''
+WITH deleted AS (
+    DELETE FROM {follower}
+    WHERE owner_id = %(owner_id)s AND followed_id = %(followed_id)s
+    RETURNING id, owner_id, followed_id
+), counted AS (
+    UPDATE {profile} AS p SET
+        following_count = GREATEST(p.following_count
+            - CASE WHEN p.owner_id = d.owner_id THEN 1 ELSE 0 END, 0),
+        followers_count = GREATEST(p.followers_count
+            - CASE WHEN p.owner_id = d.followed_id THEN 1 ELSE 0 END, 0)
+    FROM deleted AS d WHERE p.owner_id IN (d.owner_id, d.followed_id)
+)
+SELECT id FROM deleted
+'''
+
+
+class FollowerManager(models.Manager):
+    """
+    Adds follow() and unfollow(), which are safe to repeat, like
+    Like.objects.like() and unlike(). On PostgreSQL each is a single
+    statement which also updates both profiles' counters. As the
+    statements skip the model's signals, they invalidate the cache and
+    queue the timeline tasks themselves. Other databases fall back to the
+    ORM, where the signals do the work.
+    """
+    def postgres_sql(self, sql):
+        return sql.format(
+            follower=self.model._meta.db_table, user=User._meta.db_table,
+            profile=Profile._meta.db_table,
+        )
+
+    def follow(self, owner_id, followed_id):
+        """
+        Make sure 'owner_id' follows 'followed_id'. Returns the id of the
+        follower and whether it was created, or (None, False) if there
+        is no such active user.
+        """
+        connection = connections[self.db]
+        if connection.vendor != 'postgresql':
+            with transaction.atomic(using=self.db):
+                if not User.objects.filter(
+                    pk=followed_id, is_active=True
+                ).exists():
+                    return None, False
+                follower, created = self.get_or_create(
+                    owner_id=owner_id, followed_id=followed_id
+                )
+            return follower.id, created
+
+        with connection.cursor() as cursor:
+            cursor.execute(self.postgres_sql(POSTGRES_FOLLOW_SQL), {
+                'owner_id': owner_id, 'followed_id': followed_id,
+                'now': timezone.now(),
+            })
+            inserted_id, existing_id = cursor.fetchone()
+        if inserted_id is not None:
+            invalidate_now_and_on_commit('followers')
+            enqueue(
+                'timeline.backfill_timeline',
+                {'owner_id': owner_id, 'followed_id': followed_id},
+                idempotency_key=f'timeline.backfill_timeline:{inserted_id}'
+            )
+            return inserted_id, True
+        if existing_id is None:
+            # A follower committed by someone else while the statement
+            # ran is skipped by the insert but not seen by the SELECT
+            existing_id = self.filter(
+                owner_id=owner_id, followed_id=followed_id,
+                followed__is_active=True,
+            ).values_list('id', flat=True).first()
+        return existing_id, False
+
+    def unfollow(self, owner_id, followed_id):
+        """
+        Make sure 'owner_id' doesn't follow 'followed_id'. Returns
+        whether there was a follower to delete.
+        """
+        connection = connections[self.db]
+        if connection.vendor != 'postgresql':
+            with transaction.atomic(using=self.db):
+                follower = self.filter(
+                    owner_id=owner_id, followed_id=followed_id
+                ).first()
+                if follower is None:
+                    return False
+                follower.delete()
+            return True
+
+        with connection.cursor() as cursor:
+            cursor.execute(self.postgres_sql(POSTGRES_UNFOLLOW_SQL), {
+                'owner_id': owner_id, 'followed_id': followed_id,
+            })
+            row = cursor.fetchone()
+        if row is None:
+            return False
+        invalidate_now_and_on_commit('followers')
+        enqueue(
+            'timeline.prune_timeline',
+            {'owner_id': owner_id, 'followed_id': followed_id},
+            idempotency_key=f'timeline.prune_timeline:{row[0]}'
+        )
+        return True
+
+    def follow_many(self, owner_id, followed_ids):
+        """
+        Make sure 'owner_id' follows each of 'followed_ids', with a fixed
+        number of queries, plus a timeline task for each new follower.
+        Returns the id of each follower and whether it was created, by
+        followed user id, leaving out users who don't exist or aren't
+        active.
+        """
+        with transaction.atomic(using=self.db):
+            found = User.objects.filter(
+                pk__in=followed_ids, is_active=True
+            ).values_list('pk', flat=True)
+            followers = [
+                self.model(owner_id=owner_id, followed_id=pk) for pk in found
+            ]
+            # Skips the followers which already exist, and the signals
+            self.bulk_create(followers, ignore_conflicts=True)
+            # Read the ids back, as Like.objects.like_many() does. The
+            # followers we inserted have the created_at we gave them.
+            new_created_at = {
+                follower.followed_id: follower.created_at
+                for follower in followers
+            }
+            results = {
+                followed_id: (
+                    follower_id, created_at == new_created_at[followed_id]
+                )
+                for followed_id, follower_id, created_at in self.filter(
+                    owner_id=owner_id, followed_id__in=new_created_at
+                ).values_list('followed_id', 'id', 'created_at')
+            }
+            created = {
+                followed_id: follower_id
+                for followed_id, (follower_id, created) in results.items()
+                if created
+            }
+            if created:
+                Profile.objects.filter(owner_id=owner_id).update(
+                    following_count=F('following_count') + len(created)
+                )
+                Profile.objects.filter(owner_id__in=created).update(
+                    followers_count=F('followers_count') + 1
+                )
+                invalidate_now_and_on_commit('followers')
+                for followed_id, follower_id in created.items():
+                    enqueue(
+                        'timeline.backfill_timeline',
+                        {'owner_id': owner_id, 'followed_id': followed_id},
+                        idempotency_key=(
+                            f'timeline.backfill_timeline:{follower_id}'
+                        )
+                    )
+        return results
+
+    def unfollow_many(self, owner_id, followed_ids):
+        """
+        Make sure 'owner_id' doesn't follow any of 'followed_ids', with a
+        fixed number of queries, plus a timeline task for each follower
+        deleted. Returns the set of followed user ids which had a
+        follower to delete.
+        """
+        with transaction.atomic(using=self.db):
+            # Lock the followers, so a concurrent unfollow waits for us
+            # and then finds them gone, rather than counting them again
+            followers = dict(self.select_for_update().filter(
+                owner_id=owner_id, followed_id__in=followed_ids
+            ).values_list('id', 'followed_id'))
+            if followers:
+                # A plain DELETE, rather than QuerySet.delete(), which
+                # would send post_delete for each follower, as the counters
+                # are updated for the whole batch below. Nothing refers
+                # to followers, so there's nothing to cascade to.
+                placeholders = ', '.join(['%s'] * len(followers))
+                with connections[self.db].cursor() as cursor:
+                    cursor.execute(
+                        f'DELETE FROM {self.model._meta.db_table} '
+                        f'WHERE {self.model._meta.pk.column} '
+                        f'IN ({placeholders})', list(followers)
+                    )
+                Profile.objects.filter(owner_id=owner_id).update(
+                    following_count=Greatest(
+                        F('following_count') - len(followers), 0
+                    )
+                )
+                Profile.objects.filter(
+                    owner_id__in=followers.values(), followers_count__gt=0
+                ).update(followers_count=F('followers_count') - 1)
+                invalidate_now_and_on_commit('followers')
+                for follower_id, followed_id in followers.items():
+                    enqueue(
+                        'timeline.prune_timeline',
+                        {'owner_id': owner_id, 'followed_id': followed_id},
+                        idempotency_key=(
+                            f'timeline.prune_timeline:{follower_id}'
+                        )
+                    )
+        return set(followers.values())
 
 
 class Follower(models.Model):
@@ -19,9 +258,58 @@ class Follower(models.Model):
         )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = FollowerManager()
+
     class Meta:
         ordering = ['-created_at']
         unique_together = ['owner', 'followed']
+        indexes = [
+            models.Index(fields=['-created_at'], name='follower_created_idx'),
+            # Back ordering profiles by when they followed, or were
+            # followed by, someone
+            models.Index(
+                fields=['owner', '-created_at'],
+                name='follower_owner_created_idx'
+            ),
+            models.Index(
+                fields=['followed', '-created_at'],
+                name='follower_followed_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.owner} {self.followed}'
+
+    # Wrap the save in a transaction, so the post_save signal which updates
+    # both profiles' counters commits or rolls back with the follower.
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+# Keep Profile.following_count up to date for the follower, and
+# Profile.followers_count up to date for the user being followed.
+def increment_follow_counts(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.filter(owner_id=instance.owner_id).update(
+            following_count=F('following_count') + 1
+        )
+        Profile.objects.filter(owner_id=instance.followed_id).update(
+            followers_count=F('followers_count') + 1
+        )
+
+
+def decrement_follow_counts(sender, instance, **kwargs):
+    Profile.objects.filter(
+        owner_id=instance.owner_id, following_count__gt=0
+    ).update(following_count=F('following_count') - 1)
+    Profile.objects.filter(
+        owner_id=instance.followed_id, followers_count__gt=0
+    ).update(followers_count=F('followers_count') - 1)
+
+
+post_save.connect(increment_follow_counts, sender=Follower)
+post_delete.connect(decrement_follow_counts, sender=Follower)
+
+# Invalidate cached logged out responses which include followers
+invalidate_on_change(Follower, 'followers')
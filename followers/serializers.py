@@ -10,6 +10,8 @@ class FollowerSerializer(serializers.ModelSerializer):
     """
     owner = serializers.ReadOnlyField(source='owner.username')
     followed_name = serializers.ReadOnlyField(source='followed.username')
+    # The views fetch both users with each follower for the name fields
+    select_related_fields = ['owner', 'followed']
 
     class Meta:
         model = Follower
@@ -1,3 +1,151 @@
-from django.test import TestCase
+from unittest import skipUnless
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from .models import Follower
+from posts.models import Post
+from profiles.models import Profile
 
-# Create your tests here.
+
+class FollowerListViewTests(APITestCase):
+    def setUp(self):
+        # Create a user for everyone else to follow
+        self.andy = User.objects.create_user(username='andy', password='12345')
+
+    def create_followers(self, number):
+        for i in range(number):
+            user = User.objects.create_user(username=f'user{i}_{number}')
+            Follower.objects.create(owner=user, followed=self.andy)
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/followers/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_follower_list_query_count_is_constant(self):
+        self.create_followers(2)
+        small_page = self.count_list_queries()
+        self.create_followers(6)
+        self.assertEqual(self.count_list_queries(), small_page)
+
+
+class FollowUserViewTests(APITestCase):
+    def setUp(self):
+        self.andy = User.objects.create_user(username='andy', password='12345')
+        self.brian = User.objects.create_user(username='brian')
+        self.post = Post.objects.create(owner=self.brian, title='Hello')
+        self.url = f'/users/{self.brian.id}/follow/'
+
+    def test_following_twice_keeps_one_follower(self):
+        self.client.login(username='andy', password='12345')
+        response = self.client.put(self.url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        follower_id = response.data['id']
+        response = self.client.put(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], follower_id)
+
+        self.assertEqual(Follower.objects.count(), 1)
+        self.assertEqual(
+            Profile.objects.get(owner=self.andy).following_count, 1
+        )
+        self.assertEqual(
+            Profile.objects.get(owner=self.brian).followers_count, 1
+        )
+        # Brian's post was added to Andy's feed
+        self.assertEqual(self.client.get('/feed/').data['count'], 1)
+
+    def test_unfollowing_twice_is_not_an_error(self):
+        Follower.objects.create(owner=self.andy, followed=self.brian)
+        self.client.login(username='andy', password='12345')
+        for _ in range(2):
+            response = self.client.delete(self.url)
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Follower.objects.exists())
+        self.assertEqual(
+            Profile.objects.get(owner=self.brian).followers_count, 0
+        )
+        self.assertEqual(self.client.get('/feed/').data['count'], 0)
+
+    def test_cant_follow_deactivated_user(self):
+        User.objects.filter(pk=self.brian.id).update(is_active=False)
+        self.client.login(username='andy', password='12345')
+        response = self.client.put(self.url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BulkFollowViewTests(APITestCase):
+    def setUp(self):
+        self.andy = User.objects.create_user(username='andy', password='12345')
+        self.suggested = [
+            User.objects.create_user(username=f'user{number}')
+            for number in range(3)
+        ]
+        for user in self.suggested:
+            Post.objects.create(owner=user, title='Hello')
+        self.client.login(username='andy', password='12345')
+
+    def test_bulk_follow_reports_each_user(self):
+        Follower.objects.create(owner=self.andy, followed=self.suggested[0])
+        User.objects.filter(pk=self.suggested[2].id).update(is_active=False)
+        user_ids = [user.id for user in self.suggested]
+        response = self.client.put(
+            '/followers/bulk/', {'users': user_ids}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertFalse(results[0]['created'])
+        self.assertTrue(results[1]['created'])
+        self.assertEqual(results[2]['error'], 'Not found.')
+
+        self.assertEqual(
+            Profile.objects.get(owner=self.andy).following_count, 2
+        )
+        self.assertEqual(
+            Profile.objects.get(owner=self.suggested[1]).followers_count, 1
+        )
+        # Both followed users' posts are in the feed
+        self.assertEqual(self.client.get('/feed/').data['count'], 2)
+
+    def test_bulk_unfollow(self):
+        for user in self.suggested[:2]:
+            Follower.objects.create(owner=self.andy, followed=user)
+        response = self.client.delete('/followers/bulk/', {
+            'users': [user.id for user in self.suggested]
+        }, format='json')
+        self.assertEqual(
+            [result['deleted'] for result in response.data['results']],
+            [True, True, False]
+        )
+        self.assertFalse(Follower.objects.exists())
+        self.assertEqual(
+            Profile.objects.get(owner=self.andy).following_count, 0
+        )
+        self.assertEqual(self.client.get('/feed/').data['count'], 0)
+
+    def test_bulk_follow_reports_ids_too_big_for_the_database(self):
+        for method in (self.client.put, self.client.delete):
+            response = method('/followers/bulk/', {
+                'users': [self.suggested[0].id, 2**63]
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('error', response.data['results'][1])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL only statements')
+class PostgresFollowTests(APITestCase):
+    def test_follow_and_unfollow_statements(self):
+        andy = User.objects.create_user(username='andy')
+        brian = User.objects.create_user(username='brian')
+        follower_id, created = Follower.objects.follow(andy.id, brian.id)
+        self.assertTrue(created)
+        self.assertEqual(
+            Follower.objects.follow(andy.id, brian.id), (follower_id, False)
+        )
+        self.assertEqual(Profile.objects.get(owner=brian).followers_count, 1)
+        self.assertTrue(Follower.objects.unfollow(andy.id, brian.id))
+        self.assertFalse(Follower.objects.unfollow(andy.id, brian.id))
+        self.assertEqual(Profile.objects.get(owner=andy).following_count, 0)
@@ -3,5 +3,7 @@ from followers import views
 
 urlpatterns = [
     path('followers/', views.FollowerList.as_view()),
-    path('followers/<int:pk>/', views.FollowerDetail.as_view())
-]
\ No newline at end of file
+    path('followers/bulk/', views.BulkFollow.as_view()),
+    path('followers/<int:pk>/', views.FollowerDetail.as_view()),
+    path('users/<int:user_id>/follow/', views.FollowUser.as_view()),
+]
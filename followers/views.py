@@ -1,10 +1,18 @@
-from rest_framework import generics, permissions
+from django.http import Http404
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from drf_api.async_views import AsyncListMixin, AsyncRetrieveMixin
+from drf_api.bulk import BulkTargetsView
 from drf_api.permissions import IsOwnerOrReadOnly
+from drf_api.mixins import EagerLoadingMixin
 from .models import Follower
 from .serializers import FollowerSerializer
 
 
-class FollowerList(generics.ListCreateAPIView):
+class FollowerList(
+    AsyncListMixin, EagerLoadingMixin, generics.ListCreateAPIView
+):
     """
     List all followers, i.e. all instances of a user
     following another user'.
@@ -12,19 +20,68 @@ class FollowerList(generics.ListCreateAPIView):
     Perform_create: associate the current logged in user with a follower.
     """
     serializer_class = FollowerSerializer
-    queryset = Follower.objects.all()
+    # Leave out follows of and by deleted, i.e. deactivated, users, which
+    # are waiting to be removed in the background
+    queryset = Follower.objects.filter(
+        owner__is_active=True, followed__is_active=True
+    )
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
 
-class FollowerDetail(generics.RetrieveDestroyAPIView):
+class FollowerDetail(
+    AsyncRetrieveMixin, EagerLoadingMixin, generics.RetrieveDestroyAPIView
+):
     """
     Retrieve a follower
     No Update view, as we either follow or unfollow users
     Destroy a follower, i.e. unfollow someone if owner
     """
     serializer_class = FollowerSerializer
-    queryset = Follower.objects.all()
+    queryset = Follower.objects.filter(
+        owner__is_active=True, followed__is_active=True
+    )
     permission_classes = [IsOwnerOrReadOnly]
+
+
+class FollowUser(APIView):
+    """
+    Follow a user with PUT, or unfollow them with DELETE, as the logged
+    in user. Both are idempotent, so sending either twice has the same
+    result as sending it once.
+    PUT returns the follower's id, with 201 if it was created or 200 if
+    the user was already followed.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def put(self, request, user_id):
+        follower_id, created = Follower.objects.follow(
+            request.user.id, user_id
+        )
+        if follower_id is None:
+            raise Http404
+        return Response(
+            {'id': follower_id, 'followed': user_id},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    def delete(self, request, user_id):
+        Follower.objects.unfollow(request.user.id, user_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class BulkFollow(BulkTargetsView):
+    """
+    Follow, with PUT, or unfollow, with DELETE, up to BULK_MAX_TARGETS
+    users, listed under 'users', as the logged in user.
+    """
+    target_field = 'users'
+    result_field = 'followed'
+
+    def add_targets(self, owner_id, target_ids):
+        return Follower.objects.follow_many(owner_id, target_ids)
+
+    def remove_targets(self, owner_id, target_ids):
+        return Follower.objects.unfollow_many(owner_id, target_ids)
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.16 on 2026-10-18 13:22
+
+from django.db import migrations, models
+from drf_api.operations import AddIndexSafely
+
+
+class Migration(migrations.Migration):
+
+    # The indexes are built concurrently on PostgreSQL, so that writes to
+    # the table carry on while they build. That can't happen inside a
+    # transaction.
+    atomic = False
+
+    dependencies = [
+        ('likes', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        AddIndexSafely(
+            model_name='like',
+            index=models.Index(fields=['post', '-created_at'], name='like_post_created_idx'),
+        ),
+    ]
@@ -1,6 +1,183 @@
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import User
 from posts.models import Post
+from drf_api.cache import invalidate_now_and_on_commit, invalidate_on_change
+
+# Insert the like unless it exists, and count it on the post if it was
+# inserted, in one statement. The last SELECT reads the table as it was
+# before the insert, so it finds the like if it already existed.
+# {like} and {post} are the models' tables, see LikeManager.postgres_sql.
+POSTGRES_LIKE_SQL = '''
+WITH inserted AS (
+    INSERT INTO {like} (owner_id, post_id, created_at)
+    SELECT %(owner_id)s, id, %(now)s FROM {post}
+    WHERE id = %(post_id)s AND deleted_at IS NULL
+    ON CONFLICT (owner_id, post_id) DO NOTHING
+    RETURNING id, post_id
+), counted AS (
+    UPDATE {post} SET likes_count = likes_count + 1
+    WHERE id IN (SELECT post_id FROM inserted)
+)
+SELECT (SELECT id FROM inserted), (
+    SELECT l.id FROM {like} l JOIN {post} p ON p.id = l.post_id
+    WHERE l.owner_id = %(owner_id)s AND l.post_id = %(post_id)s
+    AND p.deleted_at IS NULL
+)
+'''
+
+POSTGRES_UNLIKE_SQL = '''
+WITH deleted AS (
+    DELETE FROM {like}
+    WHERE owner_id = %(owner_id)s AND post_id = %(post_id)s
+    RETURNING post_id
+), counted AS (
+    UPDATE {post} SET likes_count = likes_count - 1
+    WHERE id IN (SELECT post_id FROM deleted)
+    AND likes_count > 0 AND deleted_at IS NULL
+)
+SELECT COUNT(*) FROM deleted
+'''
+
+
+class LikeManager(models.Manager):
+    """
+    Adds like() and unlike(), which are safe to repeat, so clients can
+    retry them or send them twice without getting an error.
+    On PostgreSQL each is a single statement which also updates the
+    post's likes_count, rather than a failed INSERT and a rolled back
+    savepoint when the like already exists. As the statements skip the
+    model's signals, they invalidate the cache themselves. Other
+    databases fall back to the ORM, where the signals do the work.
+    """
+    def postgres_sql(self, sql):
+        return sql.format(
+            like=self.model._meta.db_table, post=Post._meta.db_table
+        )
+
+    def like(self, owner_id, post_id):
+        """
+        Make sure 'owner_id' likes 'post_id'. Returns the id of the like
+        and whether it was created, or (None, False) if there is no
+        such post.
+        """
+        connection = connections[self.db]
+        if connection.vendor != 'postgresql':
+            with transaction.atomic(using=self.db):
+                if not Post.objects.filter(pk=post_id).exists():
+                    return None, False
+                like, created = self.get_or_create(
+                    owner_id=owner_id, post_id=post_id
+                )
+            return like.id, created
+
+        with connection.cursor() as cursor:
+            cursor.execute(self.postgres_sql(POSTGRES_LIKE_SQL), {
+                'owner_id': owner_id, 'post_id': post_id,
+                'now': timezone.now(),
+            })
+            inserted_id, existing_id = cursor.fetchone()
+        if inserted_id is not None:
+            invalidate_now_and_on_commit('likes')
+            return inserted_id, True
+        if existing_id is None:
+            # A like committed by someone else while the statement ran
+            # is skipped by the insert but not seen by the SELECT
+            existing_id = self.filter(
+                owner_id=owner_id, post_id=post_id,
+                post__deleted_at__isnull=True,
+            ).values_list('id', flat=True).first()
+        return existing_id, False
+
+    def unlike(self, owner_id, post_id):
+        """
+        Make sure 'owner_id' doesn't like 'post_id'. Returns whether
+        there was a like to delete.
+        """
+        connection = connections[self.db]
+        if connection.vendor != 'postgresql':
+            with transaction.atomic(using=self.db):
+                like = self.filter(owner_id=owner_id, post_id=post_id).first()
+                if like is None:
+                    return False
+                like.delete()
+            return True
+
+        with connection.cursor() as cursor:
+            cursor.execute(self.postgres_sql(POSTGRES_UNLIKE_SQL), {
+                'owner_id': owner_id, 'post_id': post_id,
+            })
+            deleted = cursor.fetchone()[0]
+        if deleted:
+            invalidate_now_and_on_commit('likes')
+        return bool(deleted)
+
+    def like_many(self, owner_id, post_ids):
+        """
+        Make sure 'owner_id' likes each of 'post_ids', with a fixed
+        number of queries. Returns the id of each like and whether it was
+        created, by post id, leaving out posts which don't exist.
+        """
+        with transaction.atomic(using=self.db):
+            found = Post.objects.filter(pk__in=post_ids).values_list(
+                'pk', flat=True
+            )
+            likes = [self.model(owner_id=owner_id, post_id=pk) for pk in found]
+            # Skips the likes which already exist, and the signals
+            self.bulk_create(likes, ignore_conflicts=True)
+            # bulk_create can't return ids when it ignores conflicts, so
+            # read them back. The likes we inserted are the ones with the
+            # created_at we gave them, rather than that of a like which
+            # was there already, or made by another request meanwhile.
+            new_created_at = {like.post_id: like.created_at for like in likes}
+            results = {
+                post_id: (like_id, created_at == new_created_at[post_id])
+                for post_id, like_id, created_at in self.filter(
+                    owner_id=owner_id, post_id__in=new_created_at
+                ).values_list('post_id', 'id', 'created_at')
+            }
+            created = [
+                post_id for post_id, (_, created) in results.items()
+                if created
+            ]
+            if created:
+                Post.objects.filter(pk__in=created).update(
+                    likes_count=F('likes_count') + 1
+                )
+                invalidate_now_and_on_commit('likes')
+        return results
+
+    def unlike_many(self, owner_id, post_ids):
+        """
+        Make sure 'owner_id' doesn't like any of 'post_ids', with a fixed
+        number of queries. Returns the set of post ids which had a like
+        to delete.
+        """
+        with transaction.atomic(using=self.db):
+            # Lock the likes, so a concurrent unlike waits for us and
+            # then finds them gone, rather than counting them again
+            likes = dict(self.select_for_update().filter(
+                owner_id=owner_id, post_id__in=post_ids
+            ).values_list('id', 'post_id'))
+            if likes:
+                # A plain DELETE, rather than QuerySet.delete(), which
+                # would send post_delete for each like, as the counters
+                # are updated for the whole batch below. Nothing refers
+                # to likes, so there's nothing to cascade to.
+                placeholders = ', '.join(['%s'] * len(likes))
+                with connections[self.db].cursor() as cursor:
+                    cursor.execute(
+                        f'DELETE FROM {self.model._meta.db_table} '
+                        f'WHERE {self.model._meta.pk.column} '
+                        f'IN ({placeholders})', list(likes)
+                    )
+                Post.objects.filter(
+                    pk__in=likes.values(), likes_count__gt=0
+                ).update(likes_count=F('likes_count') - 1)
+                invalidate_now_and_on_commit('likes')
+        return set(likes.values())
 
 
 class Like(models.Model):
@@ -15,9 +192,50 @@ class Like(models.Model):
         )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = LikeManager()
+
     class Meta:
         ordering = ['-created_at']
         unique_together = ['owner', 'post']
+        indexes = [
+            # Backs keyset pagination of the like list
+            models.Index(
+                fields=['-created_at', '-id'], name='like_created_id_idx'
+            ),
+            # Backs ordering posts by when they were liked
+            models.Index(
+                fields=['post', '-created_at'], name='like_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
-        return f'{self.owner} {self.post}'
\ No newline at end of file
+        return f'{self.owner} {self.post}'
+
+    # Wrap the save in a transaction, so the post_save signal which updates
+    # the post's likes_count commits or rolls back together with the like.
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+# Keep Post.likes_count up to date. We use F() expressions so the
+# increment and decrement happen in the database, which means two
+# likes arriving at the same time can't overwrite each other's count.
+def increment_likes_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(
+            likes_count=F('likes_count') + 1
+        )
+
+
+def decrement_likes_count(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, likes_count__gt=0).update(
+        likes_count=F('likes_count') - 1
+    )
+
+
+post_save.connect(increment_likes_count, sender=Like)
+post_delete.connect(decrement_likes_count, sender=Like)
+
+# Invalidate cached logged out responses which include likes
+invalidate_on_change(Like, 'likes')
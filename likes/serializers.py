@@ -9,6 +9,8 @@ class LikeSerializer(serializers.ModelSerializer):
     The create method handles the unique constraint on 'owner' and 'post'
     """
     owner = serializers.ReadOnlyField(source='owner.username')
+    # The views fetch the owner with each like for the owner field
+    select_related_fields = ['owner']
 
     class Meta:
         model = Like
@@ -1,3 +1,167 @@
-from django.test import TestCase
+from unittest import skipUnless
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from .models import Like
+from posts.models import Post
 
-# Create your tests here.
+
+class LikeListViewTests(APITestCase):
+    def setUp(self):
+        # Create a user and a post to like
+        self.andy = User.objects.create_user(username='andy', password='12345')
+        self.post = Post.objects.create(owner=self.andy, title='Post Title')
+
+    def create_likes(self, number):
+        # Each like gets its own owner, so that a missing
+        # select_related would cost an extra query per row
+        for i in range(number):
+            user = User.objects.create_user(username=f'user{i}_{number}')
+            Like.objects.create(owner=user, post=self.post)
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/likes/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_like_list_query_count_is_constant(self):
+        self.create_likes(2)
+        small_page = self.count_list_queries()
+        self.create_likes(6)
+        self.assertEqual(self.count_list_queries(), small_page)
+
+
+class PostLikeViewTests(APITestCase):
+    def setUp(self):
+        self.andy = User.objects.create_user(username='andy', password='12345')
+        self.post = Post.objects.create(owner=self.andy, title='Post Title')
+        self.url = f'/posts/{self.post.id}/like/'
+
+    def likes_count(self):
+        return Post.objects.get(pk=self.post.id).likes_count
+
+    def test_liking_twice_keeps_one_like(self):
+        self.client.login(username='andy', password='12345')
+        response = self.client.put(self.url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        like_id = response.data['id']
+        response = self.client.put(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], like_id)
+        self.assertEqual(Like.objects.count(), 1)
+        self.assertEqual(self.likes_count(), 1)
+
+    def test_unliking_twice_is_not_an_error(self):
+        Like.objects.create(owner=self.andy, post=self.post)
+        self.client.login(username='andy', password='12345')
+        for _ in range(2):
+            response = self.client.delete(self.url)
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(self.likes_count(), 0)
+
+    def test_cant_like_missing_post_or_while_logged_out(self):
+        response = self.client.put(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.login(username='andy', password='12345')
+        response = self.client.put('/posts/999/like/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Like.objects.exists())
+
+
+class BulkLikeViewTests(APITestCase):
+    def setUp(self):
+        self.andy = User.objects.create_user(username='andy', password='12345')
+        self.posts = [
+            Post.objects.create(owner=self.andy, title=f'Post {number}')
+            for number in range(3)
+        ]
+        Like.objects.create(owner=self.andy, post=self.posts[0])
+        self.client.login(username='andy', password='12345')
+
+    def test_bulk_like_reports_each_post(self):
+        first, second, third = [post.id for post in self.posts]
+        response = self.client.put('/likes/bulk/', {
+            'posts': [first, second, 999, 'abc', second]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(
+            [result['post'] for result in results],
+            [first, second, 999, 'abc', second]
+        )
+        self.assertFalse(results[0]['created'])
+        self.assertTrue(results[1]['created'])
+        self.assertEqual(results[2]['error'], 'Not found.')
+        self.assertIn('error', results[3])
+        self.assertEqual(results[4]['id'], results[1]['id'])
+        self.assertEqual(
+            results[1]['id'], Like.objects.get(post_id=second).id
+        )
+        # Only the new like was counted
+        self.assertEqual(
+            [Post.objects.get(pk=pk).likes_count for pk in (first, second)],
+            [1, 1]
+        )
+
+    def test_bulk_like_query_count_is_constant(self):
+        def count_queries(post_ids):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.put(
+                    '/likes/bulk/', {'posts': post_ids}, format='json'
+                )
+            return len(queries)
+
+        one_post = count_queries([self.posts[1].id])
+        more = [
+            Post.objects.create(owner=self.andy, title='More').id
+            for _ in range(5)
+        ]
+        self.assertEqual(count_queries(more), one_post)
+
+    def test_bulk_unlike(self):
+        response = self.client.delete('/likes/bulk/', {
+            'posts': [self.posts[0].id, self.posts[1].id]
+        }, format='json')
+        self.assertEqual(
+            [result['deleted'] for result in response.data['results']],
+            [True, False]
+        )
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(Post.objects.get(pk=self.posts[0].id).likes_count, 0)
+
+    def test_bulk_like_reports_ids_too_big_for_the_database(self):
+        for method in (self.client.put, self.client.delete):
+            response = method('/likes/bulk/', {
+                'posts': [self.posts[1].id, 2**63]
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('error', response.data['results'][1])
+
+    def test_bulk_like_needs_a_short_list(self):
+        response = self.client.put(
+            '/likes/bulk/', {'posts': 'everything'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(BULK_MAX_TARGETS=2):
+            response = self.client.put(
+                '/likes/bulk/', {'posts': [1, 2, 3]}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL only statements')
+class PostgresLikeTests(APITestCase):
+    def test_like_and_unlike_statements(self):
+        andy = User.objects.create_user(username='andy')
+        post = Post.objects.create(owner=andy, title='Post Title')
+        like_id, created = Like.objects.like(andy.id, post.id)
+        self.assertTrue(created)
+        self.assertEqual(Like.objects.like(andy.id, post.id), (like_id, False))
+        self.assertEqual(Post.objects.get().likes_count, 1)
+        self.assertTrue(Like.objects.unlike(andy.id, post.id))
+        self.assertFalse(Like.objects.unlike(andy.id, post.id))
+        self.assertEqual(Post.objects.get().likes_count, 0)
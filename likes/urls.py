@@ -3,5 +3,7 @@ from likes import views
 
 urlpatterns = [
     path('likes/', views.LikeList.as_view()),
+    path('likes/bulk/', views.BulkLike.as_view()),
     path('likes/<int:pk>/',  views.LikeDetail.as_view()),
+    path('posts/<int:post_id>/like/', views.PostLike.as_view()),
 ]
@@ -1,16 +1,32 @@
-from rest_framework import generics, permissions
+from django.http import Http404
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from drf_api.async_views import AsyncListMixin, AsyncRetrieveMixin
+from drf_api.bulk import BulkTargetsView
 from drf_api.permissions import IsOwnerOrReadOnly
+from drf_api.mixins import EagerLoadingMixin
+from drf_api.pagination import PageNumberOrKeysetPagination
 from likes.models import Like
 from likes.serializers import LikeSerializer
 
 
 # We subclass ListCreateAPIView so that we get our
 # GET and POST methods for free.
-class LikeList(generics.ListCreateAPIView):
+class LikeList(
+    AsyncListMixin, EagerLoadingMixin, generics.ListCreateAPIView
+):
     # Ensure only authenticated users can create a like
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     serializer_class = LikeSerializer
-    queryset = Like.objects.all()
+    # Leave out likes of deleted posts, and by deleted, i.e. deactivated,
+    # users, which are waiting to be removed
+    queryset = Like.objects.filter(
+        post__deleted_at__isnull=True, owner__is_active=True
+    )
+    # Page numbers by default, or keyset pages on (created_at, id)
+    # for infinite scroll clients which ask for them.
+    pagination_class = PageNumberOrKeysetPagination
 
     # Use the perform_create method to set the owner of the like
     # to the user making the request.
@@ -20,9 +36,51 @@ class LikeList(generics.ListCreateAPIView):
 
 # We sub-class the RetrieveDestroyAPI view, as we only want to retrieve
 # and delete likes. There's no need to update.
-class LikeDetail(generics.RetrieveDestroyAPIView):
+class LikeDetail(
+    AsyncRetrieveMixin, EagerLoadingMixin, generics.RetrieveDestroyAPIView
+):
     # Ensure only authenticated users can create a like
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     serializer_class = LikeSerializer
-    queryset = Like.objects.all()
-    
\ No newline at end of file
+    queryset = Like.objects.filter(
+        post__deleted_at__isnull=True, owner__is_active=True
+    )
+
+
+class PostLike(APIView):
+    """
+    Like a post with PUT, or unlike it with DELETE, as the logged in user.
+    Both are idempotent, so sending either twice has the same result as
+    sending it once, and the client doesn't need the like's id to unlike.
+    PUT returns the like's id, with 201 if it was created or 200 if it
+    already existed.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def put(self, request, post_id):
+        like_id, created = Like.objects.like(request.user.id, post_id)
+        if like_id is None:
+            raise Http404
+        return Response(
+            {'id': like_id, 'post': post_id},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    def delete(self, request, post_id):
+        Like.objects.unlike(request.user.id, post_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class BulkLike(BulkTargetsView):
+    """
+    Like, with PUT, or unlike, with DELETE, up to BULK_MAX_TARGETS posts,
+    listed under 'posts', as the logged in user.
+    """
+    target_field = 'posts'
+    result_field = 'post'
+
+    def add_targets(self, owner_id, target_ids):
+        return Like.objects.like_many(owner_id, target_ids)
+
+    def remove_targets(self, owner_id, target_ids):
+        return Like.objects.unlike_many(owner_id, target_ids)
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'posts'
+
+    def ready(self):
+        # Make sure the full-text search index is in place after every
+        # migrate, see posts/search.py
+        from .search import install_search_index
+        post_migrate.connect(install_search_index, sender=self)
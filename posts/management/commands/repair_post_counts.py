@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from posts.models import Post
+from comments.models import Comment
+from likes.models import Like
+
+
+def count_subquery(model):
+    """
+    Return a subquery counting the rows of 'model' which belong to
+    the post in the outer query. Coalesce turns 'no rows' into 0.
+    """
+    counts = model.objects.filter(
+        post=OuterRef('pk')
+    ).order_by().values('post').annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts), 0)
+
+
+class Command(BaseCommand):
+    """
+    Recompute the stored comments_count and likes_count on every post
+    and repair any that have drifted from the real number of rows,
+    e.g. after a bulk import which bypassed the signal handlers.
+    """
+    help = 'Recompute Post.comments_count and Post.likes_count'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report drifted posts without changing them',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of posts repaired per UPDATE statement',
+        )
+
+    def handle(self, *args, **options):
+        drifted = Post.objects.annotate(
+            actual_comments=count_subquery(Comment),
+            actual_likes=count_subquery(Like),
+        ).exclude(
+            comments_count=F('actual_comments'),
+            likes_count=F('actual_likes'),
+        ).order_by('pk').values_list('pk', flat=True)
+        drifted_ids = list(drifted)
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(drifted_ids)} post(s) have drifted')
+            return
+
+        # The counts are recomputed inside the UPDATE itself, so a like or
+        # comment arriving while we run can't leave the counter stale.
+        batch_size = options['batch_size']
+        for start in range(0, len(drifted_ids), batch_size):
+            Post.objects.filter(
+                pk__in=drifted_ids[start:start + batch_size]
+            ).update(
+                comments_count=count_subquery(Comment),
+                likes_count=count_subquery(Like),
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Repaired {len(drifted_ids)} post(s)'
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.16 on 2026-10-18 13:16
+
+from django.db import migrations, models
+from drf_api.operations import AddIndexSafely
+
+
+class Migration(migrations.Migration):
+
+    # The indexes are built concurrently on PostgreSQL, so that writes to
+    # the table carry on while they build. That can't happen inside a
+    # transaction.
+    atomic = False
+
+    dependencies = [
+        ('posts', '0003_post_counts'),
+    ]
+
+    operations = [
+        AddIndexSafely(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='post_created_id_idx'),
+        ),
+    ]
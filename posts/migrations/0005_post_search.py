@@ -0,0 +1,45 @@
+# Generated by Django 3.2.16 on 2026-10-18 13:18
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Concat
+from posts.search import install_search_index, uninstall_search_index
+
+
+def fill_search_documents(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    User = apps.get_model('auth', 'User')
+    username = Subquery(
+        User.objects.filter(pk=OuterRef('owner_id')).values('username')[:1]
+    )
+    Post.objects.update(search_document=Concat(
+        'title', Value(' '), 'content', Value(' '), username,
+        output_field=models.TextField()
+    ))
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(using=schema_editor.connection.alias)
+
+
+def drop_search_index(apps, schema_editor):
+    uninstall_search_index(using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(
+            fill_search_documents, migrations.RunPython.noop
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,5 +1,21 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import User
+from profiles.models import Profile
+from drf_api.cache import invalidate_on_change
+from drf_api.images import IMAGE_READY, IMAGE_STATUS_CHOICES
+
+
+class PostManager(models.Manager):
+    """
+    The default manager, which leaves out deleted posts. Their rows stay
+    until the deletion job for them has removed everything which depends
+    on them, see the deletions app. Post.all_objects includes them.
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 
 class Post(models.Model):
@@ -27,9 +43,102 @@ class Post(models.Model):
     image_filter = models.CharField(
         max_length=32, choices=image_filter_choices, default='normal'
     )
+    # Uploaded images are stored and resized in the background, see
+    # drf_api/images.py. image_variants maps each variant to its file,
+    # and image_job identifies the upload being processed.
+    image_status = models.CharField(
+        max_length=16, choices=IMAGE_STATUS_CHOICES, default=IMAGE_READY
+    )
+    image_variants = models.JSONField(default=dict, blank=True)
+    image_job = models.CharField(max_length=32, blank=True, editable=False)
+    # Stored counters, kept up to date by the Comment and Like signal
+    # handlers so that we don't have to aggregate on every request.
+    # They are indexed because the post list can be ordered by them.
+    comments_count = models.PositiveIntegerField(default=0, db_index=True)
+    likes_count = models.PositiveIntegerField(default=0, db_index=True)
+    # The title, content and author's username joined together, which
+    # the full-text search index in posts/search.py is built over.
+    search_document = models.TextField(blank=True, editable=False)
+    # Set when the post is deleted, which hides it straight away. The
+    # row itself is removed later, in the background.
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = PostManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Backs keyset pagination of the post list
+            models.Index(
+                fields=['-created_at', '-id'], name='post_created_id_idx'
+            ),
+        ]
 
     def __str__(self):
-        return f'{self.id} {self.title}'
\ No newline at end of file
+        return f'{self.id} {self.title}'
+
+    # Wrap the save in a transaction, so the post_save signal which updates
+    # the owner's posts_count commits or rolls back together with the post.
+    # We also refresh the search document before every save.
+    def save(self, *args, **kwargs):
+        self.search_document = ' '.join(
+            [self.title, self.content, self.owner.username]
+        )
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'title', 'content'} & set(
+            update_fields
+        ):
+            kwargs['update_fields'] = [*update_fields, 'search_document']
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+# The same document as Post.save builds, as a database expression.
+def search_document_expression(username):
+    return Concat(
+        'title', Value(' '), 'content', Value(' '), Value(username),
+        output_field=models.TextField()
+    )
+
+
+# Keep Profile.posts_count up to date for the post's owner.
+def increment_posts_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.filter(owner_id=instance.owner_id).update(
+            posts_count=F('posts_count') + 1
+        )
+
+
+def decrement_posts_count(sender, instance, **kwargs):
+    # A deleted post was already taken off the count when it was hidden
+    if instance.deleted_at is not None:
+        return
+    Profile.objects.filter(
+        owner_id=instance.owner_id, posts_count__gt=0
+    ).update(posts_count=F('posts_count') - 1)
+
+
+post_save.connect(increment_posts_count, sender=Post)
+post_delete.connect(decrement_posts_count, sender=Post)
+
+
+# When a user changes their username, refresh the search document of
+# their posts. Saves which don't touch the username, such as the
+# last_login update on every login, skip the UPDATE entirely.
+def update_search_documents(sender, instance, created, raw=False,
+                            update_fields=None, **kwargs):
+    if created or raw:
+        return
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    document = search_document_expression(instance.username)
+    Post.objects.filter(owner=instance).exclude(
+        search_document=document
+    ).update(search_document=document)
+
+
+post_save.connect(update_search_documents, sender=User)
+
+# Invalidate cached logged out responses which include posts
+invalidate_on_change(Post, 'posts')
@@ -0,0 +1,163 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+# Name of the SQLite FTS5 table and the PostgreSQL GIN index which index
+# Post.search_document.
+SQLITE_FTS_TABLE = 'posts_post_fts'
+POSTGRES_SEARCH_INDEX = 'posts_post_search_idx'
+POSTGRES_SEARCH_CONFIG = 'english'
+
+
+def install_search_index(using='default', **kwargs):
+    """
+    Create the full-text index over the posts' search_document if it
+    doesn't exist yet.
+    On SQLite this is an external content FTS5 table, kept in step with
+    the post table by triggers. Django rebuilds SQLite tables when a
+    migration alters them, which drops the triggers, so this also runs on
+    every post_migrate and rebuilds the index whenever a trigger was
+    missing. post_migrate passes the migrated models as 'apps', and when
+    the posts were migrated back to before they had a search_document,
+    there's nothing to index.
+    On PostgreSQL it is a GIN index on the document's tsvector.
+    """
+    from .models import Post
+    migrated = kwargs.get('apps')
+    if migrated is not None:
+        try:
+            migrated.get_model('posts', 'Post')._meta.get_field(
+                'search_document'
+            )
+        except (LookupError, FieldDoesNotExist):
+            return
+    posts = Post._meta.db_table
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        install_sqlite_fts(connection, posts)
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {POSTGRES_SEARCH_INDEX} '
+                f'ON {posts} USING GIN (to_tsvector('
+                f"'{POSTGRES_SEARCH_CONFIG}', search_document))"
+            )
+
+
+def install_sqlite_fts(connection, posts):
+    table = SQLITE_FTS_TABLE
+    triggers = {
+        f'{table}_insert': (
+            f'AFTER INSERT ON {posts} BEGIN '
+            f'INSERT INTO {table}(rowid, search_document) '
+            'VALUES (new.id, new.search_document); END'
+        ),
+        f'{table}_delete': (
+            f'AFTER DELETE ON {posts} BEGIN '
+            f'INSERT INTO {table}({table}, rowid, search_document) '
+            "VALUES ('delete', old.id, old.search_document); END"
+        ),
+        f'{table}_update': (
+            f'AFTER UPDATE OF search_document ON {posts} BEGIN '
+            f'INSERT INTO {table}({table}, rowid, search_document) '
+            "VALUES ('delete', old.id, old.search_document); "
+            f'INSERT INTO {table}(rowid, search_document) '
+            'VALUES (new.id, new.search_document); END'
+        ),
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5('
+            f"search_document, content='{posts}', content_rowid='id')"
+        )
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            f"AND tbl_name = '{posts}' AND name LIKE '{table}%'"
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in triggers if name not in existing]
+        for name in missing:
+            cursor.execute(f'CREATE TRIGGER {name} {triggers[name]}')
+        if missing:
+            # Rows may have changed while the triggers were missing
+            cursor.execute(
+                f"INSERT INTO {table}({table}) VALUES ('rebuild')"
+            )
+
+
+def uninstall_search_index(using='default', **kwargs):
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for suffix in ('insert', 'delete', 'update'):
+                cursor.execute(
+                    f'DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_{suffix}'
+                )
+            cursor.execute(f'DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}')
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'DROP INDEX IF EXISTS {POSTGRES_SEARCH_INDEX}')
+
+
+class PostSearchFilter(filters.SearchFilter):
+    """
+    Drop-in replacement for SearchFilter on the post list.
+    Rather than an ILIKE '%term%' scan over the post and user tables, it
+    matches the search terms against the full-text index over each post's
+    title, content and author's username, and orders the results by
+    relevance unless the client asked for an ordering.
+    All terms have to match. On databases other than SQLite and
+    PostgreSQL it falls back to SearchFilter and the view's search_fields.
+    """
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        vendor = connections[queryset.db].vendor
+        if vendor == 'sqlite':
+            # Quote each term so FTS5 doesn't read it as query syntax,
+            # and match it as a prefix so partial words still match.
+            match = ' '.join(
+                '"{}"*'.format(term.replace('"', '""')) for term in terms
+            )
+            # Join the FTS5 table, so the index is searched once for all
+            # the posts, rather than once for each post, as a subquery
+            # would. The join condition is a filter on pk, rather than
+            # raw SQL, so the post table's alias is right when this
+            # queryset becomes a subquery, e.g. for the like ids.
+            table = SQLITE_FTS_TABLE
+            queryset = queryset.extra(
+                tables=[table], where=[f'{table} MATCH %s'], params=[match]
+            ).filter(pk=RawSQL(f'{table}.rowid', ()))
+            if request.query_params.get(api_settings.ORDERING_PARAM):
+                return queryset
+            # bm25 scores are negative, best match first
+            return queryset.extra(
+                select={'search_rank': f'bm25({table})'}
+            ).order_by('search_rank', '-created_at')
+        elif vendor == 'postgresql':
+            posts = queryset.model._meta.db_table
+            query = ' '.join(terms)
+            vector = (
+                f"to_tsvector('{POSTGRES_SEARCH_CONFIG}', search_document)"
+            )
+            tsquery = f"plainto_tsquery('{POSTGRES_SEARCH_CONFIG}', %s)"
+            matches = RawSQL(
+                f'SELECT id FROM {posts} WHERE {vector} @@ {tsquery}',
+                (query,)
+            )
+            rank = RawSQL(
+                f'ts_rank(to_tsvector(\'{POSTGRES_SEARCH_CONFIG}\', '
+                f'{posts}.search_document), {tsquery})', (query,)
+            )
+        else:
+            return super().filter_queryset(request, queryset, view)
+
+        queryset = queryset.filter(pk__in=matches)
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return queryset
+        return queryset.annotate(search_rank=rank).order_by(
+            '-search_rank', '-created_at'
+        )
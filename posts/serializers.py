@@ -1,16 +1,48 @@
+import functools
+from django.db import models
 from rest_framework import serializers
 from .models import Post
 from likes.models import Like
+from drf_api.images import BackgroundImageMixin, ProbedImageField
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostListSerializer(serializers.ListSerializer):
+    """
+    Used in place of the default ListSerializer when many=True.
+    Looks up the current user's likes for every post on the page in a
+    single query and stores them in the context, so that get_like_id
+    doesn't have to run one query per post.
+    """
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.Manager) else data)
+        self.prepare(posts)
+        return super().to_representation(posts)
+
+    # Look up everything the page needs up front. This is also called by
+    # the fast serialization path in drf_api/fast_serialization.py.
+    def prepare(self, posts):
+        if 'like_ids' not in self.context:
+            self.context['like_ids'] = self.child.resolve_like_ids(posts)
+
+
+class PostSerializer(BackgroundImageMixin, serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.username')
+    # Only the image's header is read during the request
+    image = ProbedImageField(required=False)
+    image_variants = serializers.SerializerMethodField()
     profile_id = serializers.ReadOnlyField(source='owner.profile.id')
     profile_image = serializers.ReadOnlyField(source='owner.profile.image.url')
     is_owner = serializers.SerializerMethodField()
     like_id = serializers.SerializerMethodField()
     comments_count = serializers.ReadOnlyField()
     likes_count = serializers.ReadOnlyField()
+    # The views fetch the owner and their profile with each post, as the
+    # owner, profile_id and profile_image fields read them.
+    select_related_fields = ['owner__profile']
+    # Columns the SerializerMethodFields read, for the fast serialization
+    # path which builds rows with .values() instead of model instances.
+    fast_row_fields = ['owner_id', 'image_variants']
+    image_cache_group = 'posts'
 
     # The validator method's name is always validate_fieldname.
     # We use this to validate the image, to make sure the file size,
@@ -35,13 +67,40 @@ class PostSerializer(serializers.ModelSerializer):
 
     def get_is_owner(self, obj):
         request = self.context['request']
-        return request.user == obj.owner
+        return request.user.id == obj.owner_id
     
+    # Return a dictionary mapping post id to like id for each of the
+    # given posts the current user has liked, using a single query.
+    # 'posts' may also be a queryset, which becomes a subquery.
+    def resolve_like_ids(self, posts):
+        user = self.context['request'].user
+        if not user.is_authenticated:
+            return {}
+        if isinstance(posts, models.QuerySet):
+            post_ids = posts.values('id')
+        else:
+            post_ids = [post.id for post in posts]
+        return dict(Like.objects.filter(
+            owner=user, post__in=post_ids
+        ).values_list('post_id', 'id'))
+
+    # The lookups for the posts in 'queryset', by the context key they
+    # go in, which the async views run alongside the posts' own query.
+    def get_lookups(self, queryset):
+        return {'like_ids': functools.partial(
+            self.resolve_like_ids, queryset
+        )}
+
     # Populate the like_id field. If user is authenticated,
     # check is this post is one the user has liked.
     def get_like_id(self, obj):
         user = self.context['request'].user
         if user.is_authenticated:
+            # When serializing a list, PostListSerializer has already
+            # looked up the likes for the whole page.
+            like_ids = self.context.get('like_ids')
+            if like_ids is not None:
+                return like_ids.get(obj.id)
             like = Like.objects.filter(
                 owner=user, post=obj
             ).first()
@@ -54,5 +113,8 @@ class PostSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'owner', 'created_at', 'updated_at', 'title', 'content',
             'image', 'profile_id', 'profile_image', 'is_owner', 'image_filter',
-            'like_id', 'comments_count', 'likes_count'
+            'like_id', 'comments_count', 'likes_count', 'image_status',
+            'image_variants'
         ]
+        read_only_fields = ['image_status']
+        list_serializer_class = PostListSerializer
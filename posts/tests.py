@@ -1,5 +1,26 @@
+import base64
+import datetime
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+from PIL import Image
 from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from .models import Post
+from comments.models import Comment
+from likes.models import Like
+from drf_api.images import fail_if_stuck, process_image
+from .search import install_search_index
+from tasks.models import Task
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
@@ -88,3 +109,391 @@ class PostDetailViewTests(APITestCase):
         response = self.client.put('/posts/2/', {'title': 'New Post Title'})
         # Test HTTP 403 code is returned
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class PostCountTests(APITestCase):
+    def setUp(self):
+        # Create a user and a post for them to like and comment on
+        user = User.objects.create_user(username='andy', password='12345')
+        self.post = Post.objects.create(owner=user, title='Post Title')
+        self.user = user
+
+    def test_counts_follow_likes_and_comments(self):
+        # Create a like and a comment, and check the stored counts go up
+        like = Like.objects.create(owner=self.user, post=self.post)
+        comment = Comment.objects.create(
+            owner=self.user, post=self.post, content='A comment'
+        )
+        response = self.client.get(f'/posts/{self.post.id}/')
+        self.assertEqual(response.data['likes_count'], 1)
+        self.assertEqual(response.data['comments_count'], 1)
+        # Delete them again and check the counts go back down
+        like.delete()
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_repair_command_fixes_drifted_counts(self):
+        # Knock the stored counts out of line with the real rows
+        Like.objects.create(owner=self.user, post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(
+            likes_count=5, comments_count=3
+        )
+        call_command('repair_post_counts', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(self.post.comments_count, 0)
+
+
+class PostLikeIdTests(APITestCase):
+    def setUp(self):
+        # Create a user who likes every post written by another user
+        self.andy = User.objects.create_user(username='andy', password='12345')
+        self.lindsay = User.objects.create_user(
+            username='lindsay', password='12345'
+        )
+
+    def create_liked_posts(self, number):
+        for i in range(number):
+            post = Post.objects.create(owner=self.lindsay, title=f'Post {i}')
+            Like.objects.create(owner=self.andy, post=post)
+
+    def count_like_queries(self):
+        # Fetch the post list and count the queries made against the
+        # likes table while doing so
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/posts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for post in response.data['results']:
+            self.assertIsNotNone(post['like_id'])
+        return len([
+            query for query in queries if 'likes_like' in query['sql']
+        ])
+
+    def test_like_ids_resolved_in_one_query_per_page(self):
+        self.client.login(username='andy', password='12345')
+        self.create_liked_posts(2)
+        self.assertEqual(self.count_like_queries(), 1)
+        self.create_liked_posts(8)
+        self.assertEqual(self.count_like_queries(), 1)
+
+    def test_detail_like_id(self):
+        # The detail view still returns the like id for a single post
+        self.client.login(username='andy', password='12345')
+        self.create_liked_posts(1)
+        post = Post.objects.get()
+        response = self.client.get(f'/posts/{post.id}/')
+        self.assertEqual(response.data['like_id'], Like.objects.get().id)
+
+
+class PostListQueryCountTests(APITestCase):
+    def setUp(self):
+        self.andy = User.objects.create_user(username='andy', password='12345')
+
+    def create_posts(self, number):
+        # Each post gets its own owner, so that a missing select_related
+        # would cost extra queries per row
+        for i in range(number):
+            user = User.objects.create_user(username=f'user{i}_{number}')
+            Post.objects.create(owner=user, title=f'Post {i}')
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/posts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_post_list_query_count_is_constant(self):
+        self.client.login(username='andy', password='12345')
+        self.create_posts(2)
+        small_page = self.count_list_queries()
+        self.create_posts(6)
+        self.assertEqual(self.count_list_queries(), small_page)
+
+
+class PostKeysetPaginationTests(APITestCase):
+    def setUp(self):
+        # Create more than a page of posts, several sharing a timestamp so
+        # that the id has to break the tie
+        user = User.objects.create_user(username='andy', password='12345')
+        for i in range(25):
+            Post.objects.create(owner=user, title=f'Post {i}')
+        Post.objects.filter(id__lte=12).update(created_at=timezone.now())
+
+    def test_can_walk_every_post_with_cursors(self):
+        response = self.client.get('/posts/?pagination=cursor')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Keyset pages don't count the whole table
+        self.assertNotIn('count', response.data)
+        seen = [post['id'] for post in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [post['id'] for post in response.data['results']]
+        expected = list(Post.objects.order_by(
+            '-created_at', '-id'
+        ).values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_page_numbers_are_still_the_default(self):
+        response = self.client.get('/posts/')
+        self.assertEqual(response.data['count'], 25)
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get('/posts/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor_returns_404(self):
+        for position in (
+            '["notadate",{}]', '["2020-01-01T00:00:00","x"]', '[null,null]'
+        ):
+            cursor = base64.urlsafe_b64encode(position.encode()).decode()
+            response = self.client.get(f'/posts/?cursor={cursor}')
+            self.assertEqual(
+                response.status_code, status.HTTP_404_NOT_FOUND, position
+            )
+
+    def test_cursor_cannot_be_combined_with_ordering(self):
+        response = self.client.get(
+            '/posts/?pagination=cursor&ordering=likes_count'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PostSearchTests(APITestCase):
+    def setUp(self):
+        self.andy = User.objects.create_user(username='andy', password='12345')
+        self.lindsay = User.objects.create_user(username='lindsay')
+        Post.objects.create(
+            owner=self.andy, title='Mountain sunrise',
+            content='An early start'
+        )
+        Post.objects.create(
+            owner=self.lindsay, title='Beach day',
+            content='Sunrise over the sea, then a mountain of ice cream'
+        )
+        Post.objects.create(owner=self.lindsay, title='Lunch')
+
+    def search(self, terms, **params):
+        response = self.client.get('/posts/', {'search': terms, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['title'] for post in response.data['results']]
+
+    def test_search_matches_title_content_and_username(self):
+        self.assertEqual(
+            sorted(self.search('sunrise')), ['Beach day', 'Mountain sunrise']
+        )
+        self.assertEqual(self.search('lunch'), ['Lunch'])
+        self.assertEqual(len(self.search('lindsay')), 2)
+        # All terms have to match, and prefixes match whole words
+        self.assertEqual(self.search('ice moun'), ['Beach day'])
+        self.assertEqual(self.search('nothing'), [])
+
+    def test_search_follows_edits(self):
+        post = Post.objects.get(title='Lunch')
+        post.title = 'Dinner'
+        post.save()
+        self.assertEqual(self.search('lunch'), [])
+        self.assertEqual(self.search('dinner'), ['Dinner'])
+        self.lindsay.username = 'lindsay_g'
+        self.lindsay.save()
+        self.assertEqual(len(self.search('lindsay_g')), 2)
+
+    def test_search_terms_are_not_query_syntax(self):
+        self.assertEqual(self.search('"sunrise OR'), [])
+
+    def test_results_are_ranked_unless_ordered(self):
+        # The shorter post, which has fewer other words, ranks first
+        self.assertEqual(
+            self.search('mountain'), ['Mountain sunrise', 'Beach day']
+        )
+        self.assertEqual(
+            self.search('mountain', ordering='-created_at'),
+            ['Beach day', 'Mountain sunrise']
+        )
+        # Filters and the page count still apply to the ranked results
+        response = self.client.get('/posts/', {
+            'search': 'sunrise', 'owner__profile': self.andy.profile.id
+        })
+        self.assertEqual(response.data['count'], 1)
+
+    def test_index_is_skipped_when_migrated_back_before_search(self):
+        state = MigrationLoader(connection).project_state(
+            ('posts', '0004_keyset_indexes')
+        )
+        with self.assertNumQueries(0):
+            install_search_index(apps=state.apps)
+
+
+class PostConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.andy = User.objects.create_user(username='andy', password='12345')
+        self.post = Post.objects.create(owner=self.andy, title='Post Title')
+        self.url = f'/posts/{self.post.id}/'
+
+    def test_unchanged_post_returns_304(self):
+        response = self.client.get(self.url)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_new_like_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        Like.objects.create(owner=self.andy, post=self.post)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['likes_count'], 1)
+
+    def test_etag_depends_on_user(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.login(username='andy', password='12345')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['is_owner'])
+
+    def test_if_modified_since_alone_is_not_trusted(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_missing_post_still_returns_404(self):
+        response = self.client.get('/posts/999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+def image_upload(width, height, name='photo.png', format='PNG'):
+    output = BytesIO()
+    Image.new('RGB', (width, height), 'red').save(output, format=format)
+    return SimpleUploadedFile(name, output.getvalue())
+
+
+@override_settings(TASKS_EAGER=False)
+class PostImageProcessingTests(APITestCase):
+    def setUp(self):
+        User.objects.create_user(username='andy', password='12345')
+        self.client.login(username='andy', password='12345')
+        # Store images in a temporary directory rather than Cloudinary
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        patcher = mock.patch.object(
+            Post._meta.get_field('image'), 'storage',
+            FileSystemStorage(location=self.media, base_url='/media/')
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_worker(self):
+        call_command('run_tasks', once=True, stdout=StringIO())
+
+    def stored_files(self):
+        if not os.path.exists(f'{self.media}/images'):
+            return []
+        return sorted(os.listdir(f'{self.media}/images'))
+
+    def test_image_is_processed_after_the_response(self):
+        response = self.client.post('/posts/', {
+            'title': 'a title', 'image': image_upload(800, 400)
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['image_status'], 'processing')
+        self.assertEqual(Post.objects.get().image_status, 'processing')
+
+        self.run_worker()
+        response = self.client.get(f"/posts/{response.data['id']}/")
+        self.assertEqual(response.data['image_status'], 'ready')
+        self.assertIn('/media/images/photo', response.data['image'])
+        post = Post.objects.get()
+        thumbnail = Image.open(
+            f"{self.media}/{post.image_variants['thumbnail']}"
+        )
+        self.assertEqual(thumbnail.size, (150, 75))
+        self.assertEqual(
+            set(response.data['image_variants']), {'thumbnail', 'medium'}
+        )
+
+    def test_dimensions_are_checked_from_the_header(self):
+        with mock.patch.object(Image.Image, 'verify') as verify:
+            response = self.client.post('/posts/', {
+                'title': 'a title', 'image': image_upload(4097, 10)
+            })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('width', str(response.data['image']))
+        verify.assert_not_called()
+
+    def test_files_which_are_not_images_are_rejected(self):
+        response = self.client.post('/posts/', {
+            'title': 'a title',
+            'image': SimpleUploadedFile('photo.png', b'not an image'),
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Post.objects.count(), 0)
+
+    def test_failed_processing_is_reported(self):
+        content = image_upload(200, 200, 'photo.jpg', 'JPEG').read()
+        # Cut the image short, which only a full decode notices
+        upload = SimpleUploadedFile('photo.jpg', content[:len(content) // 2])
+        response = self.client.post('/posts/', {
+            'title': 'a title', 'image': upload
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with self.assertLogs('drf_api.images', 'ERROR'):
+            self.run_worker()
+        self.assertEqual(Post.objects.get().image_status, 'failed')
+        # The upload which couldn't be processed is deleted
+        self.assertEqual(self.stored_files(), [])
+
+    def test_only_the_last_upload_is_kept(self):
+        response = self.client.post('/posts/', {
+            'title': 'a title', 'image': image_upload(800, 400)
+        })
+        self.client.put(f"/posts/{response.data['id']}/", {
+            'title': 'a title', 'image': image_upload(400, 800, 'new.png')
+        })
+        # The first upload finishes last
+        for task in Task.objects.filter(name='images.process').order_by('-pk'):
+            process_image(**task.kwargs)
+        post = Post.objects.get()
+        self.assertEqual(post.image_status, 'ready')
+        self.assertIn('images/new', post.image.name)
+        self.assertEqual(
+            self.stored_files(),
+            sorted(
+                os.path.basename(path) for path in
+                [post.image.name, *post.image_variants.values()]
+            )
+        )
+
+    def test_stuck_images_are_failed(self):
+        post = Post.objects.create(
+            owner=User.objects.get(), title='a title',
+            image_status='processing', image_job='lost'
+        )
+        call_command('fail_stuck_images', stdout=StringIO())
+        self.assertEqual(Post.objects.get().image_status, 'processing')
+        Post.objects.filter(pk=post.pk).update(
+            updated_at=timezone.now() - datetime.timedelta(minutes=11)
+        )
+        call_command('fail_stuck_images', stdout=StringIO())
+        self.assertEqual(Post.objects.get().image_status, 'failed')
+
+    def test_images_which_are_never_processed_are_failed(self):
+        self.client.post('/posts/', {
+            'title': 'a title', 'image': image_upload(800, 400)
+        })
+        check = Task.objects.get(name='images.fail_if_stuck')
+        self.assertGreater(
+            check.run_after, timezone.now() + datetime.timedelta(minutes=9)
+        )
+        # The check runs before the image is processed, e.g. because the
+        # processing task kept timing out
+        fail_if_stuck(**check.kwargs)
+        self.assertEqual(Post.objects.get().image_status, 'failed')
+        self.assertEqual(self.stored_files(), [])
+        # Processing it late leaves the failed image alone
+        self.run_worker()
+        self.assertEqual(Post.objects.get().image_status, 'failed')
+        self.assertEqual(self.stored_files(), [])
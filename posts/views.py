@@ -3,15 +3,27 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from django.http import Http404
-from django.db.models import Count
+from django.db.models import OuterRef, Subquery
 from .models import Post
 from comments.models import Comment
 from likes.models import Like
 from .serializers import PostSerializer
+from .search import PostSearchFilter
 from drf_api.permissions import IsOwnerOrReadOnly
+from drf_api.async_views import AsyncListMixin, AsyncRetrieveMixin
+from drf_api.cache import AnonymousCacheMixin
+from drf_api.mixins import (
+    ConditionalGetMixin, EagerLoadingMixin, StreamingListMixin
+)
+from drf_api.fast_serialization import FastListMixin
+from drf_api.pagination import PageNumberOrKeysetPagination
+from deletions.jobs import delete_in_background
 
 
-class PostList(generics.ListCreateAPIView):
+class PostList(
+    AsyncListMixin, AnonymousCacheMixin, EagerLoadingMixin, StreamingListMixin,
+    FastListMixin, generics.ListCreateAPIView
+):
     """
     List posts or create a post if logged in
     The perform_create method associates the post with the logged in user.
@@ -20,14 +32,21 @@ class PostList(generics.ListCreateAPIView):
     permission_classes = [
         permissions.IsAuthenticatedOrReadOnly
     ]
-    queryset = Post.objects.annotate(
-        comments_count=Count('comment', distinct=True),
-        likes_count=Count('likes', distinct=True)
-    ).order_by('-created_at')
+    # comments_count and likes_count are stored on the post itself,
+    # so there is no need to annotate them here.
+    queryset = Post.objects.order_by('-created_at')
+    # Page numbers by default, or keyset pages on (created_at, id)
+    # for infinite scroll clients which ask for them.
+    pagination_class = PageNumberOrKeysetPagination
+    # Cache responses for logged out users until any of these change.
+    # Follows matter because the list can be filtered by them.
+    cache_groups = (
+        'posts', 'comments', 'likes', 'followers', 'profiles', 'users'
+    )
     filter_backends = [
         filters.OrderingFilter,
-        # Add a search filter
-        filters.SearchFilter,
+        # Add a full-text search filter, which ranks the results
+        PostSearchFilter,
         # Add DjangoFilterBackend
         DjangoFilterBackend,
     ]
@@ -42,7 +61,8 @@ class PostList(generics.ListCreateAPIView):
         'likes_count',
         'likes__created_at'
     ]
-    # Specify which fields our search filter searches on
+    # Specify which fields our search filter searches on. These are only
+    # used on databases without a full-text index, see posts/search.py
     search_fields = [
         'owner__username',
         'title'
@@ -52,13 +72,37 @@ class PostList(generics.ListCreateAPIView):
         serializer.save(owner=self.request.user)
 
 
-class PostDetail(generics.RetrieveUpdateDestroyAPIView):
+class PostDetail(
+    AsyncRetrieveMixin, ConditionalGetMixin, AnonymousCacheMixin,
+    EagerLoadingMixin, generics.RetrieveUpdateDestroyAPIView
+):
     """
     Retrieve a post and edit or delete it if you own it.
     """
     serializer_class = PostSerializer
     permission_classes = [IsOwnerOrReadOnly]
-    queryset = Post.objects.annotate(
-        comments_count=Count('comment', distinct=True),
-        likes_count=Count('likes', distinct=True)
-    ).order_by('-created_at')
+    queryset = Post.objects.order_by('-created_at')
+    cache_groups = ('posts', 'comments', 'likes', 'profiles', 'users')
+
+    # Everything the serialized post depends on, fetched in one small
+    # query, so ConditionalGetMixin can answer 304 Not Modified.
+    def get_validator_values(self):
+        queryset = Post.objects.filter(pk=self.kwargs['pk'])
+        fields = [
+            'updated_at', 'comments_count', 'likes_count',
+            'owner__username', 'owner__profile__updated_at'
+        ]
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(like_id=Subquery(
+                Like.objects.filter(
+                    owner=user, post=OuterRef('pk')
+                ).values('id')[:1]
+            ))
+            fields.append('like_id')
+        return queryset.values(*fields).first()
+
+    # Hide the post straight away, and remove its likes, comments and
+    # timeline entries in the background, rather than in this request.
+    def perform_destroy(self, instance):
+        delete_in_background(instance)
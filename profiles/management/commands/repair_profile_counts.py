@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from profiles.models import Profile
+from posts.models import Post
+from followers.models import Follower
+
+
+def count_subquery(model, user_field):
+    """
+    Return a subquery counting the rows of 'model' whose 'user_field'
+    is the owner of the profile in the outer query.
+    """
+    counts = model.objects.filter(
+        **{user_field: OuterRef('owner')}
+    ).order_by().values(user_field).annotate(
+        count=Count('pk')
+    ).values('count')
+    return Coalesce(Subquery(counts), 0)
+
+
+def actual_counts():
+    return {
+        'posts_count': count_subquery(Post, 'owner'),
+        'followers_count': count_subquery(Follower, 'followed'),
+        'following_count': count_subquery(Follower, 'owner'),
+    }
+
+
+class Command(BaseCommand):
+    """
+    Recompute the stored posts_count, followers_count and following_count
+    on every profile and repair any that have drifted from the real
+    number of rows.
+    """
+    help = 'Recompute the post and follower counters stored on Profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report drifted profiles without changing them',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of profiles repaired per UPDATE statement',
+        )
+
+    def handle(self, *args, **options):
+        counts = actual_counts()
+        drifted = Profile.objects.annotate(
+            actual_posts=counts['posts_count'],
+            actual_followers=counts['followers_count'],
+            actual_following=counts['following_count'],
+        ).exclude(
+            posts_count=F('actual_posts'),
+            followers_count=F('actual_followers'),
+            following_count=F('actual_following'),
+        ).order_by('pk').values_list('pk', flat=True)
+        drifted_ids = list(drifted)
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(drifted_ids)} profile(s) have drifted')
+            return
+
+        # Recompute the counts inside the UPDATE itself, so concurrent
+        # posts or follows can't leave a counter stale.
+        batch_size = options['batch_size']
+        for start in range(0, len(drifted_ids), batch_size):
+            Profile.objects.filter(
+                pk__in=drifted_ids[start:start + batch_size]
+            ).update(**actual_counts())
+        self.stdout.write(self.style.SUCCESS(
+            f'Repaired {len(drifted_ids)} profile(s)'
+        ))
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.16 on 2026-10-18 13:14
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    Profile = apps.get_model('profiles', 'Profile')
+    Post = apps.get_model('posts', 'Post')
+    Follower = apps.get_model('followers', 'Follower')
+
+    def count_subquery(model, user_field):
+        counts = model.objects.filter(
+            **{user_field: OuterRef('owner')}
+        ).order_by().values(user_field).annotate(
+            count=Count('pk')
+        ).values('count')
+        return Coalesce(Subquery(counts), 0)
+
+    Profile.objects.update(
+        posts_count=count_subquery(Post, 'owner'),
+        followers_count=count_subquery(Follower, 'followed'),
+        following_count=count_subquery(Follower, 'owner'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0001_initial'),
+        ('posts', '0003_post_counts'),
+        ('followers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='followers_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='posts_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 14:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0004_image_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='image_job',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+    ]
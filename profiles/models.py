@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
+from drf_api.cache import invalidate_on_change
+from drf_api.images import IMAGE_READY, IMAGE_STATUS_CHOICES
 # Create your models here.
 
 
@@ -14,10 +16,26 @@ class Profile(models.Model):
         upload_to='images/',
         default='../default_profile_sopzfa.jpg'
     )
+    # Uploaded images are stored and resized in the background, see
+    # drf_api/images.py. image_variants maps each variant to its file,
+    # and image_job identifies the upload being processed.
+    image_status = models.CharField(
+        max_length=16, choices=IMAGE_STATUS_CHOICES, default=IMAGE_READY
+    )
+    image_variants = models.JSONField(default=dict, blank=True)
+    image_job = models.CharField(max_length=32, blank=True, editable=False)
+    # Stored counters, kept up to date by the Post and Follower signal
+    # handlers so that the profile views don't have to aggregate them.
+    posts_count = models.PositiveIntegerField(default=0, db_index=True)
+    followers_count = models.PositiveIntegerField(default=0, db_index=True)
+    following_count = models.PositiveIntegerField(default=0, db_index=True)
 
     class Meta:
         # Return results for this model with the most recent entries first
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='profile_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.owner}'s profile"
@@ -34,3 +52,7 @@ def create_profile(sender, instance, created, **kwargs):
 # second parameter is the model we want to request signals from.
 post_save.connect(create_profile, sender=User)
 
+# Invalidate cached logged out responses which include profiles, or a
+# user's username. Logging in only saves last_login, which we ignore.
+invalidate_on_change(Profile, 'profiles')
+invalidate_on_change(User, 'users', fields=['username'])
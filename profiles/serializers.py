@@ -1,9 +1,35 @@
+import functools
+from django.db import models
 from rest_framework import serializers
 from .models import Profile
 from followers.models import Follower
+from drf_api.images import BackgroundImageMixin, ProbedImageField
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileListSerializer(serializers.ListSerializer):
+    """
+    Used in place of the default ListSerializer when many=True.
+    Looks up which of the page's profiles the current user follows in
+    a single query and stores them in the context, so that
+    get_following_id doesn't have to run one query per profile.
+    """
+    def to_representation(self, data):
+        profiles = list(
+            data.all() if isinstance(data, models.Manager) else data
+        )
+        self.prepare(profiles)
+        return super().to_representation(profiles)
+
+    # Look up everything the page needs up front. This is also called by
+    # the fast serialization path in drf_api/fast_serialization.py.
+    def prepare(self, profiles):
+        if 'following_ids' not in self.context:
+            self.context['following_ids'] = (
+                self.child.resolve_following_ids(profiles)
+            )
+
+
+class ProfileSerializer(BackgroundImageMixin, serializers.ModelSerializer):
     # Make the owner field read only, and overwrite the default
     # value (which would be the user id) with the username.
     owner = serializers.ReadOnlyField(source='owner.username')
@@ -14,11 +40,20 @@ class ProfileSerializer(serializers.ModelSerializer):
     # on our serializer class called get_fieldname.
     is_owner = serializers.SerializerMethodField()
     following_id = serializers.SerializerMethodField()
-    # Here we add additional fields we've created in our views.py file to the
-    # serializer
+    # Here we add the counters stored on the Profile model to the serializer
     posts_count = serializers.ReadOnlyField()
     followers_count = serializers.ReadOnlyField()
     following_count = serializers.ReadOnlyField()
+    # Uploaded images are only probed during the request, and stored and
+    # resized in the background. See drf_api/images.py.
+    image = ProbedImageField(required=False)
+    image_variants = serializers.SerializerMethodField()
+    # The views fetch the owner with each profile for the owner field
+    select_related_fields = ['owner']
+    # Columns the SerializerMethodFields read, for the fast serialization
+    # path which builds rows with .values() instead of model instances.
+    fast_row_fields = ['owner_id', 'image_variants']
+    image_cache_group = 'profiles'
 
     # Method to provide a value for our is_owner field.
     # Note we can access the request as it is passed in from the methods
@@ -26,18 +61,45 @@ class ProfileSerializer(serializers.ModelSerializer):
     def get_is_owner(self, obj):
         request = self.context['request']
         # Check if the current user is the owner of the profile, and
-        # return the result.
-        return request.user == obj.owner
-    
+        # return the result. We compare ids so that we don't have to
+        # fetch the owner from the database.
+        return request.user.id == obj.owner_id
+
+    # Return a dictionary mapping followed user id to follower id for each
+    # of the given profiles the current user follows, using a single query.
+    # 'profiles' may also be a queryset, which becomes a subquery.
+    def resolve_following_ids(self, profiles):
+        user = self.context['request'].user
+        if not user.is_authenticated:
+            return {}
+        if isinstance(profiles, models.QuerySet):
+            owner_ids = profiles.values('owner_id')
+        else:
+            owner_ids = [profile.owner_id for profile in profiles]
+        return dict(Follower.objects.filter(
+            owner=user, followed__in=owner_ids
+        ).values_list('followed_id', 'id'))
+
+    # The lookups for the profiles in 'queryset', by the context key they
+    # go in, which the async views run alongside the profiles' own query.
+    def get_lookups(self, queryset):
+        return {'following_ids': functools.partial(
+            self.resolve_following_ids, queryset
+        )}
+
     # Populate the following_id field. If the user is authenticated,
     # check if this profile is one the user is following.
     def get_following_id(self, obj):
         user = self.context['request'].user
         if user.is_authenticated:
-            following = Follower.objects.filter(
-                owner=user, followed=obj.owner
-            ).first()
-            return following.id if following else None
+            # When serializing a list, ProfileListSerializer has already
+            # looked up the follows for the whole page.
+            following_ids = self.context.get('following_ids')
+            if following_ids is not None:
+                return following_ids.get(obj.owner_id)
+            return Follower.objects.filter(
+                owner=user, followed_id=obj.owner_id
+            ).values_list('id', flat=True).first()
         # Return None if ther user isn't authenticated
         return None
 
@@ -50,5 +112,8 @@ class ProfileSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'owner', 'created_at', 'updated_at', 'name',
             'content', 'image', 'is_owner', 'following_id',
-            'posts_count', 'followers_count', 'following_count'
+            'posts_count', 'followers_count', 'following_count',
+            'image_status', 'image_variants'
         ]
+        read_only_fields = ['image_status']
+        list_serializer_class = ProfileListSerializer
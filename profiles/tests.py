@@ -1,3 +1,156 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from .models import Profile
+from posts.models import Post
+from posts.tests import image_upload
+from followers.models import Follower
 
-# Create your tests here.
+
+class ProfileCountTests(APITestCase):
+    def setUp(self):
+        # Create two users, which also creates their profiles
+        self.andy = User.objects.create_user(username='andy', password='12345')
+        self.lindsay = User.objects.create_user(
+            username='lindsay', password='12345'
+        )
+
+    def test_counts_follow_posts_and_follows(self):
+        # Andy writes a post and follows Lindsay
+        post = Post.objects.create(owner=self.andy, title='Post Title')
+        follow = Follower.objects.create(
+            owner=self.andy, followed=self.lindsay
+        )
+        response = self.client.get(f'/profiles/{self.andy.profile.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['posts_count'], 1)
+        self.assertEqual(response.data['following_count'], 1)
+        response = self.client.get(f'/profiles/{self.lindsay.profile.id}/')
+        self.assertEqual(response.data['followers_count'], 1)
+        # Undo both and check the counters go back down
+        post.delete()
+        follow.delete()
+        andy = Profile.objects.get(owner=self.andy)
+        lindsay = Profile.objects.get(owner=self.lindsay)
+        self.assertEqual(andy.posts_count, 0)
+        self.assertEqual(andy.following_count, 0)
+        self.assertEqual(lindsay.followers_count, 0)
+
+    def test_repair_command_fixes_drifted_counts(self):
+        # Knock the stored counts out of line with the real rows
+        Follower.objects.create(owner=self.andy, followed=self.lindsay)
+        Profile.objects.update(
+            posts_count=7, followers_count=7, following_count=7
+        )
+        call_command('repair_profile_counts', stdout=StringIO())
+        andy = Profile.objects.get(owner=self.andy)
+        lindsay = Profile.objects.get(owner=self.lindsay)
+        self.assertEqual(andy.posts_count, 0)
+        self.assertEqual(andy.following_count, 1)
+        self.assertEqual(andy.followers_count, 0)
+        self.assertEqual(lindsay.followers_count, 1)
+
+
+class ProfileFollowingIdTests(APITestCase):
+    def setUp(self):
+        # Create a user who will follow every other user we create
+        self.andy = User.objects.create_user(username='andy', password='12345')
+
+    def create_followed_users(self, number):
+        for i in range(number):
+            user = User.objects.create_user(username=f'user{i}_{number}')
+            Follower.objects.create(owner=self.andy, followed=user)
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/profiles/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_profile_list_query_count_is_constant(self):
+        self.client.login(username='andy', password='12345')
+        self.create_followed_users(2)
+        small_page = self.count_list_queries()
+        self.create_followed_users(6)
+        self.assertEqual(self.count_list_queries(), small_page)
+
+    def test_following_id_in_list_and_detail(self):
+        self.client.login(username='andy', password='12345')
+        self.create_followed_users(1)
+        follow = Follower.objects.get()
+        profile = follow.followed.profile
+        response = self.client.get('/profiles/')
+        following_ids = {
+            result['id']: result['following_id']
+            for result in response.data['results']
+        }
+        self.assertEqual(following_ids[profile.id], follow.id)
+        self.assertIsNone(following_ids[self.andy.profile.id])
+        response = self.client.get(f'/profiles/{profile.id}/')
+        self.assertEqual(response.data['following_id'], follow.id)
+        self.assertFalse(response.data['is_owner'])
+
+
+class ProfileConditionalGetTests(APITestCase):
+    def test_following_changes_etag(self):
+        andy = User.objects.create_user(username='andy', password='12345')
+        lindsay = User.objects.create_user(username='lindsay')
+        self.client.login(username='andy', password='12345')
+        url = f'/profiles/{lindsay.profile.id}/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        Follower.objects.create(owner=andy, followed=lindsay)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(response.data['following_id'])
+
+
+@override_settings(TASKS_EAGER=False)
+class ProfileImageProcessingTests(APITestCase):
+    def setUp(self):
+        self.andy = User.objects.create_user(username='andy', password='12345')
+        self.client.login(username='andy', password='12345')
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        patcher = mock.patch.object(
+            Profile._meta.get_field('image'), 'storage',
+            FileSystemStorage(location=self.media, base_url='/media/')
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_profile_image_is_processed_in_the_background(self):
+        url = f'/profiles/{self.andy.profile.id}/'
+        response = self.client.put(url, {
+            'name': 'Andy', 'image': image_upload(300, 300)
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['image_status'], 'processing')
+        # The old image is shown until the new one is ready
+        self.assertIn('default_profile', response.data['image'])
+
+        call_command('run_tasks', once=True, stdout=StringIO())
+        response = self.client.get(url)
+        self.assertEqual(response.data['image_status'], 'ready')
+        self.assertIn('/media/images/photo', response.data['image'])
+        self.assertEqual(response.data['name'], 'Andy')
+
+    def test_profile_image_dimensions_are_limited(self):
+        url = f'/profiles/{self.andy.profile.id}/'
+        response = self.client.put(url, {
+            'name': 'Andy', 'image': image_upload(10, 4097)
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('height', str(response.data['image']))
+        self.assertFalse(os.path.exists(f'{self.media}/images'))
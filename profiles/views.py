@@ -2,35 +2,40 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics, permissions, filters
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count
 from django.http import Http404
+from django.db.models import OuterRef, Subquery
 from .models import Profile
 from .serializers import ProfileSerializer
+from followers.models import Follower
 from drf_api.permissions import IsOwnerOrReadOnly
+from drf_api.async_views import AsyncListMixin, AsyncRetrieveMixin
+from drf_api.cache import AnonymousCacheMixin
+from drf_api.mixins import (
+    ConditionalGetMixin, EagerLoadingMixin, StreamingListMixin
+)
+from drf_api.fast_serialization import FastListMixin
 
 
-class ProfileList(generics.ListAPIView):
+class ProfileList(
+    AsyncListMixin, AnonymousCacheMixin, EagerLoadingMixin, StreamingListMixin,
+    FastListMixin, generics.ListAPIView
+):
     """
     List all profiles.
     No create view as profile creation is handled by django signals.
     """
     serializer_class = ProfileSerializer
-    # Use annotate and Count to create a new field containing a count of the
-    # number of posts retrieved.
-    queryset = Profile.objects.annotate(
-        # 'owner__post' performs a look-up from the Post model, through the
-        # User model (owner is a foreign key to a user) to the Post model. We
-        # have to do this because there is no direct link between the Profile
-        # and Post model. distinct=True ensures only unique posts are counted,
-        # because we are using annotate to create more than one field.
-        # Otherwise, we would get duplicates.
-        posts_count=Count('owner__post', distinct=True),
-        # On the followers_count and following_count fields, we use the related
-        # name defined in the Follower model for the look-ups, because the
-        # Follower model has two foreign keys both pointing to user objects.
-        followers_count=Count('owner__followed', distinct=True),
-        following_count=Count('owner__following', distinct=True)
+    # posts_count, followers_count and following_count are stored on the
+    # profile itself and kept up to date by signals on the Post and
+    # Follower models, so we don't need to annotate them with Count here.
+    # Deleted, i.e. deactivated, users' profiles are left out while they
+    # wait to be removed in the background.
+    queryset = Profile.objects.filter(
+        owner__is_active=True
     ).order_by('-created_at')
+    # Cache responses for logged out users until any of these change.
+    # Posts and follows matter because of the stored counts.
+    cache_groups = ('profiles', 'posts', 'followers', 'users')
     # Enable sorting by our backend and specify which fields we want to be able
     # to sort on. Note we have included two fields from the Follwers models, where
     # we use the underscores to perform a lookup.
@@ -52,14 +57,34 @@ class ProfileList(generics.ListAPIView):
     ]
 
 
-class ProfileDetail(generics.RetrieveUpdateAPIView):
+class ProfileDetail(
+    AsyncRetrieveMixin, ConditionalGetMixin, AnonymousCacheMixin,
+    EagerLoadingMixin, generics.RetrieveUpdateAPIView
+):
     """
     Retrieve or update a profile if you're the owner.
     """
     serializer_class = ProfileSerializer
     permission_classes = [IsOwnerOrReadOnly]
-    queryset = Profile.objects.annotate(
-        posts_count=Count('owner__post', distinct=True),
-        followers_count=Count('owner__followed', distinct=True),
-        following_count=Count('owner__following', distinct=True)
-    ).order_by('-created_at')
\ No newline at end of file
+    queryset = Profile.objects.filter(
+        owner__is_active=True
+    ).order_by('-created_at')
+    cache_groups = ('profiles', 'posts', 'followers', 'users')
+
+    # Everything the serialized profile depends on, fetched in one small
+    # query, so ConditionalGetMixin can answer 304 Not Modified.
+    def get_validator_values(self):
+        queryset = self.get_queryset().filter(pk=self.kwargs['pk'])
+        fields = [
+            'updated_at', 'posts_count', 'followers_count',
+            'following_count', 'owner__username'
+        ]
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(following_id=Subquery(
+                Follower.objects.filter(
+                    owner=user, followed=OuterRef('owner')
+                ).values('id')[:1]
+            ))
+            fields.append('following_id')
+        return queryset.values(*fields).first()
\ No newline at end of file
@@ -0,0 +1,13 @@
+from django.contrib import admin
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = [
+        'name', 'status', 'attempts', 'run_after', 'locked_by', 'created_at'
+    ]
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'idempotency_key']
+
+
+admin.site.register(Task, TaskAdmin)
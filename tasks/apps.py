@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class TasksConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'tasks'
+
+    def ready(self):
+        # Import each app's tasks.py, so their @task functions are
+        # registered before the worker or an eager enqueue looks them up
+        autodiscover_modules('tasks')
@@ -0,0 +1,61 @@
+import os
+import signal
+import socket
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from tasks.queue import claim_next, purge_finished, run_task
+
+
+class Command(BaseCommand):
+    """
+    Run queued tasks, one at a time, until stopped. Run as many workers
+    as you like, in one or more processes; they coordinate through the
+    task table. On SIGTERM or SIGINT the worker finishes its current
+    task and then exits.
+    While there's nothing to run, the worker deletes finished tasks past
+    TASKS_RETENTION_SECONDS, at most once every 'purge_interval' seconds.
+    """
+    help = 'Run tasks from the database task queue'
+    purge_interval = 60
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once there are no tasks ready to run',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to wait before checking again when idle',
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+
+        succeeded = failed = 0
+        next_purge = time.monotonic()
+        while not self.stopping:
+            close_old_connections()
+            task = claim_next(worker)
+            if task is None:
+                if time.monotonic() >= next_purge:
+                    purge_finished()
+                    next_purge = time.monotonic() + self.purge_interval
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            if run_task(task, worker):
+                succeeded += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Ran {succeeded + failed} task(s), {failed} failed'
+        ))
+
+    def stop(self, signum, frame):
+        self.stopping = True
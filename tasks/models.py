@@ -0,0 +1,63 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """
+    Task model, a unit of deferred work for the run_tasks worker.
+    'name' is the name a function was registered under with @task, and
+    'kwargs' are the keyword arguments it's called with.
+    A worker claims a task by setting it 'running' and 'locked_until' a
+    time in the future. If the worker dies, the task becomes claimable
+    again once 'locked_until' has passed. Failed tasks are retried, later
+    each time, until they have been attempted 'max_attempts' times.
+    'idempotency_key' is unique, so a task with a key is only ever queued
+    once, however many times it's enqueued, for as long as it's kept.
+    Done and failed tasks are deleted after TASKS_RETENTION_SECONDS.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    status_choices = [
+        (QUEUED, 'Queued'), (RUNNING, 'Running'),
+        (DONE, 'Done'), (FAILED, 'Failed'),
+    ]
+    name = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=16, choices=status_choices, default=QUEUED
+    )
+    idempotency_key = models.CharField(
+        max_length=255, unique=True, null=True, blank=True
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=255, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after']
+        indexes = [
+            # Back finding the next tasks to claim, and counting the
+            # running tasks of a name for its concurrency limit
+            models.Index(
+                fields=['status', 'run_after'], name='task_status_run_idx'
+            ),
+            models.Index(
+                fields=['name', 'status', 'locked_until'],
+                name='task_name_status_idx'
+            ),
+            # Backs finding finished tasks to delete, see purge_finished
+            models.Index(
+                fields=['status', 'updated_at'],
+                name='task_status_updated_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
@@ -0,0 +1,215 @@
+import datetime
+import logging
+import traceback
+import zlib
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+# Every function decorated with @task, by name
+registry = {}
+
+
+class TaskType:
+    """
+    A function registered with @task and the settings its tasks run with.
+    'timeout' is how many seconds a worker has to finish a task before
+    another worker may claim it. 'retry_delay' is the number of seconds
+    before the first retry, doubling for each one after that.
+    'concurrency' limits how many tasks of this name run at once.
+    Tasks run in a single transaction unless 'atomic' is False, e.g. for
+    long tasks which commit their work in small steps.
+    """
+    def __init__(self, name, function, max_attempts=5, retry_delay=10,
+                 timeout=300, concurrency=None, atomic=True):
+        self.name = name
+        self.function = function
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.atomic = atomic
+
+    def get_retry_delay(self, attempts):
+        return datetime.timedelta(
+            seconds=self.retry_delay * 2 ** (attempts - 1)
+        )
+
+
+def task(name, **options):
+    """
+    Register the decorated function as a task called 'name', with the
+    options of TaskType. Tasks may run more than once, e.g. when a
+    worker dies half way through, so they should be safe to repeat.
+    """
+    def decorator(function):
+        registry[name] = TaskType(name, function, **options)
+        return function
+    return decorator
+
+
+def enqueue(name, kwargs=None, idempotency_key=None, delay=None):
+    """
+    Queue the task called 'name' to run with 'kwargs', which have to be
+    JSON serializable. The task row is written in the current
+    transaction, so it's only queued if the transaction commits.
+    With an idempotency key, a task already queued (or run) with the
+    same key is returned rather than queueing another.
+    If the TASKS_EAGER setting is on, the task runs straight away instead
+    and None is returned.
+    """
+    kwargs = kwargs or {}
+    task_type = registry[name]
+    if settings.TASKS_EAGER:
+        task_type.function(**kwargs)
+        return None
+
+    values = {
+        'name': name,
+        'kwargs': kwargs,
+        'max_attempts': task_type.max_attempts,
+        'run_after': timezone.now() + (delay or datetime.timedelta()),
+    }
+    if idempotency_key is None:
+        return Task.objects.create(**values)
+    return Task.objects.get_or_create(
+        idempotency_key=idempotency_key, defaults=values
+    )[0]
+
+
+def claimable(now):
+    # Queued tasks which are due, and running tasks whose worker has
+    # run out of time, as it has most likely died
+    return (
+        Q(status=Task.QUEUED, run_after__lte=now)
+        | Q(status=Task.RUNNING, locked_until__lt=now)
+    ) & Q(attempts__lt=F('max_attempts'))
+
+
+def running_count(name, now):
+    counts = Task.objects.filter(
+        name=name, status=Task.RUNNING, locked_until__gte=now
+    ).order_by().values('name').annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts), 0)
+
+
+def claim_next(worker):
+    """
+    Claim the next task which is due, for 'worker', and return it, or
+    None if there isn't one.
+    Claiming is a conditional UPDATE, which only succeeds if the task is
+    still claimable, so two workers can never claim the same task. The
+    condition also checks the task type's concurrency limit. PostgreSQL
+    checks it under an advisory lock per task name, as concurrent UPDATEs
+    there don't see each other's running tasks. SQLite runs one write at
+    a time anyway.
+    """
+    now = timezone.now()
+    # Tasks which timed out on their last attempt have failed for good
+    Task.objects.filter(
+        status=Task.RUNNING, locked_until__lt=now,
+        attempts__gte=F('max_attempts'),
+    ).update(
+        status=Task.FAILED, locked_until=None, last_error='Timed out',
+        updated_at=now,
+    )
+
+    candidates = Task.objects.filter(claimable(now)).order_by(
+        'run_after', 'pk'
+    ).values_list('pk', 'name')
+    for pk, name in candidates[:settings.TASKS_CLAIM_CANDIDATES]:
+        task_type = registry.get(name)
+        timeout = task_type.timeout if task_type else 300
+        queryset = Task.objects.filter(claimable(now), pk=pk)
+        with transaction.atomic():
+            if task_type is not None and task_type.concurrency:
+                connection = connections[queryset.db]
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            'SELECT pg_advisory_xact_lock(%s)',
+                            [zlib.crc32(name.encode())]
+                        )
+                queryset = queryset.alias(
+                    running=running_count(name, now)
+                ).filter(running__lt=task_type.concurrency)
+            claimed = queryset.update(
+                status=Task.RUNNING, locked_by=worker,
+                locked_until=now + datetime.timedelta(seconds=timeout),
+                attempts=F('attempts') + 1, updated_at=now,
+            )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def purge_finished(batch_size=1000):
+    """
+    Delete up to 'batch_size' done and failed tasks which finished more
+    than TASKS_RETENTION_SECONDS ago, and return how many were deleted.
+    Once a task with an idempotency key is deleted, the key can queue
+    another task.
+    """
+    if settings.TASKS_RETENTION_SECONDS is None:
+        return 0
+    cutoff = timezone.now() - datetime.timedelta(
+        seconds=settings.TASKS_RETENTION_SECONDS
+    )
+    pks = list(Task.objects.filter(
+        status__in=[Task.DONE, Task.FAILED], updated_at__lt=cutoff
+    ).values_list('pk', flat=True)[:batch_size])
+    if not pks:
+        return 0
+    return Task.objects.filter(pk__in=pks).delete()[0]
+
+
+def run_task(task, worker):
+    """
+    Run a claimed task, usually in a transaction, and record the outcome.
+    A task which raises is queued to retry later, or marked failed if it
+    has no attempts left. Returns whether the task succeeded.
+    The updates only apply while 'worker' still holds the task, so a
+    worker which overran its timeout can't overwrite the outcome of the
+    worker which took over.
+    """
+    task_type = registry.get(task.name)
+    # update() doesn't set updated_at, which purge_finished goes by, so
+    # each update below sets it
+    mine = Task.objects.filter(
+        pk=task.pk, status=Task.RUNNING, locked_by=worker
+    )
+    try:
+        if task_type is None:
+            raise LookupError(f'No task is registered as {task.name!r}')
+        if task_type.atomic:
+            with transaction.atomic():
+                task_type.function(**task.kwargs)
+        else:
+            task_type.function(**task.kwargs)
+    except Exception:
+        logger.exception('Task %s %s failed', task.name, task.pk)
+        error = traceback.format_exc()
+        if task_type is not None and task.attempts < task.max_attempts:
+            mine.update(
+                status=Task.QUEUED, locked_until=None, last_error=error,
+                run_after=(
+                    timezone.now() + task_type.get_retry_delay(task.attempts)
+                ),
+                updated_at=timezone.now(),
+            )
+        else:
+            mine.update(
+                status=Task.FAILED, locked_until=None, last_error=error,
+                updated_at=timezone.now(),
+            )
+        return False
+    mine.update(
+        status=Task.DONE, locked_until=None, last_error='',
+        updated_at=timezone.now(),
+    )
+    return True
@@ -0,0 +1,128 @@
+import datetime
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .models import Task
+from .queue import claim_next, enqueue, run_task, task
+
+calls = []
+
+
+@task('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task('tests.fail', max_attempts=2, retry_delay=30)
+def fail():
+    raise ValueError('Failed on purpose')
+
+
+@task('tests.limited', concurrency=1)
+def limited():
+    pass
+
+
+@override_settings(TASKS_EAGER=False)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_worker_runs_queued_tasks(self):
+        task = enqueue('tests.record', {'value': 1})
+        self.assertEqual(task.status, Task.QUEUED)
+        self.assertEqual(calls, [])
+        out = StringIO()
+        call_command('run_tasks', once=True, stdout=out)
+        self.assertEqual(calls, [1])
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+        self.assertIn('Ran 1 task(s), 0 failed', out.getvalue())
+
+    def test_idempotency_key_queues_once(self):
+        first = enqueue('tests.record', {'value': 1}, idempotency_key='one')
+        second = enqueue('tests.record', {'value': 2}, idempotency_key='one')
+        self.assertEqual(first.pk, second.pk)
+        call_command('run_tasks', once=True, stdout=StringIO())
+        self.assertEqual(calls, [1])
+
+    def test_failed_tasks_are_retried_then_given_up(self):
+        enqueue('tests.fail')
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertFalse(run_task(claim_next('a'), 'a'))
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.QUEUED)
+        self.assertIn('Failed on purpose', task.last_error)
+        # The retry isn't due for another 30 seconds
+        self.assertGreater(
+            task.run_after, timezone.now() + datetime.timedelta(seconds=25)
+        )
+        self.assertIsNone(claim_next('a'))
+
+        Task.objects.update(run_after=timezone.now())
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            run_task(claim_next('a'), 'a')
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(task.attempts, 2)
+
+    def test_tasks_of_dead_workers_are_claimed_again(self):
+        enqueue('tests.record', {'value': 1})
+        claimed = claim_next('dead')
+        self.assertIsNone(claim_next('alive'))
+        Task.objects.update(
+            locked_until=timezone.now() - datetime.timedelta(seconds=1)
+        )
+        self.assertEqual(claim_next('alive').pk, claimed.pk)
+        # The dead worker can no longer record an outcome
+        run_task(claimed, 'dead')
+        self.assertEqual(Task.objects.get().status, Task.RUNNING)
+
+    def test_concurrency_limit(self):
+        enqueue('tests.limited')
+        enqueue('tests.limited')
+        enqueue('tests.record', {'value': 1})
+        first = claim_next('a')
+        self.assertEqual(first.name, 'tests.limited')
+        # The second limited task waits, but other tasks still run
+        self.assertEqual(claim_next('b').name, 'tests.record')
+        self.assertIsNone(claim_next('b'))
+        run_task(first, 'a')
+        self.assertEqual(claim_next('b').name, 'tests.limited')
+
+    def test_finished_tasks_are_purged_once_past_retention(self):
+        for value in range(3):
+            enqueue('tests.record', {'value': value})
+        enqueue('tests.record', {'value': 3}, idempotency_key='three')
+        enqueue('tests.record', {'value': 4})
+        call_command('run_tasks', once=True, stdout=StringIO())
+        Task.objects.filter(kwargs__value__lt=4).update(
+            updated_at=timezone.now() - datetime.timedelta(days=8)
+        )
+        Task.objects.filter(kwargs__value=0).update(status=Task.FAILED)
+        Task.objects.filter(kwargs__value=1).update(status=Task.QUEUED)
+        call_command('run_tasks', once=True, stdout=StringIO())
+        # The queued one ran again, which made it recent
+        self.assertEqual(
+            sorted(Task.objects.values_list('kwargs__value', flat=True)),
+            [1, 4]
+        )
+        # Its key can queue a task again
+        enqueue('tests.record', {'value': 5}, idempotency_key='three')
+        self.assertEqual(Task.objects.count(), 3)
+
+    @override_settings(TASKS_RETENTION_SECONDS=None)
+    def test_finished_tasks_can_be_kept(self):
+        enqueue('tests.record', {'value': 1})
+        call_command('run_tasks', once=True, stdout=StringIO())
+        Task.objects.update(
+            updated_at=timezone.now() - datetime.timedelta(days=365)
+        )
+        call_command('run_tasks', once=True, stdout=StringIO())
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_eager_mode_runs_straight_away(self):
+        with self.settings(TASKS_EAGER=True):
+            self.assertIsNone(enqueue('tests.record', {'value': 1}))
+        self.assertEqual(calls, [1])
+        self.assertFalse(Task.objects.exists())
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from timeline.models import TimelineEntry
+from followers.models import Follower
+from posts.models import Post
+from timeline.rebuild import rebuild_sql
+
+
+class Command(BaseCommand):
+    """
+    Throw away every timeline entry and rebuild them all from the
+    Follower and Post tables, e.g. after a bulk import which bypassed the
+    signal handlers. Each followed user's posts are capped at
+    TIMELINE_BACKFILL_LIMIT, as when they're followed.
+    """
+    help = 'Rebuild every user\'s home feed timeline'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            TimelineEntry.objects.all().delete()
+            with connection.cursor() as cursor:
+                cursor.execute(*rebuild_sql(TimelineEntry, Follower, Post))
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {TimelineEntry.objects.count()} timeline entries'
+        ))
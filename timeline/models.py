@@ -0,0 +1,74 @@
+from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.contrib.auth.models import User
+from posts.models import Post
+from followers.models import Follower
+from tasks.queue import enqueue
+
+
+class TimelineEntry(models.Model):
+    """
+    TimelineEntry model, related to 'owner' and 'post'.
+    Each row puts a post in the home feed of 'owner', a User who follows
+    the post's author. The rows are written when the post is created or
+    when the user follows the author, so reading a feed is a single
+    indexed range scan on (owner, created_at) however many accounts the
+    user follows.
+    'created_at' is copied from the post, so we can order by it without
+    joining the post table.
+    """
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='timeline'
+        )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name='timeline_entries'
+        )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ['owner', 'post']
+        indexes = [
+            models.Index(
+                fields=['owner', '-created_at', '-post'],
+                name='timeline_owner_created_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.owner} {self.post}'
+
+
+# The timeline is written by tasks in timeline/tasks.py, which the signal
+# handlers queue, so following or posting doesn't wait for the fan-out.
+# The idempotency keys stop a handler which runs twice, e.g. when a
+# fixture is loaded, from queueing the same work twice.
+def queue_fan_out(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        enqueue(
+            'timeline.fan_out_post', {'post_id': instance.id},
+            idempotency_key=f'timeline.fan_out_post:{instance.id}'
+        )
+
+
+def queue_backfill(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        enqueue(
+            'timeline.backfill_timeline',
+            {'owner_id': instance.owner_id,
+             'followed_id': instance.followed_id},
+            idempotency_key=f'timeline.backfill_timeline:{instance.id}'
+        )
+
+
+def queue_prune(sender, instance, **kwargs):
+    enqueue(
+        'timeline.prune_timeline',
+        {'owner_id': instance.owner_id, 'followed_id': instance.followed_id},
+        idempotency_key=f'timeline.prune_timeline:{instance.id}'
+    )
+
+
+post_save.connect(queue_fan_out, sender=Post)
+post_save.connect(queue_backfill, sender=Follower)
+post_delete.connect(queue_prune, sender=Follower)
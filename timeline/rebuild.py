@@ -0,0 +1,28 @@
+from django.conf import settings
+
+
+def rebuild_sql(timeline, follower, post):
+    """
+    Return the INSERT ... SELECT, and its parameters, which fills every
+    timeline from the follower table in one statement. Like following
+    someone, see backfill_timeline in timeline/tasks.py, it copies only
+    the TIMELINE_BACKFILL_LIMIT newest posts of each followed user, and
+    leaves out deleted posts.
+    The models may be historical ones, from a migration which runs
+    before posts could be deleted.
+    """
+    deletable = any(
+        field.name == 'deleted_at' for field in post._meta.get_fields()
+    )
+    return (
+        f'INSERT INTO {timeline._meta.db_table} '
+        f'(owner_id, post_id, created_at) '
+        f'SELECT owner_id, post_id, created_at FROM ('
+        f'SELECT f.owner_id, p.id AS post_id, p.created_at, ROW_NUMBER() '
+        f'OVER (PARTITION BY f.owner_id, f.followed_id '
+        f'ORDER BY p.created_at DESC, p.id DESC) AS position '
+        f'FROM {follower._meta.db_table} f '
+        f'INNER JOIN {post._meta.db_table} p ON p.owner_id = f.followed_id'
+        + (' WHERE p.deleted_at IS NULL' if deletable else '')
+        + ') ranked WHERE position <= %s'
+    ), [settings.TIMELINE_BACKFILL_LIMIT]
@@ -0,0 +1,63 @@
+from django.conf import settings
+from tasks.queue import task
+from posts.models import Post
+from followers.models import Follower
+from .models import TimelineEntry
+
+
+# Fan a new post out to the timeline of everyone following its author.
+# ignore_conflicts means running this twice for the same post is harmless.
+@task('timeline.fan_out_post')
+def fan_out_post(post_id):
+    post = Post.objects.filter(pk=post_id).values(
+        'owner_id', 'created_at'
+    ).first()
+    if post is None:
+        # The post was deleted before the task ran
+        return
+    follower_ids = Follower.objects.filter(
+        followed_id=post['owner_id']
+    ).values_list('owner_id', flat=True)
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(
+            owner_id=follower_id, post_id=post_id,
+            created_at=post['created_at']
+        )
+        for follower_id in follower_ids.iterator()
+    ], batch_size=500, ignore_conflicts=True)
+
+
+# When a user follows someone, copy the followed user's most recent posts
+# into the follower's timeline. TIMELINE_BACKFILL_LIMIT caps the number
+# of posts copied, so following a prolific account stays cheap.
+@task('timeline.backfill_timeline')
+def backfill_timeline(owner_id, followed_id):
+    if not Follower.objects.filter(
+        owner_id=owner_id, followed_id=followed_id
+    ).exists():
+        # They unfollowed again before the task ran
+        return
+    posts = Post.objects.filter(
+        owner_id=followed_id
+    ).order_by('-created_at').values_list('id', 'created_at')
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(
+            owner_id=owner_id, post_id=post_id, created_at=created_at
+        )
+        for post_id, created_at
+        in posts[:settings.TIMELINE_BACKFILL_LIMIT]
+    ], batch_size=500, ignore_conflicts=True)
+
+
+# When a user unfollows someone, remove the unfollowed user's posts from
+# their timeline. Deleted posts are removed by the on_delete CASCADE.
+@task('timeline.prune_timeline')
+def prune_timeline(owner_id, followed_id):
+    if Follower.objects.filter(
+        owner_id=owner_id, followed_id=followed_id
+    ).exists():
+        # They followed again before the task ran
+        return
+    TimelineEntry.objects.filter(
+        owner_id=owner_id, post__owner_id=followed_id
+    ).delete()
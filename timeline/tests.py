@@ -0,0 +1,92 @@
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from .models import TimelineEntry
+from followers.models import Follower
+from posts.models import Post
+
+
+class FeedViewTests(APITestCase):
+    def setUp(self):
+        # Andy follows Lindsay, but not Brian
+        self.andy = User.objects.create_user(username='andy', password='12345')
+        self.lindsay = User.objects.create_user(username='lindsay')
+        self.brian = User.objects.create_user(username='brian')
+        self.follow = Follower.objects.create(
+            owner=self.andy, followed=self.lindsay
+        )
+
+    def feed_post_ids(self, query=''):
+        response = self.client.get(f'/feed/{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['id'] for post in response.data['results']]
+
+    def test_feed_requires_login(self):
+        response = self.client.get('/feed/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_new_posts_fan_out_to_followers(self):
+        self.client.login(username='andy', password='12345')
+        followed_post = Post.objects.create(owner=self.lindsay, title='Yes')
+        Post.objects.create(owner=self.brian, title='No')
+        self.assertEqual(self.feed_post_ids(), [followed_post.id])
+        # Keyset pages read the same entries
+        self.assertEqual(
+            self.feed_post_ids('?pagination=cursor'), [followed_post.id]
+        )
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        self.client.login(username='andy', password='12345')
+        old_post = Post.objects.create(owner=self.brian, title='Old')
+        follow = Follower.objects.create(owner=self.andy, followed=self.brian)
+        self.assertEqual(self.feed_post_ids(), [old_post.id])
+        follow.delete()
+        self.assertEqual(self.feed_post_ids(), [])
+
+    def test_deleting_a_post_removes_it_from_feeds(self):
+        post = Post.objects.create(owner=self.lindsay, title='Yes')
+        post.delete()
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_rebuild_command(self):
+        Post.objects.create(owner=self.lindsay, title='Yes')
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(TimelineEntry.objects.filter(
+            owner=self.andy
+        ).count(), 1)
+
+    @override_settings(TIMELINE_BACKFILL_LIMIT=2)
+    def test_rebuild_keeps_the_newest_posts_of_each_followed_user(self):
+        Follower.objects.create(owner=self.andy, followed=self.brian)
+        posts = [
+            Post.objects.create(owner=owner, title=str(number))
+            for number in range(4) for owner in (self.lindsay, self.brian)
+        ]
+        deleted = posts[-1]
+        Post.objects.filter(pk=deleted.pk).update(
+            deleted_at=deleted.created_at
+        )
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            sorted(TimelineEntry.objects.filter(
+                owner=self.andy
+            ).values_list('post__title', 'post__owner__username')),
+            [('1', 'brian'), ('2', 'brian'), ('2', 'lindsay'),
+             ('3', 'lindsay')]
+        )
+
+
+@override_settings(TASKS_EAGER=False)
+class TimelineTaskTests(APITestCase):
+    def test_fan_out_runs_in_the_worker(self):
+        andy = User.objects.create_user(username='andy')
+        lindsay = User.objects.create_user(username='lindsay')
+        Follower.objects.create(owner=andy, followed=lindsay)
+        Post.objects.create(owner=lindsay, title='Yes')
+        self.assertFalse(TimelineEntry.objects.exists())
+        call_command('run_tasks', once=True, stdout=StringIO())
+        self.assertEqual(TimelineEntry.objects.filter(owner=andy).count(), 1)
@@ -0,0 +1,32 @@
+from django.db.models import F
+from rest_framework import generics, permissions
+from drf_api.async_views import AsyncListMixin
+from drf_api.fast_serialization import FastListMixin
+from drf_api.mixins import EagerLoadingMixin, StreamingListMixin
+from drf_api.pagination import PageNumberOrKeysetPagination
+from posts.models import Post
+from posts.serializers import PostSerializer
+
+
+class Feed(
+    AsyncListMixin, EagerLoadingMixin, StreamingListMixin, FastListMixin,
+    generics.ListAPIView
+):
+    """
+    List the posts in the logged in user's home feed, i.e. the posts of
+    the users they follow, newest first.
+    This reads the user's TimelineEntry rows rather than filtering posts
+    through the Follower table.
+    """
+    serializer_class = PostSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PageNumberOrKeysetPagination
+    # Keyset pages follow the timeline's own (created_at, post) index
+    keyset_fields = ('feed_created_at', 'id')
+
+    def get_queryset(self):
+        return Post.objects.filter(
+            timeline_entries__owner=self.request.user
+        ).annotate(
+            feed_created_at=F('timeline_entries__created_at')
+        ).order_by('-feed_created_at', '-id')